@@ -0,0 +1,42 @@
+"""
+Compare ``txapply`` with a precompiled ``Applicator`` for the same call.
+
+Usage::
+
+    python benchmarks/bench_applicator.py
+"""
+
+from __future__ import print_function
+
+import timeit
+
+from twisted.internet.defer import succeed
+
+from txapply import make_applicator, txapply
+
+
+def function(a, b, key=None):
+    return a
+
+
+APPLY = make_applicator(function, 2, ('key',))
+
+
+def with_txapply():
+    return txapply(function, succeed(1), succeed(2), key=succeed(3))
+
+
+def with_applicator():
+    return APPLY(succeed(1), succeed(2), succeed(3))
+
+
+def main():
+    count = 50000
+    for name, call in [('txapply', with_txapply),
+                       ('applicator', with_applicator)]:
+        best = min(timeit.repeat(call, number=count, repeat=5))
+        print('{:>11}: {:6.2f} us per call'.format(name, best / count * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Measure what calling functions in the ``contextvars`` context they were
+applied in costs ``txapply``.
+
+Each application copies the context once, and enters it once to call the
+function.  This compares ``txapply`` as it is with ``txapply`` with the
+context swapped for one that just calls the function, with a few context
+variables set, as a request handler might have.
+
+Usage::
+
+    python benchmarks/bench_context.py
+"""
+
+from __future__ import print_function
+
+import timeit
+from contextvars import ContextVar, copy_context
+
+from twisted.internet.defer import succeed
+
+from txapply import _instrument, txapply
+
+
+VARIABLES = [ContextVar('variable{}'.format(i)) for i in range(10)]
+
+
+class NoContext(object):
+    def run(self, function, *args, **kwargs):
+        return function(*args, **kwargs)
+
+
+NO_CONTEXT = NoContext()
+
+
+def function(a, b, key=None):
+    return a
+
+
+def apply():
+    return txapply(function, succeed(1), succeed(2), key=succeed(3))
+
+
+def best_time(call, count):
+    return min(timeit.repeat(call, number=count, repeat=3)) / count
+
+
+def main():
+    for variable in VARIABLES:
+        variable.set(1)
+    count = 20000
+    # Alternate between the two, so that they see the same noise.
+    with_context = without_context = float('inf')
+    for i in range(10):
+        with_context = min(with_context, best_time(apply, count))
+        _instrument.copy_context = lambda: NO_CONTEXT
+        try:
+            without_context = min(without_context, best_time(apply, count))
+        finally:
+            _instrument.copy_context = copy_context
+    print('   txapply: {:6.3f} us per call'.format(with_context * 1e6))
+    print('no context: {:6.3f} us per call'.format(without_context * 1e6))
+    print('  overhead: {:6.3f} us per call'.format(
+        (with_context - without_context) * 1e6))
+
+    direct = best_time(lambda: function(1, 2, key=3), count * 10)
+    in_context = best_time(
+        lambda: copy_context().run(function, 1, 2, key=3), count * 10)
+    print('copy_context + Context.run alone: {:6.3f} us per call'.format(
+        (in_context - direct) * 1e6))
+
+
+if __name__ == '__main__':
+    main()
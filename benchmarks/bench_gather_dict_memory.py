@@ -0,0 +1,42 @@
+"""
+Measure the peak memory that ``gather_dict`` uses per input, not counting
+the inputs themselves or their values.
+
+Usage::
+
+    python benchmarks/bench_gather_dict_memory.py [COUNT]
+"""
+
+from __future__ import print_function
+
+import sys
+import tracemalloc
+
+from twisted.internet.defer import Deferred
+
+from txapply import gather_dict
+
+
+def measure(count):
+    deferreds = {i: Deferred() for i in range(count)}
+    values = list(range(count))
+    tracemalloc.start()
+    result = gather_dict(deferreds)
+    for i, d in deferreds.items():
+        d.callback(values[i])
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    results = []
+    result.addCallback(results.append)
+    assert len(results[0]) == count
+    return peak
+
+
+def main(count):
+    peak = measure(count)
+    print('gather_dict: {:8.1f} MiB peak, {:6.1f} bytes per input'.format(
+        peak / 2.0 ** 20, peak / float(count)))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
@@ -0,0 +1,62 @@
+"""
+Compare the peak memory of reducing the results of many Deferreds with
+``gather_reduce_dict`` and with ``gather_dict`` followed by a reduction.
+
+Usage::
+
+    python benchmarks/bench_gather_memory.py [COUNT]
+"""
+
+from __future__ import print_function
+
+import sys
+import tracemalloc
+
+from twisted.internet.defer import Deferred
+
+from txapply import gather_dict, gather_reduce_dict
+
+
+def value(i):
+    # Big enough that keeping every result around is noticeable.
+    return [i] * 16
+
+
+def add_length(total, key, value):
+    return total + len(value)
+
+
+def gathered(deferreds):
+    d = gather_dict(deferreds)
+    d.addCallback(lambda results: sum(map(len, results.values())))
+    return d
+
+
+def reduced(deferreds):
+    return gather_reduce_dict(deferreds, add_length, 0)
+
+
+def measure(gather, count):
+    deferreds = {i: Deferred() for i in range(count)}
+    tracemalloc.start()
+    result = gather(deferreds)
+    for i, d in deferreds.items():
+        d.callback(value(i))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    results = []
+    result.addCallback(results.append)
+    assert results == [16 * count], results
+    return peak
+
+
+def main(count):
+    for name, gather in [('gather_dict', gathered),
+                         ('gather_reduce_dict', reduced)]:
+        peak = measure(gather, count)
+        print('{:>20}: {:8.1f} MiB peak, {:6.1f} bytes per input'.format(
+            name, peak / 2.0 ** 20, peak / float(count)))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,54 @@
+"""
+Compare a chain of combinator callbacks with the same steps compiled by
+``pipeline``.
+
+Usage::
+
+    python benchmarks/bench_pipeline.py
+"""
+
+from __future__ import print_function
+
+import timeit
+
+from twisted.internet.defer import succeed
+
+from txapply._combinators import combine, ignore, pipeline, step, transparent
+
+
+def nothing(*args, **kwargs):
+    return 1
+
+
+STEPS = [
+    step(transparent, nothing),
+    step(ignore, nothing, 2),
+    step(combine, nothing),
+    step(transparent, nothing, key=3),
+] * 5
+
+
+def chained():
+    d = succeed(0)
+    for s in STEPS:
+        d.addCallback(s.combinator, s.function, *s.args, **s.kwargs)
+    return d
+
+
+COMPILED = pipeline(STEPS)
+
+
+def compiled():
+    return succeed(0).addCallback(COMPILED)
+
+
+def main():
+    count = 20000
+    for name, function in [('chained', chained), ('compiled', compiled)]:
+        best = min(timeit.repeat(function, number=count, repeat=5))
+        print('{:>10}: {:7.2f} us per chain, {:6.3f} us per step'.format(
+            name, best / count * 1e6, best / count / len(STEPS) * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""
+Compare the latency of urgent calls under mixed load, with and without
+``PriorityScheduler``.
+
+Each round, the arguments of BATCH slow batch applications and URGENT quick
+urgent ones all arrive in the same turn of the event loop, with the urgent
+ones scattered among the batch ones.  Latency is the time from the start of
+that turn until each function is called.  With plain ``txapply``, functions
+are called in the order their arguments arrive; with the scheduler, urgent
+ones are called first, and at most ``batch_size`` calls are made each turn.
+
+Usage::
+
+    python benchmarks/bench_priority.py
+"""
+
+from __future__ import print_function
+
+import random
+from timeit import default_timer
+
+from twisted.internet.defer import Deferred
+from twisted.internet.task import Clock
+
+from txapply import PriorityScheduler, txapply
+
+
+BATCH = 2000
+URGENT = 50
+WORK = 0.0001
+ROUNDS = 3
+
+
+class TurningClock(Clock):
+    """
+    Runs delayed calls a turn of the event loop at a time.
+    """
+
+    def run(self):
+        while self.calls:
+            calls, self.calls = self.calls, []
+            for call in calls:
+                call.func(*call.args, **call.kw)
+
+
+def busy(seconds):
+    end = default_timer() + seconds
+    while default_timer() < end:
+        pass
+
+
+def one_round(apply):
+    latencies = {'batch': [], 'urgent': []}
+    kinds = ['batch'] * BATCH + ['urgent'] * URGENT
+    random.shuffle(kinds)
+    arguments = []
+    start = []
+
+    def function(kind):
+        latencies[kind].append(default_timer() - start[0])
+        if kind == 'batch':
+            busy(WORK)
+
+    for kind in kinds:
+        argument = Deferred()
+        apply(kind, function, argument)
+        arguments.append((argument, kind))
+    start.append(default_timer())
+    for argument, kind in arguments:
+        argument.callback(kind)
+    return latencies
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def report(name, rounds):
+    for kind in ['urgent', 'batch']:
+        values = [value for latencies in rounds for value in latencies[kind]]
+        print('{:>10} {:>6}: p50 {:8.2f} ms, p99 {:8.2f} ms'.format(
+            name, kind, percentile(values, 0.5) * 1e3,
+            percentile(values, 0.99) * 1e3))
+
+
+def main():
+    random.seed(0)
+    rounds = [
+        one_round(lambda kind, function, argument: txapply(
+            function, argument))
+        for i in range(ROUNDS)]
+    report('txapply', rounds)
+
+    for batch_size in [10, 100]:
+        clock = TurningClock()
+        scheduler = PriorityScheduler(clock, batch_size=batch_size)
+        priorities = {'urgent': 0, 'batch': 10}
+        rounds = []
+        for i in range(ROUNDS):
+            rounds.append(one_round(
+                lambda kind, function, argument: scheduler.txapply(
+                    priorities[kind], function, argument)))
+            clock.run()
+        report('batch={}'.format(batch_size), rounds)
+
+
+if __name__ == '__main__':
+    main()
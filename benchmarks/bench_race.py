@@ -0,0 +1,63 @@
+"""
+Compare ``race`` with ``DeferredList(fireOnOneCallback=True)`` for large
+numbers of competitors.
+
+Each round sets up a race between COUNT Deferreds, then fires one of them.
+``race`` also cancels the losers, which ``DeferredList`` doesn't do, so
+it is also compared with a ``DeferredList`` whose losers are cancelled by
+hand.
+
+Usage::
+
+    python benchmarks/bench_race.py
+"""
+
+from __future__ import print_function
+
+import timeit
+
+from twisted.internet.defer import Deferred, DeferredList
+
+from txapply import race
+
+
+def with_race(count):
+    deferreds = [Deferred() for i in range(count)]
+    d = race(deferreds)
+    deferreds[count // 2].callback(None)
+    return d
+
+
+def with_deferred_list(count):
+    deferreds = [Deferred() for i in range(count)]
+    d = DeferredList(deferreds, fireOnOneCallback=True, consumeErrors=True)
+    deferreds[count // 2].callback(None)
+    return d
+
+
+def with_deferred_list_and_cancel(count):
+    deferreds = [Deferred() for i in range(count)]
+    d = DeferredList(deferreds, fireOnOneCallback=True, consumeErrors=True)
+    deferreds[count // 2].callback(None)
+    for deferred in deferreds:
+        deferred.cancel()
+    return d
+
+
+def main():
+    for count in [10, 1000, 100000]:
+        number = max(1, 100000 // count)
+        for name, function in [
+                ('race', with_race),
+                ('DeferredList', with_deferred_list),
+                ('+ cancel', with_deferred_list_and_cancel)]:
+            best = min(timeit.repeat(
+                lambda: function(count), number=number, repeat=3))
+            print('{:>7} competitors {:>13}: {:9.2f} us per race, '
+                  '{:6.3f} us per competitor'.format(
+                      count, name, best / number * 1e6,
+                      best / number / count * 1e6))
+
+
+if __name__ == '__main__':
+    main()
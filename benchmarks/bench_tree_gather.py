@@ -0,0 +1,54 @@
+"""
+Compare how long individual callbacks take with ``gather_dict`` and with
+``gather_dict_tree``, when the inputs of several concurrent gathers all fire
+in the same tick.
+
+Usage::
+
+    python benchmarks/bench_tree_gather.py [GATHERS] [INPUTS]
+"""
+
+from __future__ import print_function
+
+import random
+import sys
+import time
+
+from twisted.internet.defer import Deferred
+
+from txapply import gather_dict, gather_dict_tree
+
+
+def run(gather, gathers, inputs):
+    pending = []
+    for g in range(gathers):
+        deferreds = {i: Deferred() for i in range(inputs)}
+        gather(deferreds)
+        pending.extend(deferreds.values())
+    random.shuffle(pending)
+    durations = []
+    for d in pending:
+        start = time.perf_counter()
+        d.callback(None)
+        durations.append(time.perf_counter() - start)
+    return sorted(durations)
+
+
+def main(gathers, inputs):
+    random.seed(0)
+    for name, gather in [('gather_dict', gather_dict),
+                         ('gather_dict_tree', gather_dict_tree)]:
+        durations = run(gather, gathers, inputs)
+
+        def percentile(p):
+            return durations[int(p * (len(durations) - 1))] * 1e6
+        print('{:>17}: p50 {:7.2f}us  p99 {:7.2f}us  p99.99 {:9.2f}us  '
+              'max {:9.2f}us  total {:7.1f}ms'.format(
+                  name, percentile(0.5), percentile(0.99),
+                  percentile(0.9999), durations[-1] * 1e6,
+                  sum(durations) * 1e3))
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*(args or [20, 20000]))
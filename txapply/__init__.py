@@ -6,9 +6,79 @@ from ._version import get_versions
 __version__ = get_versions()['version']
 del get_versions
 
-from ._txapply import gather_dict, txapply
+from ._admission import AdmissionController, Overloaded
+from ._breaker import CircuitBreaker, CircuitOpen
+from ._binding import Applicator, make_applicator, txapply_checked
+from ._bulkhead import KeyedLimiter
+from ._cooperative import gather_dict_cooperatively, sliced_cooperator
+from ._graph import (
+    CycleError,
+    IncrementalGraph,
+    UnknownDependency,
+    gather_graph,
+)
+from ._hedge import HedgeStats, Hedger
+from ._metrics import Histogram, Metrics
+from ._priority import PriorityScheduler
+from ._profile import GatherProfiler, KeyProfile
+from ._quorum import (
+    QuorumError,
+    RaceError,
+    gather_quorum,
+    gather_quorum_dict,
+    race,
+    race_dict,
+)
+from ._stream import ApplyStream
+from ._tracing import JsonLinesExporter, Span, Tracer, current_span
+from ._tree import gather_dict_tree, gather_tree
+from ._txapply import (
+    gather_dict,
+    gather_reduce,
+    gather_reduce_dict,
+    txapply,
+)
+from ._watchdog import SlowCall, Watchdog
 
 __all__ = [
+    'AdmissionController',
+    'Applicator',
+    'ApplyStream',
+    'CircuitBreaker',
+    'CircuitOpen',
+    'CycleError',
+    'GatherProfiler',
+    'HedgeStats',
+    'Hedger',
+    'Histogram',
+    'IncrementalGraph',
+    'JsonLinesExporter',
+    'KeyProfile',
+    'KeyedLimiter',
+    'Metrics',
+    'Overloaded',
+    'PriorityScheduler',
+    'QuorumError',
+    'RaceError',
+    'SlowCall',
+    'Span',
+    'Tracer',
+    'UnknownDependency',
+    'Watchdog',
+    'current_span',
     'gather_dict',
+    'gather_dict_cooperatively',
+    'gather_dict_tree',
+    'gather_graph',
+    'gather_quorum',
+    'gather_quorum_dict',
+    'gather_reduce',
+    'gather_reduce_dict',
+    'gather_tree',
+    'make_applicator',
+    'race',
+    'race_dict',
+    'sliced_cooperator',
     'txapply',
+    'txapply_checked',
 ]
@@ -0,0 +1,207 @@
+"""
+Admission control: refuse new applications when too many are outstanding,
+or they are waiting too long.
+"""
+
+from datetime import timedelta
+from functools import partial
+from math import sqrt
+
+from twisted.internet.defer import fail
+
+from . import _instrument
+from ._txapply import _abandon, _txapply_wrapper
+
+
+class Overloaded(Exception):
+    """
+    Raised instead of applying a function when an ``AdmissionController``
+    refuses it.
+
+    :ivar str reason: Why it was refused.
+    """
+
+    def __init__(self, reason):
+        super(Overloaded, self).__init__(reason)
+        self.reason = reason
+
+
+class _Admission(object):
+    """
+    One admitted application: when it was admitted, and whether its
+    function has been called yet.
+    """
+
+    __slots__ = ('admitted_at', 'started')
+
+    def __init__(self, admitted_at):
+        self.admitted_at = admitted_at
+        self.started = False
+
+
+class AdmissionController(object):
+    """
+    Refuses new applications straight away, with ``Overloaded``, rather
+    than letting them pile up when there are more than can be handled::
+
+        admission = AdmissionController(reactor, max_outstanding=10000)
+        d = admission.txapply(handle, request_deferred)
+
+    Share one controller to limit all applications, or make one for each
+    group of them, e.g. one per endpoint.
+
+    An application is outstanding from when it is admitted until the
+    function's result has fired.  Its queueing delay is how long it waited
+    for its arguments before the function could be called.
+
+    There are two kinds of limit, which can be combined:
+
+    * Fixed: refuse everything while ``max_outstanding`` applications are
+      outstanding, or while the queueing delay of the most recent
+      application to start was over ``max_delay``.
+
+    * Adaptive, like CoDel: once the queueing delay has stayed above
+      ``target`` for a whole ``interval``, start refusing applications, at
+      a rate that goes up with the square root of how many have been
+      refused, until the queueing delay falls below ``target`` again.  This
+      tolerates short bursts, but not standing queues.
+
+    :ivar IReactorTime clock: Event loop that controls time.
+    :ivar Optional[int] max_outstanding: The most applications to have
+        outstanding at once, or ``None`` for no limit.
+    :ivar Optional[timedelta] max_delay: The longest queueing delay to allow,
+        or ``None`` for no limit.
+    :ivar Optional[timedelta] target: The queueing delay to aim for in the
+        adaptive mode, or ``None`` not to use it.
+    :ivar timedelta interval: How long the queueing delay has to be above
+        ``target`` before applications are refused.
+    :ivar int outstanding: How many applications are outstanding.
+    :ivar int waiting: How many outstanding applications are waiting for
+        their arguments.
+    :ivar float delay: The queueing delay, in seconds, of the most recent
+        application to start, or 0 if none are waiting.
+    :ivar int admitted: How many applications have been admitted.
+    :ivar int rejected: How many applications have been refused.
+    """
+
+    def __init__(self, clock, max_outstanding=None, max_delay=None,
+                 target=None, interval=timedelta(milliseconds=100)):
+        self.clock = clock
+        self.max_outstanding = max_outstanding
+        self.max_delay = max_delay
+        self.target = target
+        self.interval = interval
+        self.outstanding = 0
+        self.waiting = 0
+        self.delay = 0.0
+        self.admitted = 0
+        self.rejected = 0
+        self._above_since = None
+        self._dropping = False
+        self._drop_count = 0
+        self._drop_next = 0.0
+
+    def _refusal(self, now):
+        """
+        Why to refuse an application now, or ``None`` to admit it.
+        """
+        if (self.max_outstanding is not None and
+                self.outstanding >= self.max_outstanding):
+            return '{} applications outstanding'.format(self.outstanding)
+        if (self.max_delay is not None and
+                self.delay > self.max_delay.total_seconds()):
+            return 'queueing delay of {:.3f}s'.format(self.delay)
+        if self._dropping and now >= self._drop_next:
+            self._drop_count += 1
+            self._drop_next = now + (
+                self.interval.total_seconds() / sqrt(self._drop_count))
+            return 'queueing delay above {:.3f}s for too long'.format(
+                self.target.total_seconds())
+        return None
+
+    def _observe(self, delay, now):
+        """
+        Record the queueing delay of an application that's starting.
+        """
+        self.delay = delay
+        if self.target is None:
+            return
+        if delay < self.target.total_seconds():
+            self._above_since = None
+            self._dropping = False
+        elif self._above_since is None:
+            self._above_since = now
+        elif (not self._dropping and
+              now - self._above_since >= self.interval.total_seconds()):
+            self._dropping = True
+            # As CoDel does, if the last bout of refusals was recent, pick
+            # up near the rate it had reached.
+            recent = now - self._drop_next < 16 * self.interval.total_seconds()
+            if recent and self._drop_count > 2:
+                self._drop_count -= 2
+            else:
+                self._drop_count = 0
+            self._drop_next = now
+
+    def admit(self):
+        """
+        Decide whether to admit an application now.
+
+        :raise Overloaded: If it should be refused.
+        :return: A token to pass to ``started`` and ``finished``.
+        """
+        now = self.clock.seconds()
+        reason = self._refusal(now)
+        if reason is not None:
+            self.rejected += 1
+            raise Overloaded(reason)
+        self.admitted += 1
+        self.outstanding += 1
+        self.waiting += 1
+        return _Admission(now)
+
+    def started(self, admission):
+        """
+        Record that an admitted application's function is being called.
+        """
+        admission.started = True
+        self.waiting -= 1
+        now = self.clock.seconds()
+        self._observe(now - admission.admitted_at, now)
+
+    def finished(self, admission):
+        """
+        Record that an admitted application is no longer outstanding.
+        """
+        self.outstanding -= 1
+        if not admission.started:
+            self.waiting -= 1
+        if not self.waiting:
+            self.delay = 0.0
+
+    def _call(self, admission, function, *args, **kwargs):
+        self.started(admission)
+        if _instrument.invoke is None:
+            return function(*args, **kwargs)
+        return _instrument.invoke(function, args, kwargs)
+
+    def _finished(self, result, admission):
+        self.finished(admission)
+        return result
+
+    def txapply(self, function, *args, **kwargs):
+        """
+        Like ``txapply.txapply``, but only if the controller admits it.
+
+        If it doesn't, the arguments that haven't fired are cancelled, and
+        the result fails with ``Overloaded`` straight away.
+        """
+        try:
+            admission = self.admit()
+        except Overloaded as e:
+            _abandon(args + tuple(kwargs.values()))
+            return fail(e)
+        d = _txapply_wrapper(
+            partial(self._call, admission, function), *args, **kwargs)
+        d.addBoth(self._finished, admission)
+        return d
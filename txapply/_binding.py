@@ -0,0 +1,180 @@
+"""
+Check that a function can be called with arguments before waiting for them.
+"""
+
+from weakref import WeakKeyDictionary
+
+from twisted.internet.defer import fail, succeed
+
+from . import _instrument
+from ._combinators import _name
+from ._txapply import _Gather, _abandon, txapply
+
+try:
+    from inspect import signature
+except ImportError:
+    # Python 2 has no signatures, so there's nothing to check against.
+    signature = None
+
+
+# Maps functions to a dict mapping call shapes to why the function can't be
+# called with that shape, or None if it can.
+_shapes = WeakKeyDictionary()
+
+
+def _bind_error(function, nargs, kwnames):
+    try:
+        # Not through ``__wrapped__``: decorators like ``ignored`` keep the
+        # name of the function they wrap, but not how it's called.
+        bind = signature(function, follow_wrapped=False).bind
+    except (TypeError, ValueError):
+        # Not introspectable, e.g. some builtins.
+        return None
+    try:
+        bind(*range(nargs), **dict.fromkeys(kwnames))
+    except TypeError as e:
+        return '{}(): {}'.format(_name(function), e)
+    return None
+
+
+def call_shape_error(function, nargs, kwnames):
+    """
+    Check whether ``function`` can be called with ``nargs`` positional
+    arguments and keyword arguments called ``kwnames``.
+
+    The answer is cached for each function and shape of call.
+
+    :param function: The function to check.
+    :param int nargs: How many positional arguments there are.
+    :param frozenset[str] kwnames: The names of the keyword arguments.
+    :return: The ``TypeError`` that calling ``function`` would raise, or
+        ``None`` if it can be called like that, or if it can't be checked.
+    """
+    if signature is None:
+        return None
+    # Each ``obj.method`` is a new object, which would fall straight out of
+    # the cache, so check the function underneath instead, with ``obj`` as
+    # its first argument.
+    underlying = getattr(function, '__func__', None)
+    if underlying is not None and hasattr(function, '__self__'):
+        function = underlying
+        nargs += 1
+    shape = (nargs, kwnames)
+    try:
+        cached = _shapes.get(function)
+    except TypeError:
+        # Can't be weakly referenced, so can't be cached.
+        message = _bind_error(function, nargs, kwnames)
+    else:
+        if cached is None:
+            cached = _shapes[function] = {}
+        try:
+            message = cached[shape]
+        except KeyError:
+            message = cached[shape] = _bind_error(function, nargs, kwnames)
+    if message is None:
+        return None
+    return TypeError(message)
+
+
+def txapply_checked(function, *args, **kwargs):
+    """
+    Like ``txapply``, but check that ``function`` can be called with the
+    number of arguments and the keyword arguments given before waiting for
+    them.
+
+    If it can't, all the arguments that haven't fired are cancelled, and
+    the returned Deferred fails with ``TypeError`` straight away, rather than
+    once every argument has arrived.
+    """
+    error = call_shape_error(function, len(args), frozenset(kwargs))
+    if error is None:
+        return txapply(function, *args, **kwargs)
+    _abandon(args + tuple(kwargs.values()))
+    return fail(error)
+
+
+class Applicator(object):
+    """
+    Calls a function with Deferred arguments, like ``txapply``, for calls
+    that always have the same shape.
+
+    Made by ``make_applicator``.  Everything about the shape of the call is
+    worked out once, so each call only has to gather its arguments.
+
+    :ivar function: The function to call.
+    :ivar int nargs: How many positional arguments ``function`` is called
+        with.
+    :ivar Tuple[str, ...] kwnames: The names of the keyword arguments that
+        ``function`` is called with, in the order they are given.
+    """
+
+    __slots__ = ('function', 'nargs', 'kwnames', '_count')
+
+    def __init__(self, function, nargs, kwnames):
+        self.function = function
+        self.nargs = nargs
+        self.kwnames = kwnames
+        self._count = nargs + len(kwnames)
+
+    def __repr__(self):
+        return 'Applicator({}, {!r}, {!r})'.format(
+            _name(self.function), self.nargs, self.kwnames)
+
+    def __call__(self, *deferreds):
+        """
+        Call the function with the values of ``deferreds``.
+
+        The function is called in a copy of the ``contextvars`` context
+        this is called in, as with ``txapply``.
+
+        :param deferreds: ``nargs`` Deferreds for the positional arguments,
+            followed by a Deferred for each of ``kwnames``.
+        :raise TypeError: If there are the wrong number of Deferreds.
+        :return: A Deferred that fires with the result of the function.
+        """
+        count = self._count
+        if len(deferreds) != count:
+            raise TypeError(
+                '{!r} takes {} Deferreds, got {}'.format(
+                    self, count, len(deferreds)))
+        if not count:
+            d = succeed(())
+        else:
+            d = _Gather(deferreds, count).result
+        d.addCallback(self._call, _instrument.copy_context())
+        return d
+
+    def _call(self, values, context):
+        if not self.kwnames:
+            if _instrument.invoke is None:
+                return context.run(self.function, *values)
+            return context.run(_instrument.invoke, self.function, values, {})
+        nargs = self.nargs
+        args = values[:nargs]
+        kwargs = dict(zip(self.kwnames, values[nargs:]))
+        if _instrument.invoke is None:
+            return context.run(self.function, *args, **kwargs)
+        return context.run(_instrument.invoke, self.function, args, kwargs)
+
+
+def make_applicator(function, nargs=0, kwnames=()):
+    """
+    Make an ``Applicator`` for calling ``function`` with ``nargs`` positional
+    arguments and the keyword arguments named by ``kwnames``.
+
+    Use this instead of ``txapply`` in hot loops::
+
+        apply_fetch = make_applicator(fetch, 2, ('timeout',))
+        d = apply_fetch(host, path, timeout)
+
+    is like ``txapply(fetch, host, path, timeout=timeout)``.
+
+    :raise TypeError: If ``function`` can't be called with that shape.
+    :rtype: Applicator
+    """
+    kwnames = tuple(kwnames)
+    error = call_shape_error(function, nargs, frozenset(kwnames))
+    if error is not None:
+        raise error
+    return Applicator(function, nargs, kwnames)
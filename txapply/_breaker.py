@@ -0,0 +1,162 @@
+"""
+A circuit breaker for functions applied with ``txapply``.
+"""
+
+from collections import deque
+from datetime import timedelta
+from functools import partial
+
+from twisted.internet.defer import fail, maybeDeferred
+from twisted.python.failure import Failure
+
+from . import _instrument
+from ._txapply import _abandon, _txapply_wrapper
+
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+
+class CircuitOpen(Exception):
+    """
+    Raised instead of calling a function when its circuit breaker is open.
+    """
+
+
+class CircuitBreaker(object):
+    """
+    Stops calling a function once too many calls to it fail or are slow,
+    and fails fast instead until it has had time to recover::
+
+        breaker = CircuitBreaker(reactor, slow_call=timedelta(seconds=2))
+        d = breaker.txapply(call_backend, request)
+
+    The breaker starts *closed*, and calls the function.  Once at least
+    ``min_calls`` of the last ``window`` calls have finished, and
+    ``failure_rate`` of them have failed or been slower than ``slow_call``,
+    the breaker *opens*.  While open, calls fail straight away with
+    ``CircuitOpen``.  After ``reset_timeout``, the breaker is *half-open*,
+    and lets ``trial_calls`` calls through at a time.  If one of those
+    succeeds, the breaker closes; if one fails, it opens again.  So that a
+    trial that never finishes can't keep the breaker half-open forever, one
+    that has run for longer than ``slow_call``, or ``reset_timeout`` if
+    there's no ``slow_call``, counts as failed once another call is made.
+
+    :ivar IReactorTime clock: Event loop that controls time.
+    :ivar float failure_rate: The fraction of bad calls that opens the
+        breaker.
+    :ivar int window: How many of the most recent calls to consider.
+    :ivar int min_calls: How many calls need to have finished before the
+        breaker can open.
+    :ivar Optional[timedelta] slow_call: If not ``None``, calls that take
+        longer than this count as bad, even if they succeed.
+    :ivar timedelta reset_timeout: How long the breaker stays open.
+    :ivar int trial_calls: How many calls to let through at once when
+        half-open.
+    :ivar on_state_change: If not ``None``, called with the old and new
+        states whenever the state changes.
+    :ivar str state: One of ``CLOSED``, ``OPEN`` or ``HALF_OPEN``.
+    """
+
+    def __init__(self, clock, failure_rate=0.5, window=20, min_calls=10,
+                 slow_call=None, reset_timeout=timedelta(seconds=30),
+                 trial_calls=1, on_state_change=None):
+        self.clock = clock
+        self.failure_rate = failure_rate
+        self.window = window
+        self.min_calls = min_calls
+        self.slow_call = slow_call
+        self.reset_timeout = reset_timeout
+        self.trial_calls = trial_calls
+        self.on_state_change = on_state_change
+        self.state = CLOSED
+        self._outcomes = deque(maxlen=window)
+        self._opened_at = None
+        # When each trial call since the breaker last went half-open started.
+        self._trials = []
+
+    def _set_state(self, state):
+        old, self.state = self.state, state
+        if state == OPEN:
+            self._opened_at = self.clock.seconds()
+        self._outcomes.clear()
+        self._trials = []
+        if self.on_state_change is not None and old != state:
+            self.on_state_change(old, state)
+
+    def allows(self):
+        """
+        Whether a call made now would be let through.
+        """
+        if self.state == OPEN:
+            elapsed = self.clock.seconds() - self._opened_at
+            if elapsed < self.reset_timeout.total_seconds():
+                return False
+            self._set_state(HALF_OPEN)
+        if self.state == HALF_OPEN:
+            trials = self._trials
+            if len(trials) < self.trial_calls:
+                return True
+            if self.slow_call is None:
+                timeout = self.reset_timeout
+            else:
+                timeout = self.slow_call
+            if self.clock.seconds() - trials[0] > timeout.total_seconds():
+                self._set_state(OPEN)
+            return False
+        return True
+
+    def call(self, function, *args, **kwargs):
+        """
+        Call ``function`` with ``args`` and ``kwargs``, unless the breaker is
+        open.
+
+        :return: A Deferred that fires with the result of ``function``, or
+            fails with ``CircuitOpen``.
+        """
+        if not self.allows():
+            return fail(CircuitOpen(function))
+        start = self.clock.seconds()
+        if self.state == HALF_OPEN:
+            trials = self._trials
+            trials.append(start)
+        else:
+            trials = None
+        d = maybeDeferred(_instrument.thunk(function, args, kwargs))
+        d.addBoth(self._finished, start, trials)
+        return d
+
+    def _finished(self, result, start, trials):
+        bad = isinstance(result, Failure)
+        if not bad and self.slow_call is not None:
+            elapsed = self.clock.seconds() - start
+            bad = elapsed > self.slow_call.total_seconds()
+        if trials is not None:
+            # Only decide on trials from the breaker's current half-open
+            # spell, not ones that were given up on.
+            if trials is self._trials:
+                self._set_state(OPEN if bad else CLOSED)
+        elif self.state == CLOSED:
+            self._outcomes.append(bad)
+            if (len(self._outcomes) >= self.min_calls and
+                    sum(self._outcomes) >=
+                    self.failure_rate * len(self._outcomes)):
+                self._set_state(OPEN)
+        return result
+
+    def txapply(self, function, *args, **kwargs):
+        """
+        Like ``txapply.txapply``, but only call ``function`` if the breaker
+        allows.
+
+        If the breaker is open when this is called, the arguments that
+        haven't fired are cancelled, and the result fails with
+        ``CircuitOpen`` straight away.  If it has opened by the time the
+        arguments have arrived, the result fails with ``CircuitOpen`` then.
+        """
+        if not self.allows():
+            _abandon(args + tuple(kwargs.values()))
+            return fail(CircuitOpen(function))
+        return _txapply_wrapper(
+            partial(self.call, function), *args, **kwargs)
@@ -0,0 +1,151 @@
+"""
+Limit how many calls run at once for each of many keys.
+"""
+
+from collections import deque
+from functools import partial
+
+from twisted.internet.defer import Deferred, maybeDeferred
+
+from . import _instrument
+from ._txapply import _txapply_wrapper
+
+
+class _Partition(object):
+    """
+    The calls for one key: how many are running, and those waiting to, and
+    whether waiting calls are being started.
+    """
+
+    __slots__ = ('running', 'waiting', 'draining')
+
+    def __init__(self):
+        self.running = 0
+        self.waiting = deque()
+        self.draining = False
+
+
+class _Waiter(object):
+    """
+    A call waiting for its key to have room, and, once started, its result.
+    """
+
+    __slots__ = ('result', 'thunk', 'started')
+
+    def __init__(self, thunk):
+        self.result = Deferred(self._cancel)
+        self.thunk = thunk
+        self.started = None
+
+    def _cancel(self, result):
+        if self.started is not None:
+            self.started.cancel()
+
+
+class KeyedLimiter(object):
+    """
+    Limits how many calls run at once separately for each key, such as a
+    tenant or host, so one key can't use up the capacity of the others::
+
+        limiter = KeyedLimiter(lambda request: request.tenant, limit=10)
+        d = limiter.txapply(handle, request_deferred)
+
+    Calls for a key that already has ``limit`` calls running wait in a
+    first-in, first-out queue for that key.  Keys are only remembered while
+    they have calls running or waiting, so there can be any number of keys.
+
+    :ivar key: Called with the arguments of each call, returns its key.
+    :ivar int limit: The most calls to run at once for each key.
+    """
+
+    def __init__(self, key, limit):
+        self.key = key
+        self.limit = limit
+        self._partitions = {}
+
+    def running(self, key):
+        """
+        How many calls are running for ``key``.
+        """
+        partition = self._partitions.get(key)
+        return 0 if partition is None else partition.running
+
+    def waiting(self, key):
+        """
+        How many calls are waiting to run for ``key``.
+        """
+        partition = self._partitions.get(key)
+        return 0 if partition is None else len(partition.waiting)
+
+    def __len__(self):
+        """
+        How many keys have calls running or waiting.
+        """
+        return len(self._partitions)
+
+    def call(self, function, *args, **kwargs):
+        """
+        Call ``function`` with ``args`` and ``kwargs`` once fewer than
+        ``limit`` calls are running for their key.
+
+        :return: A Deferred that fires with the result of ``function``.
+            Cancelling it while it's waiting takes it out of the queue;
+            cancelling it once it's running cancels the call.
+        """
+        key = self.key(*args, **kwargs)
+        partition = self._partitions.get(key)
+        if partition is None:
+            partition = self._partitions[key] = _Partition()
+        thunk = _instrument.thunk(function, args, kwargs)
+        # There can be room while calls are waiting, if this is called while
+        # they are being started, in which case this waits its turn.
+        if partition.running < self.limit and not partition.waiting:
+            return self._start(key, partition, thunk)
+        waiter = _Waiter(partial(_instrument.copy_context().run, thunk))
+        waiter.result.addErrback(self._cancelled, partition, waiter)
+        partition.waiting.append(waiter)
+        return waiter.result
+
+    def _start(self, key, partition, thunk):
+        partition.running += 1
+        d = maybeDeferred(thunk)
+        d.addBoth(self._finished, key, partition)
+        return d
+
+    def _finished(self, result, key, partition):
+        partition.running -= 1
+        if not partition.draining:
+            self._drain(key, partition)
+        return result
+
+    def _drain(self, key, partition):
+        # Start waiting calls in a loop, rather than each from the callback
+        # of the one before, so that a long queue of calls that finish
+        # straight away doesn't recurse.  Calls that finish while this runs
+        # only make room, and leave starting the next one to the loop.
+        partition.draining = True
+        waiting = partition.waiting
+        while waiting and partition.running < self.limit:
+            waiter = waiting.popleft()
+            waiter.started = self._start(key, partition, waiter.thunk)
+            waiter.started.chainDeferred(waiter.result)
+        partition.draining = False
+        if not partition.running and not waiting:
+            del self._partitions[key]
+
+    def _cancelled(self, failure, partition, waiter):
+        if waiter.started is None:
+            # Cancelled, or failed, while still queued.
+            partition.waiting.remove(waiter)
+        return failure
+
+    def txapply(self, function, *args, **kwargs):
+        """
+        Like ``txapply.txapply``, but limit the calls to ``function`` for the
+        key of its arguments.
+
+        Only calling ``function`` is limited, not waiting for the arguments,
+        which are also what the key is worked out from.
+        """
+        return _txapply_wrapper(
+            partial(self.call, function), *args, **kwargs)
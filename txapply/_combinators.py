@@ -2,8 +2,15 @@
 Helpers for adding callbacks and errbacks.
 """
 
+from collections import deque, namedtuple
 from functools import wraps
 
+from twisted.internet.defer import Deferred, maybeDeferred, succeed
+from twisted.python import log
+
+from . import _instrument
+from ._txapply import _gather_results, gather_dict
+
 
 def nop(*args, **kwargs):
     """
@@ -22,7 +29,10 @@ def transparent(value, function, *args, **kwargs):
         d.addCallback(transparent, print)
         d.addCallback(lambda x: x == 42)
     """
-    function(value, *args, **kwargs)
+    if _instrument.invoke is None:
+        function(value, *args, **kwargs)
+    else:
+        _instrument.invoke(function, (value,) + args, kwargs)
     return value
 
 
@@ -33,7 +43,10 @@ def transparently(function):
     """
     @wraps(function)
     def decorated(value, *args, **kwargs):
-        function(value, *args, **kwargs)
+        if _instrument.invoke is None:
+            function(value, *args, **kwargs)
+        else:
+            _instrument.invoke(function, (value,) + args, kwargs)
         return value
     return decorated
 
@@ -49,7 +62,9 @@ def ignore(value, function, *args, **kwargs):
        >>> d.addCallback(ignore, print, 37)
        37
     """
-    return function(*args, **kwargs)
+    if _instrument.invoke is None:
+        return function(*args, **kwargs)
+    return _instrument.invoke(function, args, kwargs)
 
 
 def ignored(function):
@@ -58,7 +73,9 @@ def ignored(function):
     """
     @wraps(function)
     def decorated(value, *args, **kwargs):
-        return function(*args, **kwargs)
+        if _instrument.invoke is None:
+            return function(*args, **kwargs)
+        return _instrument.invoke(function, args, kwargs)
     return decorated
 
 
@@ -77,7 +94,10 @@ def combine(value, function, *args, **kwargs):
         >>> d.addCallback(print)
         (37, 42)
     """
-    y = function(value, *args, **kwargs)
+    if _instrument.invoke is None:
+        y = function(value, *args, **kwargs)
+    else:
+        y = _instrument.invoke(function, (value,) + args, kwargs)
     return (y, value)
 
 
@@ -88,6 +108,345 @@ def combined(function):
     """
     @wraps(function)
     def decorated(value, *args, **kwargs):
-        y = function(value, *args, **kwargs)
+        if _instrument.invoke is None:
+            y = function(value, *args, **kwargs)
+        else:
+            y = _instrument.invoke(function, (value,) + args, kwargs)
         return (y, value)
     return decorated
+
+
+def fan_out(value, functions, *args, **kwargs):
+    """
+    Call each of ``functions`` at once, return a Deferred that fires with a
+    tuple of their results and ``value``.
+
+    Each function is invoked with ``value``, ``*args`` and ``**kwargs``.
+    They may return Deferreds, which are waited on together, rather than one
+    after the other.  If ``functions`` is a mapping, the results are a
+    dictionary with the same keys, otherwise they are a tuple in the same
+    order.
+
+    Use this like ``combine``, but for several functions::
+
+        >>> d = defer.succeed(42)
+        >>> d.addCallback(fan_out, {'user': get_user, 'history': get_history})
+        >>> d.addCallback(print)
+        ({'user': ..., 'history': ...}, 42)
+
+    If any function fails, the Deferred fails.
+    """
+    if hasattr(functions, 'items'):
+        d = gather_dict({
+            key: maybeDeferred(
+                _instrument.thunk(function, (value,) + args, kwargs))
+            for key, function in functions.items()})
+    else:
+        d = _gather_results([
+            maybeDeferred(
+                _instrument.thunk(function, (value,) + args, kwargs))
+            for function in functions])
+        d.addCallback(tuple)
+    d.addCallback(lambda results: (results, value))
+    return d
+
+
+def _name(function):
+    """
+    Get a readable name for ``function``.
+    """
+    name = getattr(function, '__qualname__', None)
+    if name is None:
+        name = getattr(function, '__name__', None)
+    if name is None:
+        return repr(function)
+    module = getattr(function, '__module__', None)
+    if module is None:
+        return name
+    return '{}.{}'.format(module, name)
+
+
+class _Wrapper(object):
+    """
+    Base class for callable objects that wrap a function.
+
+    Unlike the closures made by the decorators, these are cheap to build,
+    can be pickled if ``function`` can, and have a readable ``repr``.
+    """
+
+    __slots__ = ('function',)
+
+    def __init__(self, function):
+        self.function = function
+
+    def __reduce__(self):
+        return (type(self), (self.function,))
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.function == other.function
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((type(self), self.function))
+
+    def __repr__(self):
+        return '{}({})'.format(type(self).__name__, _name(self.function))
+
+
+class Transparently(_Wrapper):
+    """
+    Call ``function``, but return the first parameter.
+
+    Behaves like ``transparently(function)``.
+    """
+
+    __slots__ = ()
+
+    def __call__(self, value, *args, **kwargs):
+        if _instrument.invoke is None:
+            self.function(value, *args, **kwargs)
+        else:
+            _instrument.invoke(self.function, (value,) + args, kwargs)
+        return value
+
+
+class Ignored(_Wrapper):
+    """
+    Call ``function`` without the first parameter.
+
+    Behaves like ``ignored(function)``.
+    """
+
+    __slots__ = ()
+
+    def __call__(self, value, *args, **kwargs):
+        if _instrument.invoke is None:
+            return self.function(*args, **kwargs)
+        return _instrument.invoke(self.function, args, kwargs)
+
+
+class Combined(_Wrapper):
+    """
+    Call ``function``, return a tuple of its return value and its first
+    parameter.
+
+    Behaves like ``combined(function)``.
+    """
+
+    __slots__ = ()
+
+    def __call__(self, value, *args, **kwargs):
+        if _instrument.invoke is None:
+            return (self.function(value, *args, **kwargs), value)
+        return (
+            _instrument.invoke(self.function, (value,) + args, kwargs),
+            value)
+
+
+Step = namedtuple('Step', 'combinator function args kwargs')
+"""
+A step of a pipeline: a callback that would have been added with
+``d.addCallback(combinator, function, *args, **kwargs)``.
+"""
+
+
+def step(combinator, function, *args, **kwargs):
+    """
+    Make a ``Step`` for ``pipeline``.
+    """
+    return Step(combinator, function, args, kwargs)
+
+
+_TRANSPARENT, _IGNORE, _COMBINE, _OTHER = range(4)
+
+_KINDS = {
+    transparent: _TRANSPARENT,
+    ignore: _IGNORE,
+    combine: _COMBINE,
+}
+
+
+def pipeline(steps):
+    """
+    Compile ``steps`` into a single callback that runs them in order.
+
+    Adding the result as a callback::
+
+        d.addCallback(pipeline([
+            step(transparent, log),
+            step(ignore, fetch, 37),
+            step(combine, parse),
+        ]))
+
+    has the same effect as adding each step as a separate callback::
+
+        d.addCallback(transparent, log)
+        d.addCallback(ignore, fetch, 37)
+        d.addCallback(combine, parse)
+
+    but without the cost of each callback going through the Deferred.
+    ``transparent``, ``ignore`` and ``combine`` are run inline; any other
+    combinator is called as it would be by ``addCallback``.  If a step
+    returns a Deferred, the rest of the steps are added as callbacks to it.
+
+    :param Sequence[Step] steps: The steps to run.
+    :return: A callback that takes a single value.
+    """
+    compiled = tuple(
+        (_KINDS.get(combinator, _OTHER), combinator, function, args, kwargs)
+        for combinator, function, args, kwargs in steps)
+    count = len(compiled)
+
+    def run(value, start=0):
+        for i in range(start, count):
+            kind, combinator, function, args, kwargs = compiled[i]
+            invoke = _instrument.invoke
+            if kind == _TRANSPARENT:
+                if invoke is None:
+                    function(value, *args, **kwargs)
+                else:
+                    invoke(function, (value,) + args, kwargs)
+                continue
+            elif kind == _IGNORE:
+                if invoke is None:
+                    value = function(*args, **kwargs)
+                else:
+                    value = invoke(function, args, kwargs)
+            elif kind == _COMBINE:
+                if invoke is None:
+                    value = (function(value, *args, **kwargs), value)
+                else:
+                    value = (invoke(function, (value,) + args, kwargs), value)
+                continue
+            else:
+                value = combinator(value, function, *args, **kwargs)
+            if isinstance(value, Deferred):
+                # Carry on in the context the pipeline was running in, not
+                # whichever one the Deferred fires in.
+                return value.addCallback(
+                    resume, _instrument.copy_context(), i + 1)
+        return value
+
+    def resume(value, context, start):
+        return context.run(run, value, start)
+    return run
+
+
+def _log_failure(failure):
+    log.err(failure, 'Background side effect failed')
+
+
+class BackgroundEffects(object):
+    """
+    Run side effects without waiting for them, like ``transparent`` for
+    functions that return Deferreds.
+
+    At most ``max_pending`` side effects are running at once.  When that
+    many are running, new ones are either dropped (and counted in ``shed``)
+    or, if ``block`` is true, the callback chain waits until there's room
+    for them::
+
+        audit = BackgroundEffects(max_pending=1000)
+        d.addCallback(audit.transparent, write_audit_log, user)
+        ...
+        audit.drain().addCallback(lambda ignored: reactor.stop())
+
+    :ivar int max_pending: The most side effects that can be running at once.
+    :ivar bool block: Whether to wait for room for a side effect, rather than
+        dropping it.
+    :ivar on_failure: Called with the ``Failure`` of each side effect that
+        fails.  By default, these are logged.
+    :ivar int pending: How many side effects are running.
+    :ivar int shed: How many side effects have been dropped.
+    """
+
+    def __init__(self, max_pending=100, block=False, on_failure=None):
+        self.max_pending = max_pending
+        self.block = block
+        if on_failure is None:
+            on_failure = _log_failure
+        self.on_failure = on_failure
+        self.pending = 0
+        self.shed = 0
+        self._waiting = deque()
+        self._resuming = False
+        self._draining = []
+
+    def transparent(self, value, function, *args, **kwargs):
+        """
+        Start ``function`` with ``value`` and other arguments, return
+        ``value`` without waiting for it to finish.
+
+        If there's no room for ``function``, it is dropped, unless ``block``
+        is true, in which case a Deferred is returned that fires with
+        ``value`` once ``function`` has been started.
+        """
+        # There can be room while side effects are waiting, if this is
+        # called while they are being started, in which case this waits its
+        # turn.
+        if self.pending < self.max_pending and not self._waiting:
+            self._start(function, value, args, kwargs)
+            return value
+        if not self.block:
+            self.shed += 1
+            return value
+        d = Deferred()
+        self._waiting.append(
+            (_instrument.copy_context(), d, function, value, args, kwargs))
+        return d
+
+    def transparently(self, function):
+        """
+        Wrap ``function`` so that it is started in the background, and the
+        first parameter is returned.
+        """
+        @wraps(function)
+        def decorated(value, *args, **kwargs):
+            return self.transparent(value, function, *args, **kwargs)
+        return decorated
+
+    def drain(self):
+        """
+        Get a Deferred that fires with ``None`` once all the side effects that
+        have been started or are waiting to start have finished.
+        """
+        if not self.pending and not self._waiting:
+            return succeed(None)
+        d = Deferred()
+        self._draining.append(d)
+        return d
+
+    def _start(self, function, value, args, kwargs):
+        self.pending += 1
+        d = maybeDeferred(
+            _instrument.thunk(function, (value,) + args, kwargs))
+        d.addErrback(self.on_failure)
+        d.addBoth(self._finished)
+
+    def _resume(self, d, function, value, args, kwargs):
+        self._start(function, value, args, kwargs)
+        d.callback(value)
+
+    def _finished(self, ignored):
+        self.pending -= 1
+        if not self._resuming:
+            self._resume_waiting()
+
+    def _resume_waiting(self):
+        # Start waiting side effects in a loop, rather than each from the
+        # callback of the one before, so that a long queue of side effects
+        # that finish straight away doesn't recurse.  Side effects that
+        # finish while this runs only make room, and leave starting the next
+        # one to the loop.
+        self._resuming = True
+        waiting = self._waiting
+        while waiting and self.pending < self.max_pending:
+            context, d, function, value, args, kwargs = waiting.popleft()
+            context.run(self._resume, d, function, value, args, kwargs)
+        self._resuming = False
+        if not self.pending and not waiting:
+            draining, self._draining = self._draining, []
+            for d in draining:
+                d.callback(None)
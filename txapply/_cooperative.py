@@ -0,0 +1,90 @@
+"""
+Gather very large dictionaries without blocking the reactor.
+"""
+
+from itertools import islice
+
+from twisted.internet import task
+from twisted.internet.defer import succeed
+
+from ._txapply import _Gather
+
+
+def sliced_cooperator(budget, clock=None):
+    """
+    Make a ``Cooperator`` that runs its tasks for at most ``budget`` before
+    yielding to the reactor.
+
+    :param timedelta budget: How long to run for each time.
+    :param IReactorTime clock: Event loop that controls time.  Defaults to
+        the global reactor.
+    :rtype: task.Cooperator
+    """
+    if clock is None:
+        from twisted.internet import reactor as clock
+    seconds = budget.total_seconds()
+
+    def deadline():
+        end = clock.seconds() + seconds
+        return lambda: clock.seconds() >= end
+
+    return task.Cooperator(
+        terminationPredicateFactory=deadline,
+        scheduler=lambda work: clock.callLater(0, work))
+
+
+def _assemble(result, items, chunk_size):
+    """
+    Add ``chunk_size`` of ``items`` to ``result`` at a time, yielding
+    between chunks.
+    """
+    while True:
+        before = len(result)
+        result.update(islice(items, chunk_size))
+        if len(result) == before:
+            return
+        yield
+
+
+def gather_dict_cooperatively(deferred_dict, cooperator=None,
+                              chunk_size=1000):
+    """
+    Gather a dictionary with Deferred values into a single Deferred, without
+    blocking the reactor while building the result.
+
+    Like ``gather_dict``, except that once every value has arrived, the
+    resulting dictionary is built ``chunk_size`` keys at a time by
+    ``cooperator``, which gives the reactor a chance to run between chunks.
+    Use this for dictionaries with hundreds of thousands of keys.
+
+    :param Map[A, Deferred[B]] deferred_dict: A dictionary with Deferred
+        values.
+    :param Optional[task.Cooperator] cooperator: Runs the chunks.  Defaults
+        to the global cooperator, which runs for about 10ms at a time.  Use
+        ``sliced_cooperator`` to make one with a different budget.
+    :param int chunk_size: How many keys to add between checks of the
+        cooperator's budget.
+    :raise ValueError: If ``chunk_size`` is less than 1.
+    :rtype: Deferred[Map[A, B]]
+    """
+    if chunk_size < 1:
+        # Empty chunks would end the result before anything was added.
+        raise ValueError(
+            'chunk_size must be at least 1, got {}'.format(chunk_size))
+    if not deferred_dict:
+        return succeed({})
+    if cooperator is None:
+        cooperate = task.cooperate
+    else:
+        cooperate = cooperator.cooperate
+    keys = list(deferred_dict)
+    d = _Gather(deferred_dict.values(), len(keys)).result
+
+    def got_results(real_values):
+        result = {}
+        steps = _assemble(result, zip(keys, real_values), chunk_size)
+        assembled = cooperate(steps).whenDone()
+        assembled.addCallback(lambda ignored: result)
+        return assembled
+    d.addCallback(got_results)
+    return d
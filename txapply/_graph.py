@@ -0,0 +1,308 @@
+"""
+Run a graph of functions whose arguments are the results of other functions.
+"""
+
+from collections import OrderedDict
+
+from twisted.internet.defer import (
+    Deferred,
+    DeferredLock,
+    DeferredSemaphore,
+    fail,
+    maybeDeferred,
+    succeed,
+)
+from twisted.python.failure import Failure
+
+from ._txapply import gather_dict, txapply
+
+
+class CycleError(ValueError):
+    """
+    Raised when a graph has a cycle in its dependencies.
+    """
+
+
+class UnknownDependency(KeyError):
+    """
+    Raised when a node in a graph depends on a node that isn't in the graph.
+    """
+
+
+_PENDING = object()
+
+
+class _Result(object):
+    """
+    The eventual result of a Deferred, which can be observed many times.
+
+    A Deferred has a single callback chain, so adding callbacks to it for
+    each of several dependents would pass the value of one dependent's
+    callbacks to the next. Instead, each dependent gets its own Deferred from
+    ``observe``.
+    """
+
+    def __init__(self, deferred):
+        self._result = _PENDING
+        self._observers = []
+        deferred.addBoth(self._fire)
+
+    def _fire(self, result):
+        self._result = result
+        observers, self._observers = self._observers, None
+        for observer in observers:
+            if isinstance(result, Failure):
+                observer.errback(result)
+            else:
+                observer.callback(result)
+
+    def observe(self):
+        """
+        Get a new Deferred that fires with the result.
+        """
+        if self._result is _PENDING:
+            d = Deferred()
+            self._observers.append(d)
+            return d
+        if isinstance(self._result, Failure):
+            return fail(self._result)
+        return succeed(self._result)
+
+
+def topological_order(graph):
+    """
+    Order the nodes of ``graph`` so every node comes after its dependencies.
+
+    :param Map[A, Tuple[Callable, Sequence[A]]] graph: A graph, as given to
+        ``gather_graph``.
+    :raise UnknownDependency: If a node depends on a node that isn't in
+        ``graph``.
+    :raise CycleError: If the graph has any cycles.
+    :rtype: List[A]
+    """
+    waiting = {}
+    dependents = {name: [] for name in graph}
+    for name, (function, dependencies) in graph.items():
+        for dependency in dependencies:
+            if dependency not in graph:
+                raise UnknownDependency(name, dependency)
+            dependents[dependency].append(name)
+        waiting[name] = len(dependencies)
+    ready = [name for name, count in waiting.items() if count == 0]
+    order = []
+    while ready:
+        name = ready.pop()
+        order.append(name)
+        for dependent in dependents[name]:
+            waiting[dependent] -= 1
+            if waiting[dependent] == 0:
+                ready.append(dependent)
+    if len(order) != len(graph):
+        raise CycleError(
+            sorted(name for name, count in waiting.items() if count))
+    return order
+
+
+def _limited(semaphore, function):
+    """
+    Wrap ``function`` so that it's only run when ``semaphore`` allows.
+    """
+    if semaphore is None:
+        return function
+
+    def run(*args):
+        return semaphore.run(function, *args)
+    return run
+
+
+def gather_graph(graph, max_concurrency=None):
+    """
+    Call every function in a dependency graph, feeding each function the
+    results of the ones it depends on.
+
+    Each node is called as soon as all of its dependencies have fired, so
+    independent branches of the graph run in parallel::
+
+        gather_graph({
+            'user': (get_user, ()),
+            'history': (get_history, ('user',)),
+            'profile': (get_profile, ('user',)),
+            'recommendations': (recommend, ('profile', 'history')),
+        })
+
+    If any function fails, returns a Deferred that fails.
+
+    :param Map[A, Tuple[Callable, Sequence[A]]] graph: Maps node names to a
+        function and the names of the nodes whose results it is called with,
+        in order.
+    :param Optional[int] max_concurrency: If given, the most functions that
+        can be running at once.
+    :raise UnknownDependency: If a node depends on a node that isn't in
+        ``graph``.
+    :raise CycleError: If the graph has any cycles.
+    :return: A Deferred that fires with a dictionary of node names mapped to
+        the results of their functions.
+    :rtype: Deferred[Map[A, B]]
+    """
+    order = topological_order(graph)
+    semaphore = None
+    if max_concurrency is not None:
+        semaphore = DeferredSemaphore(max_concurrency)
+    results = {}
+    for name in order:
+        function, dependencies = graph[name]
+        inputs = [results[dependency].observe()
+                  for dependency in dependencies]
+        results[name] = _Result(
+            txapply(_limited(semaphore, function), *inputs))
+    return gather_dict(
+        {name: result.observe() for name, result in results.items()})
+
+
+class IncrementalGraph(object):
+    """
+    A graph that can be evaluated many times, only calling the functions
+    whose inputs have changed since the last evaluation.
+
+    The graph is like the one given to ``gather_graph``, except that nodes
+    may also depend on named *inputs*, whose values are given each time the
+    graph is evaluated::
+
+        graph = IncrementalGraph({
+            'totals': (sum_by_region, ('orders',)),
+            'chart': (draw_chart, ('totals', 'style')),
+        }, inputs=('orders', 'style'))
+        graph.evaluate({'orders': orders, 'style': 'dark'})
+
+    An input has changed if it isn't equal to its value from the previous
+    evaluation or, if ``version`` is given, if ``version(value)`` isn't
+    equal to what it was.  A function is only called if one of its
+    dependencies has changed, otherwise its last result is reused.  If a
+    function is called and returns a result equal to its last one, then the
+    nodes that depend on it count as unchanged.
+
+    Evaluations happen one at a time, in the order that ``evaluate`` is
+    called.
+
+    :ivar Map[A, Tuple[Callable, Sequence[A]]] graph: The functions in the
+        graph.
+    :ivar Optional[int] max_concurrency: If not ``None``, the most functions
+        that can be running at once.
+    :ivar Optional[int] max_retained: If not ``None``, the most node results
+        to keep between evaluations.  The least recently used are discarded
+        first, and recomputed when next needed.
+    :ivar Optional[Callable[[B], C]] version: Gets a version stamp from an
+        input value.
+    """
+
+    def __init__(self, graph, inputs=(), max_concurrency=None,
+                 max_retained=None, version=None):
+        self.graph = graph
+        self.inputs = frozenset(inputs)
+        overlap = self.inputs.intersection(graph)
+        if overlap:
+            raise ValueError(
+                'Inputs are also nodes in the graph', sorted(overlap))
+        whole = dict.fromkeys(self.inputs, (None, ()))
+        whole.update(graph)
+        self._order = [
+            name for name in topological_order(whole) if name in graph]
+        self.max_concurrency = max_concurrency
+        self.max_retained = max_retained
+        self.version = version
+        self._semaphore = None
+        if max_concurrency is not None:
+            self._semaphore = DeferredSemaphore(max_concurrency)
+        self._lock = DeferredLock()
+        self._generation = 0
+        # Maps input names to (stamp, generation).
+        self._stamps = {}
+        # Maps node names to (key, generation, value), oldest use first.
+        self._retained = OrderedDict()
+
+    def _next_generation(self):
+        self._generation += 1
+        return self._generation
+
+    def evaluate(self, inputs):
+        """
+        Evaluate the graph with new input values.
+
+        :param Map[A, B] inputs: The value of every input.
+        :raise ValueError: If ``inputs`` doesn't have exactly the inputs of
+            the graph.
+        :return: A Deferred that fires with a dictionary of node names mapped
+            to their results, or fails if any function fails.
+        :rtype: Deferred[Map[A, C]]
+        """
+        if set(inputs) != self.inputs:
+            raise ValueError(
+                'Wrong inputs', sorted(self.inputs.symmetric_difference(
+                    inputs)))
+        return self._lock.run(self._evaluate, inputs)
+
+    def _evaluate(self, inputs):
+        results = {}
+        for name, value in inputs.items():
+            stamp = value if self.version is None else self.version(value)
+            previous = self._stamps.get(name)
+            if previous is not None and previous[0] == stamp:
+                generation = previous[1]
+            else:
+                generation = self._next_generation()
+                self._stamps[name] = (stamp, generation)
+            results[name] = _Result(succeed((generation, value)))
+        for name in self._order:
+            function, dependencies = self.graph[name]
+            node = txapply(
+                self._make_node(name, function),
+                *[results[dependency].observe()
+                  for dependency in dependencies])
+            results[name] = _Result(node)
+        d = gather_dict(
+            {name: results[name].observe() for name in self._order})
+        d.addCallback(
+            lambda nodes: {name: value
+                           for name, (generation, value) in nodes.items()})
+        d.addBoth(self._discard)
+        return d
+
+    def _make_node(self, name, function):
+        """
+        Make the function for an evaluation of the node called ``name``.
+
+        It takes the ``(generation, value)`` pairs of the node's
+        dependencies, and returns a Deferred that fires with the node's own
+        ``(generation, value)``.
+        """
+        def node(*arguments):
+            key = tuple(generation for generation, value in arguments)
+            retained = self._retained.pop(name, None)
+            if retained is not None and retained[0] == key:
+                self._retained[name] = retained
+                return succeed(retained[1:])
+            values = [value for generation, value in arguments]
+            if self._semaphore is None:
+                d = maybeDeferred(function, *values)
+            else:
+                d = self._semaphore.run(function, *values)
+            d.addCallback(self._store, name, key, retained)
+            return d
+        return node
+
+    def _store(self, value, name, key, previous):
+        if previous is not None and previous[2] == value:
+            generation = previous[1]
+        else:
+            generation = self._next_generation()
+        self._retained[name] = (key, generation, value)
+        return (generation, value)
+
+    def _discard(self, result):
+        """
+        Discard the least recently used results beyond ``max_retained``.
+        """
+        if self.max_retained is not None:
+            while len(self._retained) > self.max_retained:
+                self._retained.popitem(last=False)
+        return result
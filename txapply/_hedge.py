@@ -0,0 +1,168 @@
+"""
+Hedged requests: start backup calls when a call is slow, take the first to
+succeed.
+"""
+
+from twisted.internet.defer import Deferred, maybeDeferred
+
+from . import _instrument
+from ._txapply import _txapply_wrapper
+
+
+class HedgeStats(object):
+    """
+    How hedged calls have gone.
+
+    :ivar int calls: How many calls have been made.
+    :ivar int hedges: How many backup calls have been started.
+    :ivar int primary_wins: How many calls were won by the first attempt.
+    :ivar int hedge_wins: How many calls were won by a backup.
+    :ivar int failures: How many calls failed.
+    :ivar int over_budget: How many backups weren't started because of the
+        budget.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.hedges = 0
+        self.primary_wins = 0
+        self.hedge_wins = 0
+        self.failures = 0
+        self.over_budget = 0
+
+    def __repr__(self):
+        return (
+            '<HedgeStats calls={} hedges={} primary_wins={} hedge_wins={} '
+            'failures={} over_budget={}>'.format(
+                self.calls, self.hedges, self.primary_wins, self.hedge_wins,
+                self.failures, self.over_budget))
+
+
+class _HedgedCall(object):
+    """
+    One hedged call: its attempts, and the timer for the next one.
+    """
+
+    def __init__(self, hedger, thunk):
+        self.result = Deferred(self._cancel)
+        self._hedger = hedger
+        self._thunk = thunk
+        self._attempts = []
+        self._pending = 0
+        self._timer = None
+        self._done = False
+        # Backups are started by the clock, so start them in the context the
+        # call was made in.
+        self._context = _instrument.copy_context()
+        self._start()
+
+    def _start(self):
+        index = len(self._attempts)
+        d = maybeDeferred(self._thunk)
+        self._attempts.append(d)
+        self._pending += 1
+        if not self._done and index < self._hedger.max_hedges:
+            self._timer = self._hedger.clock.callLater(
+                self._hedger.delay.total_seconds(), self._hedge)
+        d.addCallbacks(self._succeeded, self._failed, callbackArgs=(index,))
+
+    def _hedge(self):
+        self._timer = None
+        if self._hedger._spend():
+            self._context.run(self._start)
+
+    def _succeeded(self, value, index):
+        self._pending -= 1
+        if self._done:
+            return
+        self._finish()
+        if index:
+            self._hedger.stats.hedge_wins += 1
+        else:
+            self._hedger.stats.primary_wins += 1
+        self.result.callback(value)
+
+    def _failed(self, failure):
+        self._pending -= 1
+        if self._done or self._pending:
+            return
+        self._finish()
+        self._hedger.stats.failures += 1
+        self.result.errback(failure)
+
+    def _finish(self):
+        self._done = True
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        attempts, self._attempts = self._attempts, []
+        for attempt in attempts:
+            if not attempt.called:
+                attempt.cancel()
+
+    def _cancel(self, result):
+        self._finish()
+
+
+class Hedger(object):
+    """
+    Makes hedged calls: if a call hasn't finished after ``delay``, start
+    another one just like it, and take whichever succeeds first::
+
+        hedger = Hedger(reactor, timedelta(milliseconds=50))
+        d = hedger.txapply(fetch, key_deferred)
+
+    Once a call succeeds, the others are cancelled.  A call only fails once
+    every attempt that was started has failed.
+
+    :ivar IReactorTime clock: Event loop that controls time.
+    :ivar timedelta delay: How long to wait for an attempt before starting
+        the next.
+    :ivar int max_hedges: The most backups to start for each call.
+    :ivar float budget: The most backups to start, as a fraction of all
+        calls.  For example, with ``0.05``, at most one call in twenty gets
+        a backup.
+    :ivar HedgeStats stats: How the hedged calls have gone.
+    """
+
+    def __init__(self, clock, delay, max_hedges=1, budget=0.05):
+        self.clock = clock
+        self.delay = delay
+        self.max_hedges = max_hedges
+        self.budget = budget
+        self.stats = HedgeStats()
+
+    def _spend(self):
+        """
+        Record a backup, if the budget allows.
+
+        :return: Whether the budget allows it.
+        """
+        if self.stats.hedges + 1 > self.budget * self.stats.calls:
+            self.stats.over_budget += 1
+            return False
+        self.stats.hedges += 1
+        return True
+
+    def hedge(self, thunk):
+        """
+        Call ``thunk`` with no arguments, and again each time ``delay``
+        passes without a success, up to ``max_hedges`` more times.
+
+        :return: A Deferred that fires with the result of the first call to
+            succeed.
+        """
+        self.stats.calls += 1
+        return _HedgedCall(self, thunk).result
+
+    def txapply(self, function, *args, **kwargs):
+        """
+        Like ``txapply.txapply``, but hedge the call to ``function``.
+
+        The arguments are only waited for once, and each attempt calls
+        ``function`` with the same values.
+        """
+        def hedged(*real_args, **real_kwargs):
+            return self.hedge(
+                _instrument.thunk(function, real_args, real_kwargs))
+        return _txapply_wrapper(hedged, *args, **kwargs)
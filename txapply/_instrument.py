@@ -0,0 +1,79 @@
+"""
+How txapply and the combinators call functions: the hook for instruments,
+and the context to call them in.
+"""
+
+from functools import partial
+
+try:
+    from contextvars import copy_context
+except ImportError:
+    class _NoContext(object):
+        """
+        Stands in for a ``contextvars.Context`` where there are none.
+        """
+
+        def run(self, function, *args, **kwargs):
+            return function(*args, **kwargs)
+
+    _NO_CONTEXT = _NoContext()
+
+    def copy_context():
+        return _NO_CONTEXT
+
+# Either None, or a function that txapply and the combinators call with
+# ``function``, ``args`` and ``kwargs`` instead of calling
+# ``function(*args, **kwargs)`` themselves.  It makes that call, through
+# each of the installed hooks in turn, and returns its result.  Call sites
+# check for None inline, so that there's next to no cost when nothing is
+# installed.
+invoke = None
+
+# The installed hooks, the first installed innermost.
+_hooks = []
+
+
+def _call(function, args, kwargs):
+    return function(*args, **kwargs)
+
+
+def _chain():
+    global invoke
+    chain = None
+    for hook in _hooks:
+        chain = partial(hook, _call if chain is None else chain)
+    invoke = chain
+
+
+def install(hook):
+    """
+    Have txapply and the combinators call functions through ``hook``.
+
+    :param hook: Called with a function to carry on with, and the
+        ``function``, ``args`` and ``kwargs`` of each call.  It has to carry
+        on with the call by passing those to the function, and return its
+        result.
+    """
+    _hooks.append(hook)
+    _chain()
+
+
+def uninstall(hook):
+    """
+    Stop calling functions through ``hook``, however many hooks have been
+    installed since.
+    """
+    _hooks.remove(hook)
+    _chain()
+
+
+def thunk(function, args, kwargs):
+    """
+    Make a function that takes no arguments, and calls ``function`` with
+    ``args`` and ``kwargs`` through ``invoke``, if it is installed.
+
+    For call sites that call ``function`` via ``maybeDeferred``.
+    """
+    if invoke is None:
+        return partial(function, *args, **kwargs)
+    return partial(invoke, function, args, kwargs)
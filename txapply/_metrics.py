@@ -0,0 +1,241 @@
+"""
+Latency and gather size metrics, with an exporter for Prometheus.
+"""
+
+from functools import partial
+from sys import maxsize
+from timeit import default_timer
+
+from twisted.internet.defer import maybeDeferred
+
+from . import _instrument
+from ._combinators import _name
+from ._profile import _caller
+from ._txapply import _txapply_wrapper, gather_dict
+
+
+class Histogram(object):
+    """
+    A histogram with buckets that get wider as values get bigger, so that
+    every value is recorded to within the same relative error, using a
+    fixed amount of memory.
+
+    Like an HDR histogram, values are counted in whole multiples of
+    ``unit``.  Up to ``2 ** significant_bits`` units, each bucket holds one
+    value.  Beyond that, each power of two is split into
+    ``2 ** (significant_bits - 1)`` buckets, so values are only known to
+    within about ``1 / 2 ** (significant_bits - 1)`` of themselves.  Values
+    above ``highest`` are counted as ``highest``.
+
+    Recording a value adds one to a bucket, and adds the value to ``total``.
+
+    :ivar float unit: The smallest difference between values that is
+        recorded.
+    :ivar float highest: The highest value that is recorded as itself.
+    :ivar int significant_bits: How many bits of each value are kept.
+    :ivar float total: The sum of the values recorded.
+    """
+
+    def __init__(self, unit=1e-6, highest=60.0, significant_bits=7):
+        self.unit = unit
+        self.highest = highest
+        self.significant_bits = significant_bits
+        self.total = 0.0
+        self._scale = 1.0 / unit
+        self._linear = 1 << significant_bits
+        self._half = self._linear >> 1
+        self._last = maxsize
+        self._last = self._index(highest)
+        self._counts = [0] * (self._last + 1)
+
+    def _index(self, value):
+        units = int(value * self._scale)
+        if units < self._linear:
+            return units if units > 0 else 0
+        shift = units.bit_length() - self.significant_bits
+        index = self._linear + (shift - 1) * self._half + (
+            (units >> shift) - self._half)
+        return index if index < self._last else self._last
+
+    def _bounds(self, index):
+        """
+        The lowest value in bucket ``index``, and the lowest value in the
+        next bucket, in units.
+        """
+        if index < self._linear:
+            return index, index + 1
+        shift, offset = divmod(index - self._linear, self._half)
+        shift += 1
+        lowest = (offset + self._half) << shift
+        return lowest, lowest + (1 << shift)
+
+    def record(self, value):
+        """
+        Record ``value``.
+        """
+        self._counts[self._index(value)] += 1
+        self.total += value
+
+    @property
+    def count(self):
+        """
+        How many values have been recorded.
+        """
+        return sum(self._counts)
+
+    def quantile(self, q):
+        """
+        Estimate the value that ``q`` of the values are at or below.
+
+        :param float q: Between 0 and 1.  For example, 0.99 for the 99th
+            percentile.
+        :return: That value, in whole ``unit``, if it's below
+            ``2 ** significant_bits`` units, where each bucket holds one
+            value; otherwise the middle of the bucket it's in.  0 if nothing
+            has been recorded.
+        """
+        rank = max(1, int(q * self.count + 0.5))
+        seen = 0
+        for index, count in enumerate(self._counts):
+            seen += count
+            if seen >= rank:
+                lowest, next_lowest = self._bounds(index)
+                if index < self._linear:
+                    return lowest * self.unit
+                return (lowest + next_lowest) / 2.0 * self.unit
+        return 0.0
+
+    def buckets(self):
+        """
+        Get the buckets that aren't empty.
+
+        :return: ``(lowest, highest, count)`` for each bucket with values in
+            it, with the lowest values first.  Values from ``lowest`` up to,
+            but not including, ``highest`` are counted in the bucket.
+        :rtype: List[Tuple[float, float, int]]
+        """
+        return [
+            tuple(bound * self.unit for bound in self._bounds(index)) +
+            (count,)
+            for index, count in enumerate(self._counts) if count]
+
+
+def _escape(value):
+    return (
+        str(value).replace('\\', '\\\\').replace('"', '\\"')
+        .replace('\n', '\\n'))
+
+
+class Metrics(object):
+    """
+    Records how long applied functions take, and how big gathers are.
+
+    Use its ``txapply`` and ``gather_dict`` instead of the ordinary ones for
+    the applications and gathers you want to measure::
+
+        metrics = Metrics()
+        d = metrics.txapply(fetch, url_deferred)
+        d = metrics.txapply_labelled('render', render, page_deferred)
+        ...
+        with open('/var/lib/node_exporter/txapply.prom', 'w') as f:
+            metrics.write_prometheus(f)
+
+    :ivar timer: Called with no arguments, returns the time in seconds.
+    :ivar Sequence[float] quantiles: The quantiles to export.
+    :ivar Map[str, Histogram] latencies: Maps the labels of applications to
+        how many seconds their functions took, from being called until
+        their results fired.
+    :ivar Map[str, Histogram] gather_sizes: Maps the labels of gathers to
+        how many inputs they had.
+    """
+
+    def __init__(self, timer=default_timer, quantiles=(0.5, 0.99, 0.999)):
+        self.timer = timer
+        self.quantiles = quantiles
+        self.latencies = {}
+        self.gather_sizes = {}
+
+    def _latency(self, label):
+        histogram = self.latencies.get(label)
+        if histogram is None:
+            histogram = self.latencies[label] = Histogram()
+        return histogram
+
+    def _call(self, histogram, function, *args, **kwargs):
+        started = self.timer()
+        d = maybeDeferred(_instrument.thunk(function, args, kwargs))
+        d.addBoth(self._finished, histogram, started)
+        return d
+
+    def _finished(self, result, histogram, started):
+        histogram.record(self.timer() - started)
+        return result
+
+    def txapply(self, function, *args, **kwargs):
+        """
+        Like ``txapply.txapply``, but record how long ``function`` takes,
+        labelled with its qualified name.
+        """
+        return self.txapply_labelled(
+            _name(function), function, *args, **kwargs)
+
+    def txapply_labelled(self, label, function, *args, **kwargs):
+        """
+        Like ``txapply.txapply``, but record how long ``function`` takes,
+        labelled with ``label``.
+        """
+        return _txapply_wrapper(
+            partial(self._call, self._latency(label), function),
+            *args, **kwargs)
+
+    def gather_dict(self, deferred_dict, label=None):
+        """
+        Like ``txapply.gather_dict``, but record how many inputs there are.
+
+        :param Optional[str] label: What to record the gather as.  If not
+            given, the module, function and line that called
+            ``gather_dict``.
+        """
+        if label is None:
+            label = _caller(1)
+        histogram = self.gather_sizes.get(label)
+        if histogram is None:
+            histogram = self.gather_sizes[label] = Histogram(
+                unit=1, highest=10 ** 9)
+        histogram.record(len(deferred_dict))
+        return gather_dict(deferred_dict)
+
+    def prometheus(self, prefix='txapply'):
+        """
+        Render the metrics in the Prometheus text format, as summaries.
+
+        :param str prefix: What to start the name of each metric with.
+        :rtype: str
+        """
+        lines = []
+        for name, label_name, help_text, histograms in [
+                (prefix + '_latency_seconds', 'function',
+                 'How long applied functions took to produce results.',
+                 self.latencies),
+                (prefix + '_gather_size', 'gather',
+                 'How many inputs gathers had.',
+                 self.gather_sizes)]:
+            lines.append('# HELP {} {}'.format(name, help_text))
+            lines.append('# TYPE {} summary'.format(name))
+            for label, histogram in sorted(histograms.items()):
+                label = '{}="{}"'.format(label_name, _escape(label))
+                for q in self.quantiles:
+                    lines.append('{}{{{},quantile="{}"}} {!r}'.format(
+                        name, label, q, histogram.quantile(q)))
+                lines.append('{}_sum{{{}}} {!r}'.format(
+                    name, label, histogram.total))
+                lines.append('{}_count{{{}}} {}'.format(
+                    name, label, histogram.count))
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, output, prefix='txapply'):
+        """
+        Write the metrics in the Prometheus text format to the file
+        ``output``.
+        """
+        output.write(self.prometheus(prefix))
@@ -0,0 +1,115 @@
+"""
+Run functions whose arguments are ready in order of priority, a few at a
+time.
+"""
+
+from functools import partial
+from heapq import heappop, heappush
+from itertools import count
+
+from twisted.internet.defer import Deferred, maybeDeferred
+
+from . import _instrument
+from ._txapply import _txapply_wrapper
+
+
+class PriorityScheduler(object):
+    """
+    Queues calls by priority, and makes a few of them each time round the
+    event loop, so that urgent calls don't wait behind the rest::
+
+        scheduler = PriorityScheduler(reactor)
+        d = scheduler.txapply(INTERACTIVE, render, page_deferred)
+        d = scheduler.txapply(BATCH, reindex, rows_deferred)
+
+    Lower numbers are more urgent.  Calls with the same priority are made in
+    the order they were queued.
+
+    So that less urgent calls aren't put off forever, calls get more urgent
+    as they wait: after ``1 / aging`` seconds, a call is as urgent as one
+    queued with a priority one lower.
+
+    :ivar IReactorTime clock: Event loop that controls time.
+    :ivar int batch_size: The most calls to make each time round the event
+        loop.
+    :ivar float aging: How many levels of priority a call goes up each
+        second it waits.
+    """
+
+    def __init__(self, clock, batch_size=100, aging=1.0):
+        self.clock = clock
+        self.batch_size = batch_size
+        self.aging = aging
+        self._queue = []
+        # How many entries in the queue have been cancelled, and are only
+        # waiting to be thrown away.
+        self._cancelled = 0
+        self._order = count()
+        self._delayed = None
+
+    def __len__(self):
+        """
+        How many calls are queued, not counting those that have been
+        cancelled.
+        """
+        return len(self._queue) - self._cancelled
+
+    def call(self, priority, function, *args, **kwargs):
+        """
+        Queue a call to ``function`` with ``args`` and ``kwargs``.
+
+        :param priority: How urgent the call is.  Lower is more urgent.
+        :return: A Deferred that fires with the result of ``function``.
+            Cancelling it before the call is made means it won't be;
+            cancelling it afterwards cancels the call.
+        """
+        # Aging is folded into a key that never changes, so the queue never
+        # has to be reordered: a call made later is treated as less urgent
+        # by as much as the waiting calls have aged in the meantime.
+        key = priority + self.aging * self.clock.seconds()
+        thunk = partial(
+            _instrument.copy_context().run,
+            _instrument.thunk(function, args, kwargs))
+        entry = [key, next(self._order), thunk]
+        result = Deferred(partial(self._cancel, entry))
+        entry.append(result)
+        heappush(self._queue, entry)
+        if self._delayed is None:
+            self._delayed = self.clock.callLater(0, self._run)
+        return result
+
+    def _run(self):
+        self._delayed = None
+        queue = self._queue
+        made = 0
+        while queue and made < self.batch_size:
+            entry = heappop(queue)
+            thunk = entry[2]
+            if thunk is None:
+                # Cancelled.
+                self._cancelled -= 1
+                continue
+            made += 1
+            # No longer queued, should the function cancel its own result.
+            entry[2] = None
+            # Keep the call, so cancelling the result can cancel it.
+            entry[2] = maybeDeferred(thunk)
+            entry[2].chainDeferred(entry[3])
+        if queue:
+            self._delayed = self.clock.callLater(0, self._run)
+
+    def _cancel(self, entry, result):
+        started = entry[2]
+        entry[2] = None
+        if isinstance(started, Deferred):
+            started.cancel()
+        elif started is not None:
+            self._cancelled += 1
+
+    def txapply(self, priority, function, *args, **kwargs):
+        """
+        Like ``txapply.txapply``, but once the arguments have arrived, queue
+        the call to ``function`` with ``priority``.
+        """
+        return _txapply_wrapper(
+            partial(self.call, priority, function), *args, **kwargs)
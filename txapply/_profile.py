@@ -0,0 +1,165 @@
+"""
+Find out which inputs hold up a gather.
+"""
+
+import sys
+
+from ._combinators import _name
+from ._txapply import gather_dict, txapply
+
+
+class KeyProfile(object):
+    """
+    How one input of a gather has behaved, over many gathers from the same
+    call site.
+
+    :ivar int count: How many times the input has resolved.
+    :ivar int critical: How many times the input was the last to resolve.
+    :ivar float total_time: Total seconds from the start of each gather until
+        the input resolved.
+    :ivar float critical_time: Total seconds the gathers took when this input
+        was the last to resolve.
+    :ivar float total_slack: Total seconds between the input resolving and
+        the last input resolving.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.critical = 0
+        self.total_time = 0.0
+        self.critical_time = 0.0
+        self.total_slack = 0.0
+
+    def __repr__(self):
+        return (
+            '<KeyProfile count={} critical={} total_time={} '
+            'total_slack={}>'.format(
+                self.count, self.critical, self.total_time, self.total_slack))
+
+
+def _caller(depth):
+    """
+    Describe the call site ``depth`` frames above the caller.
+    """
+    frame = sys._getframe(depth + 1)
+    return '{}:{}:{}'.format(
+        frame.f_globals.get('__name__'), frame.f_code.co_name,
+        frame.f_lineno)
+
+
+class GatherProfiler(object):
+    """
+    Records how long each input of a gather takes to resolve, and which was
+    last, aggregated by call site.
+
+    Use its ``gather_dict`` and ``txapply`` instead of the ordinary ones for
+    the gathers you want to profile::
+
+        profiler = GatherProfiler(reactor)
+        profiler.gather_dict({'user': get_user(), 'history': get_history()})
+        ...
+        with open('gathers.folded', 'w') as f:
+            profiler.write_collapsed(f)
+
+    :ivar IReactorTime clock: Event loop that controls time.
+    :ivar Map[str, Map[A, KeyProfile]] sites: Maps call sites to the
+        profiles of each of their inputs.
+    """
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.sites = {}
+
+    def gather_dict(self, deferred_dict, site=None):
+        """
+        Like ``txapply.gather_dict``, but profile the gather.
+
+        :param Map[A, Deferred[B]] deferred_dict: A dictionary with Deferred
+            values.
+        :param Optional[str] site: What to record the gather as.  If not
+            given, the module, function and line that called
+            ``gather_dict``.
+        :rtype: Deferred[Map[A, B]]
+        """
+        if site is None:
+            site = _caller(1)
+        self._watch(site, deferred_dict)
+        return gather_dict(deferred_dict)
+
+    def txapply(self, function, *args, **kwargs):
+        """
+        Like ``txapply.txapply``, but profile the gather of its arguments.
+
+        Positional arguments are recorded with their index as their key,
+        keyword arguments with their name.  The gather is recorded with the
+        qualified name of ``function`` as its call site.
+        """
+        site = _name(function)
+        inputs = dict(enumerate(args))
+        inputs.update(kwargs)
+        self._watch(site, inputs)
+        return txapply(function, *args, **kwargs)
+
+    def _watch(self, site, deferred_dict):
+        start = self.clock.seconds()
+        times = {}
+        remaining = [len(deferred_dict)]
+        for key, d in deferred_dict.items():
+            d.addBoth(self._resolved, site, start, times, remaining, key)
+
+    def _resolved(self, result, site, start, times, remaining, key):
+        times[key] = self.clock.seconds() - start
+        remaining[0] -= 1
+        if not remaining[0]:
+            self._record(site, times, key)
+        return result
+
+    def _record(self, site, times, last):
+        keys = self.sites.setdefault(site, {})
+        finish = times[last]
+        for key, elapsed in times.items():
+            profile = keys.get(key)
+            if profile is None:
+                profile = keys[key] = KeyProfile()
+            profile.count += 1
+            profile.total_time += elapsed
+            profile.total_slack += finish - elapsed
+        keys[last].critical += 1
+        keys[last].critical_time += finish
+
+    def critical_path(self, site):
+        """
+        Get the inputs of the gathers at ``site``, the ones that held them up
+        the most first.
+
+        :rtype: List[Tuple[A, KeyProfile]]
+        """
+        return sorted(
+            self.sites[site].items(),
+            key=lambda item: (-item[1].critical_time, -item[1].critical))
+
+    def collapsed(self):
+        """
+        Render the profile as collapsed stacks, for ``flamegraph.pl`` and
+        compatible tools.
+
+        Each line is a call site and an input, followed by the total
+        microseconds of gathers at that site for which that input was the
+        last to resolve.
+
+        :rtype: List[str]
+        """
+        lines = []
+        for site, keys in sorted(self.sites.items()):
+            for key, profile in sorted(keys.items(), key=lambda i: str(i[0])):
+                if profile.critical:
+                    lines.append('{};{} {}'.format(
+                        site, key, int(round(profile.critical_time * 1e6))))
+        return lines
+
+    def write_collapsed(self, output):
+        """
+        Write the profile as collapsed stacks to the file ``output``.
+        """
+        for line in self.collapsed():
+            output.write(line + '\n')
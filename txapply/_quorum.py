@@ -0,0 +1,171 @@
+"""
+Gather the first few successful results of many Deferreds, or race them
+for the first.
+"""
+
+from twisted.internet.defer import Deferred
+from twisted.python.failure import Failure
+
+
+class QuorumError(Exception):
+    """
+    Raised when so many inputs have failed that a quorum can't be reached.
+
+    :ivar Map[A, Failure] failures: Maps the keys of the inputs that failed
+        to their failures.
+    """
+
+    def __init__(self, failures):
+        super(QuorumError, self).__init__(failures)
+        self.failures = failures
+
+
+class RaceError(QuorumError):
+    """
+    Raised when every input of a race has failed.
+
+    :ivar Map[A, Failure] failures: Maps the keys of the inputs to their
+        failures.
+    """
+
+
+class _Quorum(object):
+    """
+    Waits for ``needed`` of its inputs to succeed.
+
+    Fires with the ``(key, value)`` pairs of the first ``needed`` successes
+    in the order they arrived, or fails with a ``QuorumError`` as soon as so
+    many inputs have failed that that's impossible.  Either way, the inputs
+    that haven't fired are cancelled.
+    """
+
+    def __init__(self, items, count, needed, error=QuorumError):
+        if not 0 < needed <= count:
+            raise ValueError(
+                'Need between 1 and {} successes, got {}'.format(
+                    count, needed))
+        self.result = Deferred(self._cancel)
+        self._needed = needed
+        self._error = error
+        self._allowed_failures = count - needed
+        self._successes = []
+        self._failures = {}
+        self._inputs = []
+        got_result = self._got_result
+        got_failure = self._got_failure
+        for key, deferred in items:
+            if self._inputs is None:
+                # Already decided by inputs that had fired.
+                deferred.cancel()
+                deferred.addErrback(lambda failure: None)
+                continue
+            self._inputs.append(deferred)
+            deferred.addCallbacks(
+                got_result, got_failure,
+                callbackArgs=(key,), errbackArgs=(key,))
+
+    def _got_result(self, value, key):
+        if self._inputs is not None:
+            self._successes.append((key, value))
+            if len(self._successes) == self._needed:
+                successes, self._successes = self._successes, None
+                self._finish()
+                self.result.callback(successes)
+        return value
+
+    def _got_failure(self, failure, key):
+        if self._inputs is not None:
+            self._failures[key] = failure
+            if len(self._failures) > self._allowed_failures:
+                failures, self._failures = self._failures, None
+                self._finish()
+                self.result.errback(Failure(self._error(failures)))
+
+    def _finish(self):
+        """
+        Stop waiting, and cancel the inputs that haven't fired.
+        """
+        inputs, self._inputs = self._inputs, None
+        for deferred in inputs:
+            if not deferred.called:
+                deferred.cancel()
+
+    def _cancel(self, result):
+        self._finish()
+
+
+def gather_quorum(deferreds, needed):
+    """
+    Wait for ``needed`` of a list of Deferreds to succeed.
+
+    Use this to ask several replicas the same question and take the first
+    few answers.  As soon as enough have succeeded, or so many have failed
+    that enough never can, the Deferreds that haven't fired are cancelled.
+
+    :param List[Deferred[A]] deferreds: A list of Deferreds.
+    :param int needed: How many of them need to succeed.
+    :raise ValueError: If ``needed`` isn't between 1 and the number of
+        Deferreds.
+    :return: A Deferred that fires with a list of the index and value of
+        each Deferred that succeeded in time, in the order they succeeded,
+        or fails with ``QuorumError``.
+    :rtype: Deferred[List[Tuple[int, A]]]
+    """
+    deferreds = list(deferreds)
+    return _Quorum(enumerate(deferreds), len(deferreds), needed).result
+
+
+def gather_quorum_dict(deferred_dict, needed):
+    """
+    Wait for ``needed`` of the values of a dictionary of Deferreds to
+    succeed.
+
+    Like ``gather_quorum``, but fires with a dictionary of the keys and
+    values of the Deferreds that succeeded in time.
+
+    :param Map[K, Deferred[A]] deferred_dict: A dictionary with Deferred
+        values.
+    :param int needed: How many of them need to succeed.
+    :raise ValueError: If ``needed`` isn't between 1 and the number of
+        Deferreds.
+    :rtype: Deferred[Map[K, A]]
+    """
+    d = _Quorum(deferred_dict.items(), len(deferred_dict), needed).result
+    d.addCallback(dict)
+    return d
+
+
+def race(deferreds):
+    """
+    Get the result of whichever of a list of Deferreds succeeds first.
+
+    As soon as one succeeds, the rest are cancelled.
+
+    :param List[Deferred[A]] deferreds: A non-empty list of Deferreds.
+    :raise ValueError: If ``deferreds`` is empty.
+    :return: A Deferred that fires with the first successful result, or
+        fails with ``RaceError`` once every Deferred has failed.
+    :rtype: Deferred[A]
+    """
+    deferreds = list(deferreds)
+    d = _Quorum(enumerate(deferreds), len(deferreds), 1, RaceError).result
+    d.addCallback(lambda winners: winners[0][1])
+    return d
+
+
+def race_dict(deferred_dict):
+    """
+    Get the key and result of whichever value of a dictionary of Deferreds
+    succeeds first.
+
+    Like ``race``, but fires with a ``(key, value)`` tuple.
+
+    :param Map[K, Deferred[A]] deferred_dict: A non-empty dictionary with
+        Deferred values.
+    :raise ValueError: If ``deferred_dict`` is empty.
+    :rtype: Deferred[Tuple[K, A]]
+    """
+    d = _Quorum(
+        deferred_dict.items(), len(deferred_dict), 1, RaceError).result
+    d.addCallback(lambda winners: winners[0])
+    return d
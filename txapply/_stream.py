@@ -0,0 +1,162 @@
+"""
+Apply a function to a stream of arguments, with backpressure.
+"""
+
+from collections import deque
+
+from twisted.internet.defer import Deferred, succeed
+from twisted.internet.interfaces import IConsumer, IPushProducer
+from zope.interface import implementer
+
+from ._txapply import txapply
+
+
+def _as_deferred(value):
+    if isinstance(value, Deferred):
+        return value
+    return succeed(value)
+
+
+@implementer(IConsumer, IPushProducer)
+class ApplyStream(object):
+    """
+    Consumes tuples of arguments from a push producer, calls ``function``
+    with each of them, and writes the results to ``consumer``.
+
+    Register a stream with a producer like any other consumer::
+
+        stream = ApplyStream(process_row, results_writer, concurrency=20)
+        stream.registerProducer(row_reader, True)
+        stream.finished.addCallback(lambda ignored: reactor.stop())
+
+    Arguments may be Deferreds or plain values, and are applied with
+    ``txapply``.  At most ``concurrency`` calls run at once.  Once
+    ``high_water`` tuples of arguments are waiting, running or have results
+    waiting to be written, the producer is paused, and it is resumed when
+    that falls to ``low_water``.  The stream is in turn a push producer for
+    ``consumer``, and stops writing when ``consumer`` pauses it.
+
+    Results are written in the order their calls finish.  If any call fails,
+    the producer is stopped and ``finished`` fails.
+
+    :ivar Deferred[None] finished: Fires when the producer has been
+        unregistered and every result has been written to ``consumer``.
+    """
+
+    def __init__(self, function, consumer, concurrency=10, high_water=100,
+                 low_water=None):
+        if low_water is None:
+            low_water = high_water // 2
+        if not 0 <= low_water < high_water:
+            raise ValueError(
+                'Need 0 <= low_water < high_water', low_water, high_water)
+        self.function = function
+        self.consumer = consumer
+        self.concurrency = concurrency
+        self.high_water = high_water
+        self.low_water = low_water
+        self.finished = Deferred()
+        self._producer = None
+        self._producer_paused = False
+        self._paused = False
+        self._done = False
+        self._arguments = deque()
+        self._running = 0
+        self._starting = False
+        self._results = deque()
+        consumer.registerProducer(self, True)
+
+    def _buffered(self):
+        return len(self._arguments) + self._running + len(self._results)
+
+    def registerProducer(self, producer, streaming):
+        if not streaming:
+            raise ValueError('ApplyStream only supports push producers')
+        if self._producer is not None:
+            raise RuntimeError('A producer is already registered')
+        self._producer = producer
+        self._producer_paused = False
+
+    def unregisterProducer(self):
+        self._producer = None
+        self._done = True
+        self._flush()
+
+    def write(self, arguments):
+        if self.finished.called:
+            return
+        self._arguments.append(arguments)
+        self._start()
+        if (self._producer is not None and not self._producer_paused and
+                self._buffered() >= self.high_water):
+            self._producer_paused = True
+            self._producer.pauseProducing()
+
+    def pauseProducing(self):
+        self._paused = True
+
+    def resumeProducing(self):
+        self._paused = False
+        self._flush()
+
+    def stopProducing(self):
+        self._stop()
+        self._finish(None)
+
+    def _start(self):
+        # Calls that finish straight away make room while this loop runs,
+        # and the loop carries on into it, rather than starting the next
+        # call from inside the one that finished, which would recurse once
+        # per call.
+        if self._starting:
+            return
+        self._starting = True
+        while self._arguments and self._running < self.concurrency:
+            arguments = self._arguments.popleft()
+            self._running += 1
+            d = txapply(self.function, *map(_as_deferred, arguments))
+            d.addCallbacks(self._succeeded, self._failed)
+        self._starting = False
+
+    def _succeeded(self, result):
+        self._running -= 1
+        if self.finished.called:
+            return
+        self._results.append(result)
+        self._flush()
+
+    def _failed(self, failure):
+        self._running -= 1
+        if self.finished.called:
+            return
+        self._stop()
+        self._finish(failure)
+
+    def _flush(self):
+        if self.finished.called:
+            return
+        while self._results and not self._paused:
+            self.consumer.write(self._results.popleft())
+        self._start()
+        if (self._producer_paused and self._producer is not None and
+                self._buffered() <= self.low_water):
+            self._producer_paused = False
+            self._producer.resumeProducing()
+        if self._done and not self._buffered():
+            self._finish(None)
+
+    def _stop(self):
+        self._arguments.clear()
+        self._results.clear()
+        producer, self._producer = self._producer, None
+        if producer is not None:
+            producer.stopProducing()
+
+    def _finish(self, result):
+        if self.finished.called:
+            return
+        self.consumer.unregisterProducer()
+        if result is None:
+            self.finished.callback(None)
+        else:
+            self.finished.errback(result)
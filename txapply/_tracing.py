@@ -0,0 +1,225 @@
+"""
+Trace applications and gathers as spans, nested by ``contextvars``.
+"""
+
+import json
+import random
+from functools import partial
+
+from twisted.python import log
+from twisted.python.failure import Failure
+
+from . import _instrument
+from ._combinators import _name
+from ._txapply import _txapply_wrapper, gather_dict
+
+try:
+    from contextvars import ContextVar
+except ImportError:
+    ContextVar = None
+
+
+class _Variable(object):
+    """
+    Enough of ``ContextVar`` for spans to nest where there's no
+    ``contextvars``.
+
+    There is only one value for the whole process, so children are only
+    found for applications that are made while their parent's function is
+    running.
+    """
+
+    def __init__(self, name, default=None):
+        self.name = name
+        self._value = default
+
+    def get(self):
+        return self._value
+
+    def set(self, value):
+        token, self._value = self._value, value
+        return token
+
+    def reset(self, token):
+        self._value = token
+
+
+if ContextVar is None:
+    _current_span = _Variable('txapply_span', default=None)
+else:
+    _current_span = ContextVar('txapply_span', default=None)
+
+
+# Marks an application as part of a trace that wasn't sampled, so that its
+# children aren't either.
+_UNSAMPLED = object()
+
+
+def _new_id(bits):
+    return '{:0{}x}'.format(random.getrandbits(bits), bits // 4)
+
+
+class Span(object):
+    """
+    One traced application or gather.
+
+    :ivar str name: What was traced: the qualified name of the function, or
+        the name given to the gather.
+    :ivar str trace_id: Identifies the trace the span is part of, as 32 hex
+        digits.
+    :ivar str span_id: Identifies the span, as 16 hex digits.
+    :ivar Optional[str] parent_id: The ``span_id`` of the span that was
+        current when this one started, if any.
+    :ivar float start: When the span started, in seconds since the epoch.
+    :ivar Optional[float] ready: When the arguments had all arrived and the
+        function was called, if it was.
+    :ivar Optional[float] end: When the result fired.
+    :ivar Optional[str] error: Describes the failure, if the result failed.
+    """
+
+    __slots__ = (
+        'name', 'trace_id', 'span_id', 'parent_id', 'start', 'ready', 'end',
+        'error')
+
+    def __init__(self, name, trace_id, span_id, parent_id, start):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.start = start
+        self.ready = None
+        self.end = None
+        self.error = None
+
+    def __repr__(self):
+        return '<Span {} trace_id={} span_id={} parent_id={}>'.format(
+            self.name, self.trace_id, self.span_id, self.parent_id)
+
+    def as_dict(self):
+        """
+        Get the span as a dictionary, e.g. to serialize.
+
+        :rtype: Map[str, Any]
+        """
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+def current_span():
+    """
+    Get the span of the application whose function is running, if it's
+    traced.
+
+    :rtype: Optional[Span]
+    """
+    span = _current_span.get()
+    if span is _UNSAMPLED:
+        return None
+    return span
+
+
+class JsonLinesExporter(object):
+    """
+    Exports spans to a file, as one JSON object per line.
+
+    :ivar output: The file to write to.
+    """
+
+    def __init__(self, output):
+        self.output = output
+
+    def __call__(self, span):
+        self.output.write(json.dumps(span.as_dict(), sort_keys=True) + '\n')
+
+
+class Tracer(object):
+    """
+    Records a span for each application and gather, from when it's made
+    until its result fires, and passes each span to ``exporter`` once it
+    has ended::
+
+        tracer = Tracer(reactor, JsonLinesExporter(open('spans.jsonl', 'a')),
+                        sample_rate=0.01)
+        d = tracer.txapply(handle, request_deferred)
+
+    An application's span covers both waiting for the arguments and running
+    the function.  Applications and gathers traced while a traced function
+    is running are its children: they share its ``trace_id``, and their
+    ``parent_id`` is its ``span_id``.
+
+    Whether to trace is decided once for each trace, when its first span
+    starts: ``sample_rate`` of traces are recorded, and the rest cost
+    little more than an untraced application.
+
+    :ivar IReactorTime clock: Event loop that controls time.
+    :ivar exporter: Called with each ``Span`` once it has ended.
+    :ivar float sample_rate: The fraction of traces to record.
+    """
+
+    def __init__(self, clock, exporter, sample_rate=1.0, random=random.random):
+        self.clock = clock
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+        self._random = random
+
+    def _open(self, name=None, function=None):
+        # Only sampled spans need a name, so one named after ``function`` is
+        # only worked out once the span is known to be sampled.
+        parent = _current_span.get()
+        if parent is None:
+            if self._random() >= self.sample_rate:
+                return _UNSAMPLED
+            trace_id, parent_id = _new_id(128), None
+        elif parent is _UNSAMPLED:
+            return _UNSAMPLED
+        else:
+            trace_id, parent_id = parent.trace_id, parent.span_id
+        if function is not None:
+            name = _name(function)
+        return Span(
+            name, trace_id, _new_id(64), parent_id, self.clock.seconds())
+
+    def _close(self, result, span):
+        span.end = self.clock.seconds()
+        if isinstance(result, Failure):
+            span.error = '{}: {}'.format(
+                result.type.__name__, result.getErrorMessage())
+        try:
+            self.exporter(span)
+        except Exception:
+            log.err(None, 'Exporting {!r} failed'.format(span))
+        return result
+
+    def _call(self, span, function, *args, **kwargs):
+        if span is not _UNSAMPLED:
+            span.ready = self.clock.seconds()
+        token = _current_span.set(span)
+        try:
+            if _instrument.invoke is None:
+                return function(*args, **kwargs)
+            return _instrument.invoke(function, args, kwargs)
+        finally:
+            _current_span.reset(token)
+
+    def txapply(self, function, *args, **kwargs):
+        """
+        Like ``txapply.txapply``, but trace the application, named after
+        ``function``.
+        """
+        span = self._open(function=function)
+        d = _txapply_wrapper(
+            partial(self._call, span, function), *args, **kwargs)
+        if span is not _UNSAMPLED:
+            d.addBoth(self._close, span)
+        return d
+
+    def gather_dict(self, deferred_dict, name='gather_dict'):
+        """
+        Like ``txapply.gather_dict``, but trace the gather.
+
+        :param str name: What to call the span.
+        """
+        span = self._open(name)
+        d = gather_dict(deferred_dict)
+        if span is not _UNSAMPLED:
+            d.addBoth(self._close, span)
+        return d
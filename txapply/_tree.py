@@ -0,0 +1,117 @@
+"""
+Gather many Deferreds in groups, combining the groups in a tree.
+"""
+
+from twisted.internet.defer import succeed
+
+from ._txapply import _Gather
+
+
+def _join(deferreds, group_size):
+    """
+    Get a Deferred that fires once all of ``deferreds`` have, joining them
+    ``group_size`` at a time, then joining the joins, and so on.
+    """
+    while len(deferreds) > 1:
+        deferreds = [
+            _Gather(group, len(group)).result
+            for group in (deferreds[i:i + group_size]
+                          for i in range(0, len(deferreds), group_size))]
+    return deferreds[0]
+
+
+def _check_group_size(group_size):
+    # Groups of one never get any fewer, so joining them would never end.
+    if group_size < 2:
+        raise ValueError(
+            'group_size must be at least 2, got {}'.format(group_size))
+
+
+def _gather_groups(inputs, group_size, store):
+    """
+    Gather ``inputs`` in groups of ``group_size``, calling ``store`` with the
+    offset and values of each group as it arrives.
+    """
+    leaves = []
+    for offset in range(0, len(inputs), group_size):
+        group = inputs[offset:offset + group_size]
+        d = _Gather(group, len(group)).result
+        d.addCallback(store, offset)
+        leaves.append(d)
+    return _join(leaves, group_size)
+
+
+def gather_tree(deferreds, group_size=64, on_group=None):
+    """
+    Gather a list of Deferreds into a single Deferred, ``group_size`` at a
+    time.
+
+    Each group's values are copied into the result as soon as the whole group
+    has arrived, and the groups are joined in a tree, so no single callback
+    does more than about ``group_size`` of work, however many Deferreds there
+    are.
+
+    If any Deferred fails, returns a Deferred that fails.
+
+    :param List[Deferred[A]] deferreds: A list of Deferreds.
+    :param int group_size: How many Deferreds to gather at a time.
+    :param Optional[Callable[[int, List[A]], None]] on_group: If given,
+        called with the index of the first Deferred in each group and the
+        group's values, as soon as they arrive.
+    :raise ValueError: If ``group_size`` is less than 2.
+    :rtype: Deferred[List[A]]
+    """
+    _check_group_size(group_size)
+    deferreds = list(deferreds)
+    if not deferreds:
+        return succeed([])
+    result = [None] * len(deferreds)
+
+    def store(values, offset):
+        result[offset:offset + len(values)] = values
+        if on_group is not None:
+            on_group(offset, values)
+
+    d = _gather_groups(deferreds, group_size, store)
+    d.addCallback(lambda ignored: result)
+    return d
+
+
+def gather_dict_tree(deferred_dict, group_size=64, on_group=None):
+    """
+    Gather a dictionary with Deferred values into a single Deferred,
+    ``group_size`` at a time.
+
+    Like ``gather_tree``, each group's items are added to the result as soon
+    as the whole group has arrived, so the dictionary is already built when
+    the last one does.
+
+    If any Deferred fails, returns a Deferred that fails.
+
+    :param Map[K, Deferred[A]] deferred_dict: A dictionary with Deferred
+        values.
+    :param int group_size: How many Deferreds to gather at a time.
+    :param Optional[Callable[[Map[K, A]], None]] on_group: If given, called
+        with a dictionary of each group's items, as soon as they arrive.
+    :raise ValueError: If ``group_size`` is less than 2.
+    :rtype: Deferred[Map[K, A]]
+    """
+    _check_group_size(group_size)
+    if not deferred_dict:
+        return succeed({})
+    keys = list(deferred_dict)
+    result = {}
+
+    def store(values, offset):
+        items = zip(keys[offset:offset + len(values)], values)
+        if on_group is None:
+            result.update(items)
+        else:
+            group = dict(items)
+            result.update(group)
+            on_group(group)
+
+    d = _gather_groups(
+        [deferred_dict[key] for key in keys], group_size, store)
+    d.addCallback(lambda ignored: result)
+    return d
@@ -2,14 +2,62 @@
 txapply: library for calling functions with Deferred arguments.
 """
 
-from twisted.internet.defer import gatherResults, succeed
+from twisted.internet.defer import Deferred, succeed
+from twisted.python.failure import Failure
 
+from . import _instrument
 
-def _get_failure(failure):
+
+class _Gather(object):
     """
-    Extract the *real* failure from a ``FirstError``.
+    Gathers the results of many Deferreds into a list, in order.
+
+    Each result is stored straight into its slot of a list that is allocated
+    up front, by the same bound method for every input.  Failures are
+    consumed, and the first one fails the gather.  Cancelling the gather
+    cancels the inputs that haven't fired.
+
+    If ``context`` is given, the result fires inside it.
     """
-    return failure.value.subFailure
+
+    def __init__(self, inputs, count, context=None):
+        self.result = Deferred(self._cancel)
+        self._context = context
+        self._inputs = inputs
+        self._slots = [None] * count
+        self._remaining = count
+        got_result = self._got_result
+        got_failure = self._got_failure
+        for index, deferred in enumerate(inputs):
+            deferred.addCallbacks(
+                got_result, got_failure, callbackArgs=(index,))
+
+    def _got_result(self, value, index):
+        slots = self._slots
+        if slots is not None:
+            slots[index] = value
+            self._remaining -= 1
+            if not self._remaining:
+                self._slots = self._inputs = None
+                if self._context is None:
+                    self.result.callback(slots)
+                else:
+                    self._context.run(self.result.callback, slots)
+        return value
+
+    def _got_failure(self, failure):
+        if self._slots is not None:
+            self._slots = self._inputs = None
+            if self._context is None:
+                self.result.errback(failure)
+            else:
+                self._context.run(self.result.errback, failure)
+
+    def _cancel(self, result):
+        inputs, self._inputs = self._inputs, None
+        for deferred in inputs:
+            if not deferred.called:
+                deferred.cancel()
 
 
 def _gather_results(deferreds):
@@ -22,9 +70,20 @@ def _gather_results(deferreds):
     :rtype: Deferred[List[A]]
     :returns: A Deferred that fires with the successful values of the list.
     """
-    # TODO: Write our own gatherResult.
-    d = gatherResults(deferreds, consumeErrors=True)
-    d.addErrback(_get_failure)
+    if not deferreds:
+        return succeed([])
+    return _Gather(deferreds, len(deferreds)).result
+
+
+def _gather_dict(deferred_dict, context):
+    if not deferred_dict:
+        return succeed({})
+    keys = list(deferred_dict)
+    d = _Gather(deferred_dict.values(), len(keys), context).result
+
+    def got_results(real_values):
+        return dict(zip(keys, real_values))
+    d.addCallback(got_results)
     return d
 
 
@@ -34,21 +93,146 @@ def gather_dict(deferred_dict):
 
     If any Deferred fails, returns a Deferred that fails.
 
+    The result fires in a copy of the ``contextvars`` context that
+    ``gather_dict`` was called in, so callbacks added to it see the same
+    context variables as the code that called ``gather_dict``.
+
+    While waiting, the gather keeps a list of the keys and a list of slots
+    for the results, and builds the dictionary once when they have all
+    arrived.  Gathering 10^6 inputs peaks at about 350 bytes per input
+    (most of it the callbacks on each input Deferred), down from about 520
+    with ``gatherResults``; see ``benchmarks/bench_gather_dict_memory.py``.
+
     :param Map[A, Deferred[B]] deferred_dict: A dictionary with Deferred
         values.
     :return: A Deferred that fires with a dictionary where all the Deferred
         values have been resolved.
     :rtype: Deferred[Map[A, B]]
     """
+    return _gather_dict(deferred_dict, _instrument.copy_context())
+
+
+class _Fold(object):
+    """
+    Folds the results of many Deferreds into an accumulator as they arrive.
+
+    Each result is dropped from its Deferred as soon as it has been folded
+    in, so only the accumulator is kept in memory.
+    """
+
+    def __init__(self, reducer, initial, count, keyed):
+        self.result = Deferred(self._cancel)
+        self._reducer = reducer
+        self._accumulator = initial
+        self._remaining = count
+        self._keyed = keyed
+        self._inputs = []
+
+    def add(self, key, deferred):
+        if self._inputs is not None:
+            self._inputs.append(deferred)
+        deferred.addCallbacks(
+            self._got_result, self._got_failure, callbackArgs=(key,))
+
+    def _got_result(self, value, key):
+        if self.result.called:
+            return
+        try:
+            if self._keyed:
+                self._accumulator = self._reducer(
+                    self._accumulator, key, value)
+            else:
+                self._accumulator = self._reducer(self._accumulator, value)
+        except Exception:
+            self._fail(Failure())
+            return
+        self._remaining -= 1
+        if not self._remaining:
+            accumulator, self._accumulator = self._accumulator, None
+            self._inputs = None
+            self.result.callback(accumulator)
+
+    def _got_failure(self, failure):
+        if not self.result.called:
+            self._fail(failure)
+
+    def _fail(self, failure):
+        self._accumulator = None
+        self._inputs = None
+        self.result.errback(failure)
+
+    def _cancel(self, result):
+        inputs, self._inputs = self._inputs, None
+        for deferred in inputs:
+            deferred.cancel()
+
+
+def gather_reduce(deferreds, reducer, initial):
+    """
+    Fold the results of a list of Deferreds into a single value, as they
+    arrive.
+
+    Unlike gathering the results and then reducing them, each result is
+    folded in and then discarded as soon as it arrives, so only
+    ``initial`` and whatever ``reducer`` returns are kept in memory::
+
+        gather_reduce(deferreds, operator.add, 0)
+
+    Results are folded in the order that they arrive, not the order of
+    ``deferreds``.  If any Deferred fails, or ``reducer`` raises, returns a
+    Deferred that fails.
+
+    :param Iterable[Deferred[A]] deferreds: Deferreds to fold.
+    :param Callable[[B, A], B] reducer: Called with the accumulator and each
+        result, returns the new accumulator.
+    :param B initial: The initial accumulator.
+    :rtype: Deferred[B]
+    """
+    deferreds = list(deferreds)
+    if not deferreds:
+        return succeed(initial)
+    fold = _Fold(reducer, initial, len(deferreds), keyed=False)
+    for deferred in deferreds:
+        fold.add(None, deferred)
+    return fold.result
+
+
+def gather_reduce_dict(deferred_dict, reducer, initial):
+    """
+    Fold the results of a dictionary with Deferred values into a single
+    value, as they arrive.
+
+    Like ``gather_reduce``, except that ``reducer`` is also given the key
+    of each result.
+
+    :param Map[K, Deferred[A]] deferred_dict: A dictionary with Deferred
+        values.
+    :param Callable[[B, K, A], B] reducer: Called with the accumulator, and
+        the key and result of each Deferred, returns the new accumulator.
+    :param B initial: The initial accumulator.
+    :rtype: Deferred[B]
+    """
     if not deferred_dict:
-        return succeed({})
-    keys, values = zip(*deferred_dict.items())
-    d = _gather_results(values)
+        return succeed(initial)
+    fold = _Fold(reducer, initial, len(deferred_dict), keyed=True)
+    for key, deferred in deferred_dict.items():
+        fold.add(key, deferred)
+    return fold.result
 
-    def got_results(real_values):
-        return {key: real_value for key, real_value in zip(keys, real_values)}
-    d.addCallback(got_results)
-    return d
+
+def _ignore(failure):
+    return None
+
+
+def _abandon(deferreds):
+    """
+    Cancel any of ``deferreds`` that haven't fired, and consume their
+    failures.
+    """
+    for deferred in deferreds:
+        if not deferred.called:
+            deferred.cancel()
+        deferred.addErrback(_ignore)
 
 
 def txapply(function, *args, **kwargs):
@@ -58,11 +242,36 @@ def txapply(function, *args, **kwargs):
     All the arguments and keyword arguments to ``txapply`` must be Deferreds.
     ``txapply`` will call ``function`` with the results of these Deferreds,
     and return a Deferred that will fire with its result.
+
+    ``function`` is called in a copy of the ``contextvars`` context that
+    ``txapply`` was called in, rather than in that of whichever callback
+    happened to deliver the last argument.
     """
-    d = _gather_results([_gather_results(args), gather_dict(kwargs)])
+    return _apply(function, args, kwargs, True)
+
+
+def _txapply_wrapper(function, *args, **kwargs):
+    """
+    Like ``txapply``, but call ``function`` directly, rather than through
+    ``_instrument.invoke``.
+
+    For the ``txapply`` methods of classes like ``Tracer``, whose
+    ``function`` is their own wrapper around the user's, which it calls
+    through ``_instrument.invoke`` itself.  That way instruments see the
+    user's function, once, rather than a new ``partial`` each time.
+    """
+    return _apply(function, args, kwargs, False)
+
+
+def _apply(function, args, kwargs, hooked):
+    context = _instrument.copy_context()
+    d = _gather_results([_gather_results(args), _gather_dict(kwargs, None)])
 
     def got_real_args(result):
         [real_args, real_kwargs] = result
-        return function(*real_args, **real_kwargs)
+        if not hooked or _instrument.invoke is None:
+            return context.run(function, *real_args, **real_kwargs)
+        return context.run(
+            _instrument.invoke, function, real_args, real_kwargs)
     d.addCallback(got_real_args)
     return d
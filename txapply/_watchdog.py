@@ -0,0 +1,159 @@
+"""
+Find functions that block the reactor.
+"""
+
+import sys
+import threading
+import traceback
+from collections import namedtuple
+from datetime import timedelta
+from timeit import default_timer
+
+from twisted.python import log
+
+from . import _instrument
+from ._combinators import _name
+from ._metrics import Histogram
+
+
+SlowCall = namedtuple('SlowCall', 'name duration stack')
+"""
+A call that took longer than a ``Watchdog``'s threshold.
+
+``name`` is the qualified name of the function, ``duration`` how many
+seconds the call took, and ``stack`` a list of ``(filename, lineno, name,
+line)`` tuples, like those from ``traceback.extract_stack``, sampled while
+it was running, or ``None`` if no sample was taken.
+"""
+
+
+def _log_slow(call):
+    message = '{} blocked the reactor for {:.1f} ms'.format(
+        call.name, call.duration * 1e3)
+    if call.stack is not None:
+        message = '{}, at:\n{}'.format(
+            message, ''.join(traceback.format_list(call.stack)))
+    log.msg(message)
+
+
+class Watchdog(object):
+    """
+    Times every function that txapply and the combinators call, and reports
+    the ones that take longer than ``threshold``::
+
+        watchdog = Watchdog(timedelta(milliseconds=50))
+        watchdog.start()
+
+    While it's running, each function that takes longer than ``threshold``
+    is passed to ``on_slow`` as a ``SlowCall``.  By default these are
+    logged.  If ``sample_stacks`` is true, a thread checks on the reactor
+    every half ``threshold``, and records the stack of a call that is
+    taking too long, to show where it is stuck.
+
+    When it isn't running, the only cost is checking whether it is.
+
+    How long each function's calls took is recorded in ``histograms``.
+
+    :ivar timedelta threshold: How long a call can take before it is
+        reported.
+    :ivar on_slow: Called with a ``SlowCall`` for each call that takes
+        longer than ``threshold``.
+    :ivar bool sample_stacks: Whether to sample the stacks of slow calls.
+    :ivar timer: Called with no arguments, returns the time in seconds.
+    :ivar Map[str, Histogram] histograms: Maps the names of functions to
+        how many seconds their calls have taken.
+    """
+
+    def __init__(self, threshold=timedelta(milliseconds=100), on_slow=None,
+                 sample_stacks=True, timer=default_timer):
+        self.threshold = threshold
+        if on_slow is None:
+            on_slow = _log_slow
+        self.on_slow = on_slow
+        self.sample_stacks = sample_stacks
+        self.timer = timer
+        self.histograms = {}
+        self._running = False
+        # The start time and function of the innermost call that is running,
+        # and the stack sampled from a call that took too long.
+        self._current = None
+        self._sample = None
+        self._thread = None
+        self._stopping = None
+
+    def start(self):
+        """
+        Start timing calls.
+
+        Call this from the reactor thread: that's the thread whose stack is
+        sampled.
+        """
+        if self._running:
+            return
+        self._running = True
+        _instrument.install(self._invoke)
+        if self.sample_stacks:
+            self._stopping = threading.Event()
+            self._thread = threading.Thread(
+                target=self._watch,
+                args=(threading.current_thread().ident, self._stopping),
+                name='txapply watchdog')
+            self._thread.daemon = True
+            self._thread.start()
+
+    def stop(self):
+        """
+        Stop timing calls.
+        """
+        if not self._running:
+            return
+        self._running = False
+        _instrument.uninstall(self._invoke)
+        if self._thread is not None:
+            self._stopping.set()
+            self._thread.join()
+            self._thread = None
+            self._stopping = None
+
+    def _invoke(self, call, function, args, kwargs):
+        outer = self._current
+        started = self.timer()
+        current = self._current = (started, function)
+        try:
+            return call(function, args, kwargs)
+        finally:
+            duration = self.timer() - started
+            self._current = outer
+            self._record(function, duration, current)
+
+    def _record(self, function, duration, current):
+        name = _name(function)
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram()
+        histogram.record(duration)
+        if duration > self.threshold.total_seconds():
+            sample = self._sample
+            stack = None
+            if sample is not None and sample[0] is current:
+                self._sample = None
+                stack = sample[1]
+            self.on_slow(SlowCall(name, duration, stack))
+
+    def _watch(self, ident, stopping):
+        """
+        Sample the stack of the reactor thread whenever a call has been
+        running for longer than ``threshold``.
+        """
+        threshold = self.threshold.total_seconds()
+        sampled = None
+        while not stopping.wait(threshold / 2):
+            current = self._current
+            if current is None or current is sampled:
+                continue
+            if self.timer() - current[0] <= threshold:
+                continue
+            frame = sys._current_frames().get(ident)
+            if frame is not None:
+                sampled = current
+                self._sample = (current, traceback.extract_stack(frame))
@@ -0,0 +1,26 @@
+"""
+Helpers shared by the tests.
+"""
+
+from testtools.matchers import AfterPreprocessing, Is
+from testtools.twistedsupport import failed
+
+
+def is_failure(exception_type):
+    """
+    Match a Deferred that has failed with ``exception_type``.
+    """
+    return failed(AfterPreprocessing(
+        lambda failure: failure.type, Is(exception_type)))
+
+
+class FakeTimer(object):
+    """
+    A timer that only moves when told to.
+    """
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
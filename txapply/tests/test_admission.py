@@ -0,0 +1,180 @@
+"""
+Tests for ``AdmissionController``.
+"""
+
+from collections import deque
+from datetime import timedelta
+
+from testtools import TestCase
+from testtools.matchers import Equals, Is
+from testtools.twistedsupport import has_no_result, succeeded
+from twisted.internet.defer import Deferred, succeed
+from twisted.internet.task import Clock
+
+from txapply import AdmissionController, Overloaded
+from .helpers import is_failure
+
+
+def identity(x):
+    return x
+
+
+class FixedLimitTests(TestCase):
+    """
+    Tests for ``AdmissionController`` with fixed limits.
+    """
+
+    def setUp(self):
+        super(FixedLimitTests, self).setUp()
+        self.clock = Clock()
+
+    def test_admits(self):
+        """
+        Applications under the limits are applied.
+        """
+        admission = AdmissionController(self.clock, max_outstanding=1)
+        d = admission.txapply(identity, succeed(3))
+        self.assertThat(d, succeeded(Equals(3)))
+        self.assertThat(admission.outstanding, Equals(0))
+        self.assertThat(admission.admitted, Equals(1))
+
+    def test_max_outstanding(self):
+        """
+        Applications are refused while ``max_outstanding`` are outstanding,
+        counting both those waiting for arguments and those whose function
+        hasn't finished.
+        """
+        admission = AdmissionController(self.clock, max_outstanding=2)
+        argument = Deferred()
+        result = Deferred()
+        waiting = admission.txapply(identity, argument)
+        running = admission.txapply(lambda: result)
+        self.assertThat(
+            (admission.outstanding, admission.waiting), Equals((2, 1)))
+        refused = admission.txapply(identity, succeed(1))
+        self.assertThat(refused, is_failure(Overloaded))
+        self.assertThat(admission.rejected, Equals(1))
+        result.callback('done')
+        self.assertThat(running, succeeded(Equals('done')))
+        self.assertThat(
+            admission.txapply(identity, succeed(1)), succeeded(Equals(1)))
+        self.assertThat(waiting, has_no_result())
+
+    def test_refused_arguments_cancelled(self):
+        """
+        When an application is refused, its arguments are cancelled.
+        """
+        admission = AdmissionController(self.clock, max_outstanding=0)
+        cancelled = []
+        argument = Deferred(cancelled.append)
+        admission.txapply(identity, argument).addErrback(lambda f: None)
+        self.assertThat(cancelled, Equals([argument]))
+
+    def test_max_delay(self):
+        """
+        Applications are refused while the most recent application to start
+        had waited longer than ``max_delay`` for its arguments, and admitted
+        again once none are waiting.
+        """
+        admission = AdmissionController(
+            self.clock, max_delay=timedelta(seconds=1))
+        slow = Deferred()
+        other = Deferred()
+        admission.txapply(identity, slow)
+        admission.txapply(identity, other)
+        self.clock.advance(2)
+        slow.callback(1)
+        self.assertThat(admission.delay, Equals(2))
+        self.assertThat(
+            admission.txapply(identity, succeed(1)), is_failure(Overloaded))
+        other.callback(2)
+        self.assertThat(admission.delay, Equals(0))
+        self.assertThat(
+            admission.txapply(identity, succeed(1)), succeeded(Equals(1)))
+
+    def test_failed_arguments(self):
+        """
+        An application whose arguments fail is no longer outstanding.
+        """
+        admission = AdmissionController(self.clock, max_outstanding=1)
+        argument = Deferred()
+        d = admission.txapply(identity, argument)
+        argument.errback(ZeroDivisionError())
+        self.assertThat(d, is_failure(ZeroDivisionError))
+        self.assertThat(
+            (admission.outstanding, admission.waiting), Equals((0, 0)))
+
+
+class AdaptiveTests(TestCase):
+    """
+    Tests for ``AdmissionController`` with a CoDel-style ``target``.
+    """
+
+    def setUp(self):
+        super(AdaptiveTests, self).setUp()
+        self.clock = Clock()
+        self.admission = AdmissionController(
+            self.clock, target=timedelta(seconds=1),
+            interval=timedelta(seconds=10))
+
+    def start_after(self, delay):
+        """
+        Admit an application, and start it after ``delay`` seconds.
+        """
+        argument = Deferred()
+        d = self.admission.txapply(identity, argument)
+        self.clock.advance(delay)
+        argument.callback(None)
+        return d
+
+    def test_short_burst(self):
+        """
+        Queueing delays above ``target`` for less than ``interval`` don't
+        cause refusals.
+        """
+        self.start_after(2)
+        self.start_after(2)
+        self.assertThat(
+            self.admission.txapply(identity, succeed(1)),
+            succeeded(Equals(1)))
+
+    def test_standing_queue(self):
+        """
+        Once the queueing delay has been above ``target`` for ``interval``,
+        applications are refused, more often the longer it lasts.
+        """
+        for i in range(6):
+            self.start_after(2)
+        # Keep every admitted application waiting for 2 seconds.
+        waiting = deque()
+        refused = []
+        for i in range(40):
+            argument = Deferred()
+            d = self.admission.txapply(identity, argument)
+            if d.called:
+                d.addErrback(lambda f: None)
+                refused.append(self.clock.seconds())
+            else:
+                waiting.append(argument)
+            if len(waiting) > 2:
+                waiting.popleft().callback(None)
+            self.clock.advance(1)
+        self.assertThat(self.admission.rejected, Equals(len(refused)))
+        gaps = [b - a for a, b in zip(refused, refused[1:])]
+        self.assertThat(gaps, Equals(sorted(gaps, reverse=True)))
+        self.assertThat(gaps[0] > gaps[-1], Is(True))
+
+    def test_recovers(self):
+        """
+        Once an application starts with a queueing delay under ``target``,
+        applications are admitted again.
+        """
+        for i in range(6):
+            self.start_after(2)
+        self.assertThat(
+            self.admission.txapply(identity, succeed(1)),
+            is_failure(Overloaded))
+        self.start_after(0)
+        self.assertThat(
+            self.admission.txapply(identity, succeed(1)),
+            succeeded(Equals(1)))
@@ -0,0 +1,185 @@
+"""
+Tests for ``txapply_checked`` and ``make_applicator``.
+"""
+
+from testtools import TestCase
+from testtools.matchers import AfterPreprocessing, Equals, Is, Not
+from testtools.twistedsupport import failed, succeeded
+from twisted.internet.defer import Deferred, fail, succeed
+
+from txapply import make_applicator, txapply_checked
+from .._binding import _shapes, call_shape_error
+from .._combinators import ignored
+
+
+def pair(x, y=None):
+    return (x, y)
+
+
+def hello():
+    return 'hi'
+
+
+class CallShapeErrorTests(TestCase):
+    """
+    Tests for ``call_shape_error``.
+    """
+
+    def test_fine(self):
+        """
+        If the function can be called with the shape, there's no error.
+        """
+        self.assertThat(call_shape_error(pair, 1, frozenset()), Is(None))
+        self.assertThat(call_shape_error(pair, 1, frozenset(['y'])), Is(None))
+
+    def test_wrong_shape(self):
+        """
+        If the function can't be called with the shape, the error is the
+        ``TypeError`` the call would raise.
+        """
+        error = call_shape_error(pair, 1, frozenset(['z']))
+        self.assertThat(error, AfterPreprocessing(type, Is(TypeError)))
+        self.assertThat(
+            call_shape_error(pair, 3, frozenset()), Not(Is(None)))
+
+    def test_cached(self):
+        """
+        The answer is cached for each function and shape.
+        """
+        def function(x):
+            pass
+        call_shape_error(function, 2, frozenset())
+        self.assertThat(
+            list(_shapes[function]), Equals([(2, frozenset())]))
+
+    def test_bound_method_cached(self):
+        """
+        Bound methods are cached by the function they bind, with the object
+        they're bound to counted as an argument, so a method checked through
+        different bound method objects is only checked once.
+        """
+        class Thing(object):
+            def method(self, x, y=None):
+                pass
+        thing = Thing()
+        self.assertThat(
+            call_shape_error(thing.method, 1, frozenset()), Is(None))
+        self.assertThat(
+            call_shape_error(thing.method, 3, frozenset()), Not(Is(None)))
+        self.assertThat(
+            sorted(_shapes[Thing.__dict__['method']]),
+            Equals([(2, frozenset()), (4, frozenset())]))
+        self.assertThat(
+            call_shape_error(Thing().method, 1, frozenset(['y'])), Is(None))
+        self.assertThat(len(_shapes[Thing.__dict__['method']]), Equals(3))
+
+    def test_uninspectable(self):
+        """
+        Functions without signatures can't be checked, so are assumed to be
+        fine.
+        """
+        self.assertThat(call_shape_error(dict, 5, frozenset()), Is(None))
+
+
+class TxapplyCheckedTests(TestCase):
+    """
+    Tests for ``txapply_checked``.
+    """
+
+    def test_calls(self):
+        """
+        ``txapply_checked`` calls a function that can take its arguments,
+        like ``txapply``.
+        """
+        d = txapply_checked(pair, succeed(1), y=succeed(2))
+        self.assertThat(d, succeeded(Equals((1, 2))))
+
+    def test_fails_early(self):
+        """
+        If the function can't take the arguments, ``txapply_checked`` fails
+        straight away and cancels the arguments that haven't fired.
+        """
+        cancelled = []
+        waiting = Deferred(cancelled.append)
+        d = txapply_checked(pair, succeed(1), waiting, z=succeed(3))
+        self.assertThat(d, failed(AfterPreprocessing(
+            lambda failure: failure.type, Is(TypeError))))
+        self.assertThat(cancelled, Equals([waiting]))
+        self.assertThat(waiting, succeeded(Is(None)))
+
+    def test_wrapped(self):
+        """
+        Functions wrapped with ``functools.wraps`` are checked against the
+        wrapper, not the function it wraps, which may be called differently.
+        """
+        d = txapply_checked(ignored(hello), succeed(1))
+        self.assertThat(d, succeeded(Equals('hi')))
+
+
+class ApplicatorTests(TestCase):
+    """
+    Tests for ``make_applicator``.
+    """
+
+    def test_positional(self):
+        """
+        An applicator calls its function with the values of its Deferreds.
+        """
+        apply_pair = make_applicator(pair, 2)
+        d = apply_pair(succeed(1), succeed(2))
+        self.assertThat(d, succeeded(Equals((1, 2))))
+
+    def test_keyword(self):
+        """
+        The Deferreds after ``nargs`` are passed as the keyword arguments in
+        ``kwnames``.
+        """
+        apply_pair = make_applicator(pair, 1, ['y'])
+        d = apply_pair(succeed(1), succeed(2))
+        self.assertThat(d, succeeded(Equals((1, 2))))
+
+    def test_no_arguments(self):
+        """
+        An applicator with no arguments just calls its function.
+        """
+        d = make_applicator(lambda: 42)()
+        self.assertThat(d, succeeded(Equals(42)))
+
+    def test_failure(self):
+        """
+        If any Deferred fails, the result fails.
+        """
+        d = make_applicator(pair, 2)(succeed(1), fail(KeyError()))
+        self.assertThat(d, failed(AfterPreprocessing(
+            lambda failure: failure.type, Is(KeyError))))
+
+    def test_wrong_shape(self):
+        """
+        Making an applicator for a shape that the function can't take raises
+        ``TypeError``.
+        """
+        self.assertRaises(TypeError, make_applicator, pair, 3)
+
+    def test_wrapped(self):
+        """
+        Functions wrapped with ``functools.wraps`` are checked against the
+        wrapper, not the function it wraps, which may be called differently.
+        """
+        d = make_applicator(ignored(hello), 1)(succeed(1))
+        self.assertThat(d, succeeded(Equals('hi')))
+
+    def test_wrong_count(self):
+        """
+        Calling an applicator with the wrong number of Deferreds raises
+        ``TypeError``.
+        """
+        apply_pair = make_applicator(pair, 1, ['y'])
+        self.assertRaises(TypeError, apply_pair, succeed(1))
+
+    def test_repr(self):
+        """
+        The ``repr`` of an applicator shows its function and shape.
+        """
+        self.assertThat(
+            repr(make_applicator(pair, 1, ['y'])),
+            Equals("Applicator({}.pair, 1, ('y',))".format(__name__)))
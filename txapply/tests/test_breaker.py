@@ -0,0 +1,187 @@
+"""
+Tests for ``CircuitBreaker``.
+"""
+
+from datetime import timedelta
+
+from testtools import TestCase
+from testtools.matchers import Equals, Is
+from testtools.twistedsupport import succeeded
+from twisted.internet.defer import Deferred, fail, succeed
+from twisted.internet.task import Clock
+
+from txapply import CircuitBreaker, CircuitOpen
+from .._breaker import CLOSED, HALF_OPEN, OPEN
+from .helpers import is_failure
+
+
+def broken():
+    raise ZeroDivisionError()
+
+
+def ignore_failure(deferred):
+    deferred.addErrback(lambda failure: None)
+
+
+class CircuitBreakerTests(TestCase):
+    """
+    Tests for ``CircuitBreaker``.
+    """
+
+    def setUp(self):
+        super(CircuitBreakerTests, self).setUp()
+        self.clock = Clock()
+        self.changes = []
+        self.breaker = CircuitBreaker(
+            self.clock, failure_rate=0.5, window=4, min_calls=4,
+            slow_call=timedelta(seconds=1),
+            reset_timeout=timedelta(seconds=10),
+            on_state_change=lambda *change: self.changes.append(change))
+
+    def open_breaker(self):
+        for i in range(4):
+            ignore_failure(self.breaker.call(broken))
+        self.assertThat(self.breaker.state, Equals(OPEN))
+
+    def test_closed(self):
+        """
+        A closed breaker calls the function.
+        """
+        d = self.breaker.call(lambda x, f=None: (x, f), 1, f=2)
+        self.assertThat(d, succeeded(Equals((1, 2))))
+        self.assertThat(self.breaker.state, Equals(CLOSED))
+
+    def test_opens(self):
+        """
+        Once ``failure_rate`` of the last ``window`` calls have failed, the
+        breaker opens and fails fast without calling the function.
+        """
+        for i in range(2):
+            self.breaker.call(lambda: None)
+        ignore_failure(self.breaker.call(broken))
+        self.assertThat(self.breaker.state, Equals(CLOSED))
+        ignore_failure(self.breaker.call(broken))
+        self.assertThat(self.breaker.state, Equals(OPEN))
+        self.assertThat(self.changes, Equals([(CLOSED, OPEN)]))
+        called = []
+        d = self.breaker.call(called.append, 1)
+        self.assertThat(d, is_failure(CircuitOpen))
+        self.assertThat(called, Equals([]))
+
+    def test_slow_calls(self):
+        """
+        Calls slower than ``slow_call`` count as failures.
+        """
+        for i in range(4):
+            waiting = Deferred()
+            self.breaker.call(lambda: waiting)
+            self.clock.advance(2)
+            waiting.callback(None)
+        self.assertThat(self.breaker.state, Equals(OPEN))
+
+    def test_half_open_closes(self):
+        """
+        After ``reset_timeout``, a trial call is let through, and if it
+        succeeds, the breaker closes.
+        """
+        self.open_breaker()
+        self.clock.advance(10)
+        waiting = Deferred()
+        self.breaker.call(lambda: waiting)
+        self.assertThat(self.breaker.state, Equals(HALF_OPEN))
+        self.assertThat(self.breaker.call(lambda: None),
+                        is_failure(CircuitOpen))
+        waiting.callback(None)
+        self.assertThat(self.breaker.state, Equals(CLOSED))
+        self.assertThat(
+            self.changes,
+            Equals([(CLOSED, OPEN), (OPEN, HALF_OPEN), (HALF_OPEN, CLOSED)]))
+
+    def test_half_open_reopens(self):
+        """
+        If the trial call fails, the breaker opens again.
+        """
+        self.open_breaker()
+        self.clock.advance(10)
+        self.assertThat(self.breaker.call(broken),
+                        is_failure(ZeroDivisionError))
+        self.assertThat(self.breaker.state, Equals(OPEN))
+
+    def test_half_open_trial_hangs(self):
+        """
+        If the trial call takes longer than ``slow_call`` without finishing,
+        the next call counts it as failed, and the breaker opens again.  When
+        the trial does finish, it's ignored.
+        """
+        self.open_breaker()
+        self.clock.advance(10)
+        hanging = Deferred()
+        self.breaker.call(lambda: hanging)
+        self.clock.advance(1)
+        self.assertThat(self.breaker.call(lambda: None),
+                        is_failure(CircuitOpen))
+        self.assertThat(self.breaker.state, Equals(HALF_OPEN))
+        self.clock.advance(1)
+        self.assertThat(self.breaker.call(lambda: None),
+                        is_failure(CircuitOpen))
+        self.assertThat(self.breaker.state, Equals(OPEN))
+        self.clock.advance(10)
+        self.assertThat(self.breaker.call(lambda: 1), succeeded(Equals(1)))
+        self.assertThat(self.breaker.state, Equals(CLOSED))
+        hanging.errback(ZeroDivisionError())
+        ignore_failure(hanging)
+        self.assertThat(self.breaker.state, Equals(CLOSED))
+        self.assertThat(
+            self.changes,
+            Equals([(CLOSED, OPEN), (OPEN, HALF_OPEN), (HALF_OPEN, OPEN),
+                    (OPEN, HALF_OPEN), (HALF_OPEN, CLOSED)]))
+
+    def test_half_open_trial_hangs_without_slow_call(self):
+        """
+        Without ``slow_call``, a trial call counts as failed once it has gone
+        ``reset_timeout`` without finishing.
+        """
+        self.breaker.slow_call = None
+        self.open_breaker()
+        self.clock.advance(10)
+        self.breaker.call(Deferred)
+        self.clock.advance(10)
+        self.assertThat(self.breaker.allows(), Is(False))
+        self.assertThat(self.breaker.state, Equals(HALF_OPEN))
+        self.clock.advance(1)
+        self.assertThat(self.breaker.allows(), Is(False))
+        self.assertThat(self.breaker.state, Equals(OPEN))
+
+    def test_txapply(self):
+        """
+        ``CircuitBreaker.txapply`` calls the function with the values of its
+        arguments, while the breaker is closed.
+        """
+        d = self.breaker.txapply(
+            lambda x, y: x + y, succeed(1), y=succeed(2))
+        self.assertThat(d, succeeded(Equals(3)))
+
+    def test_txapply_open(self):
+        """
+        While the breaker is open, ``CircuitBreaker.txapply`` fails straight
+        away and cancels the arguments.
+        """
+        self.open_breaker()
+        cancelled = []
+        waiting = Deferred(cancelled.append)
+        d = self.breaker.txapply(lambda x, y: None, waiting, fail(KeyError()))
+        self.assertThat(d, is_failure(CircuitOpen))
+        self.assertThat(cancelled, Equals([waiting]))
+
+    def test_txapply_opens_while_waiting(self):
+        """
+        If the breaker opens while waiting for the arguments, the function
+        isn't called.
+        """
+        waiting = Deferred()
+        called = []
+        d = self.breaker.txapply(called.append, waiting)
+        self.open_breaker()
+        waiting.callback(1)
+        self.assertThat(d, is_failure(CircuitOpen))
+        self.assertThat(called, Equals([]))
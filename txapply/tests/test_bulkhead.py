@@ -0,0 +1,166 @@
+"""
+Tests for ``KeyedLimiter``.
+"""
+
+from testtools import TestCase
+from testtools.matchers import Equals
+from testtools.twistedsupport import has_no_result, succeeded
+from twisted.internet.defer import CancelledError, Deferred, succeed
+
+from txapply import KeyedLimiter
+from .helpers import is_failure
+
+
+class KeyedLimiterTests(TestCase):
+    """
+    Tests for ``KeyedLimiter``.
+    """
+
+    def setUp(self):
+        super(KeyedLimiterTests, self).setUp()
+        self.limiter = KeyedLimiter(lambda key, value: key, limit=2)
+        self.calls = []
+
+    def slow(self, key, value):
+        d = Deferred()
+        self.calls.append((key, value, d))
+        return d
+
+    def test_under_limit(self):
+        """
+        Calls for a key run straight away while fewer than ``limit`` are
+        running.
+        """
+        first = self.limiter.call(self.slow, 'a', 1)
+        second = self.limiter.call(self.slow, 'a', 2)
+        self.assertThat(
+            [(key, value) for key, value, d in self.calls],
+            Equals([('a', 1), ('a', 2)]))
+        self.assertThat(self.limiter.running('a'), Equals(2))
+        self.calls[0][2].callback('one')
+        self.assertThat(first, succeeded(Equals('one')))
+        self.assertThat(second, has_no_result())
+
+    def test_queues_over_limit(self):
+        """
+        Calls for a key that already has ``limit`` calls running wait, and
+        run in the order they were made as the running calls finish.
+        """
+        results = [self.limiter.call(self.slow, 'a', i) for i in range(4)]
+        self.assertThat(len(self.calls), Equals(2))
+        self.assertThat(self.limiter.waiting('a'), Equals(2))
+        self.calls[1][2].callback(1)
+        self.assertThat(
+            [value for key, value, d in self.calls], Equals([0, 1, 2]))
+        self.calls[0][2].callback(0)
+        self.calls[2][2].callback(2)
+        self.calls[3][2].callback(3)
+        for i, result in enumerate(results):
+            self.assertThat(result, succeeded(Equals(i)))
+
+    def test_keys_independent(self):
+        """
+        A key that is at its limit doesn't hold up calls for other keys.
+        """
+        for i in range(3):
+            self.limiter.call(self.slow, 'noisy', i)
+        quiet = self.limiter.call(lambda key, value: value, 'quiet', 'x')
+        self.assertThat(quiet, succeeded(Equals('x')))
+        self.assertThat(self.limiter.waiting('noisy'), Equals(1))
+
+    def test_failure_releases(self):
+        """
+        A call that fails makes room for the next one.
+        """
+        self.limiter.call(self.slow, 'a', 0)
+        second = self.limiter.call(self.slow, 'a', 1)
+        third = self.limiter.call(self.slow, 'a', 2)
+        self.calls[1][2].errback(ZeroDivisionError())
+        self.assertThat(second, is_failure(ZeroDivisionError))
+        self.assertThat(len(self.calls), Equals(3))
+        self.calls[2][2].callback(2)
+        self.assertThat(third, succeeded(Equals(2)))
+
+    def test_many_quick_calls_waiting(self):
+        """
+        Thousands of calls that finish straight away can wait behind a slow
+        one, and all run once it finishes.
+        """
+        limiter = KeyedLimiter(lambda key, value: key, limit=1)
+        limiter.call(self.slow, 'a', 0)
+        values = []
+        for i in range(1, 5000):
+            limiter.call(lambda key, value: value, 'a', i).addCallback(
+                values.append)
+        self.calls[0][2].callback(0)
+        self.assertThat(values, Equals(list(range(1, 5000))))
+        self.assertThat(limiter.running('a'), Equals(0))
+        self.assertThat(len(limiter), Equals(0))
+
+    def test_call_while_starting_waits_its_turn(self):
+        """
+        A call made as a waiting call finishes, while others are still
+        waiting, waits behind them.
+        """
+        limiter = KeyedLimiter(lambda key, value: key, limit=1)
+        order = []
+
+        def record(key, value):
+            order.append(value)
+            return value
+        limiter.call(self.slow, 'a', 0)
+        first = limiter.call(record, 'a', 1)
+        limiter.call(record, 'a', 2)
+        first.addCallback(lambda ignored: limiter.call(record, 'a', 3))
+        self.calls[0][2].callback(0)
+        self.assertThat(order, Equals([1, 2, 3]))
+
+    def test_idle_keys_forgotten(self):
+        """
+        Keys are forgotten once they have no calls running or waiting.
+        """
+        self.limiter.call(self.slow, 'a', 0)
+        self.limiter.call(lambda key, value: value, 'b', 0)
+        self.assertThat(len(self.limiter), Equals(1))
+        self.calls[0][2].callback(0)
+        self.assertThat(len(self.limiter), Equals(0))
+        self.assertThat(self.limiter.running('a'), Equals(0))
+
+    def test_cancel_waiting(self):
+        """
+        Cancelling a call that is waiting takes it out of the queue, without
+        calling the function.
+        """
+        self.limiter.call(self.slow, 'a', 0)
+        self.limiter.call(self.slow, 'a', 1)
+        waiting = self.limiter.call(self.slow, 'a', 2)
+        waiting.cancel()
+        self.assertThat(waiting, is_failure(CancelledError))
+        self.assertThat(self.limiter.waiting('a'), Equals(0))
+        self.calls[0][2].callback(0)
+        self.assertThat(len(self.calls), Equals(2))
+
+    def test_cancel_started(self):
+        """
+        Cancelling a call that waited and then started cancels the call.
+        """
+        self.limiter.call(self.slow, 'a', 0)
+        self.limiter.call(self.slow, 'a', 1)
+        waiting = self.limiter.call(self.slow, 'a', 2)
+        self.calls[0][2].callback(0)
+        waiting.cancel()
+        self.assertThat(waiting, is_failure(CancelledError))
+        self.assertThat(self.limiter.running('a'), Equals(1))
+
+    def test_txapply(self):
+        """
+        ``KeyedLimiter.txapply`` waits for the arguments, then limits the
+        call by the key of their values.
+        """
+        key = Deferred()
+        d = self.limiter.txapply(self.slow, key, value=succeed(1))
+        self.assertThat(self.calls, Equals([]))
+        key.callback('a')
+        self.assertThat(self.limiter.running('a'), Equals(1))
+        self.calls[0][2].callback('done')
+        self.assertThat(d, succeeded(Equals('done')))
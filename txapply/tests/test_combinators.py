@@ -2,16 +2,24 @@
 Tests for combinators.
 """
 
-from hypothesis import given
+import pickle
+
+from hypothesis import assume, given
 from testtools import TestCase
-from testtools.matchers import Equals, Is
-from testtools.twistedsupport import succeeded
+from testtools.matchers import AfterPreprocessing, Equals, Is
+from testtools.twistedsupport import failed, has_no_result, succeeded
 
-from twisted.internet.defer import succeed
+from twisted.internet.defer import Deferred, succeed
 from .._combinators import (
+    BackgroundEffects,
+    Combined,
+    Ignored,
+    Transparently,
     combine, combined,
+    fan_out,
     ignore, ignored,
     nop,
+    pipeline, step,
     transparent, transparently,
 )
 from .strategies import any_value, arguments, keyword_arguments
@@ -324,3 +332,324 @@ class TestDecoratorComposition(TestCase):
         d.addCallback(transparently(transparently(callback)), *args, **kwargs)
         self.assertThat(d, succeeded(Is(first)))
         self.assertThat(log, Equals([(first, args, kwargs)]))
+
+
+class TestPipeline(TestCase):
+    """
+    Tests for ``pipeline``.
+    """
+
+    def make_steps(self, log, second):
+        def record(*a, **kw):
+            log.append((a, kw))
+            return second
+        return [
+            step(transparent, record, 1),
+            step(ignore, record, 2, x=3),
+            step(combine, record),
+            step(transparent, combine, record, y=4),
+            step(combine, ignore, record),
+        ]
+
+    @given(first=any_value(), second=any_value())
+    def test_same_as_callbacks(self, first, second):
+        """
+        A compiled pipeline has the same effect as adding each of its steps
+        as a callback.
+        """
+        expected_log = []
+        expected = succeed(first)
+        for s in self.make_steps(expected_log, second):
+            expected.addCallback(s.combinator, s.function, *s.args, **s.kwargs)
+        expected_result = []
+        expected.addCallback(expected_result.append)
+        log = []
+        d = succeed(first)
+        d.addCallback(pipeline(self.make_steps(log, second)))
+        self.assertThat(log, Equals(expected_log))
+        self.assertThat(d, succeeded(Equals(expected_result[0])))
+
+    @given(first=any_value(), second=any_value())
+    def test_waits_for_deferred(self, first, second):
+        """
+        If a step returns a Deferred, the following steps are run on its
+        result once it fires.
+        """
+        log = []
+        waiting = Deferred()
+        d = succeed(first)
+        d.addCallback(pipeline([
+            step(ignore, lambda: waiting),
+            step(combine, lambda value: log.append(value) or second),
+        ]))
+        self.assertThat(log, Equals([]))
+        waiting.callback(first)
+        self.assertThat(log, Equals([first]))
+        self.assertThat(d, succeeded(Equals((second, first))))
+
+    def test_empty(self):
+        """
+        An empty pipeline returns its value unchanged.
+        """
+        d = succeed(42).addCallback(pipeline([]))
+        self.assertThat(d, succeeded(Is(42)))
+
+
+def record(*args, **kwargs):
+    """
+    Call with ``log, value, *args, **kwargs`` to append ``value``, ``args``
+    and ``kwargs`` to ``log``.  Returns ``log``.
+    """
+    log, value, args = args[0], args[1], args[2:]
+    log.append((value, args, kwargs))
+    return log
+
+
+class TestWrappers(TestCase):
+    """
+    Tests for ``Transparently``, ``Ignored`` and ``Combined``.
+    """
+
+    @given(first=any_value(), args=arguments(), kwargs=keyword_arguments())
+    def test_transparently(self, first, args, kwargs):
+        """
+        ``Transparently`` behaves like ``transparently``.
+        """
+        log = []
+        d = succeed(log)
+        d.addCallback(Transparently(record), first, *args, **kwargs)
+        self.assertThat(d, succeeded(Is(log)))
+        self.assertThat(log, Equals([(first, args, kwargs)]))
+
+    @given(first=any_value(), second=any_value(), args=arguments(),
+           kwargs=keyword_arguments())
+    def test_ignored(self, first, second, args, kwargs):
+        """
+        ``Ignored`` behaves like ``ignored``.
+        """
+        log = []
+        d = succeed(first)
+        d.addCallback(Ignored(record), log, second, *args, **kwargs)
+        self.assertThat(d, succeeded(Is(log)))
+        self.assertThat(log, Equals([(second, args, kwargs)]))
+
+    @given(first=any_value(), args=arguments(), kwargs=keyword_arguments())
+    def test_combined(self, first, args, kwargs):
+        """
+        ``Combined`` behaves like ``combined``.
+        """
+        log = []
+        d = succeed(log)
+        d.addCallback(Combined(record), first, *args, **kwargs)
+        self.assertThat(d, succeeded(Equals((log, log))))
+        self.assertThat(log, Equals([(first, args, kwargs)]))
+
+    def test_pickle(self):
+        """
+        The wrappers can be pickled if their function can.
+        """
+        for wrapper in [Transparently, Ignored, Combined]:
+            original = wrapper(record)
+            self.assertThat(
+                pickle.loads(pickle.dumps(original, 2)), Equals(original))
+
+    def test_repr(self):
+        """
+        The ``repr`` of a wrapper names its function.
+        """
+        self.assertThat(
+            repr(Combined(record)), Equals('Combined({}.record)'.format(
+                __name__)))
+
+
+class TestFanOut(TestCase):
+    """
+    Tests for ``fan_out``.
+    """
+
+    @given(first=any_value(), second=any_value(), third=any_value())
+    def test_sequence(self, first, second, third):
+        """
+        Given a sequence of functions, ``fan_out`` fires with a tuple of their
+        results and the previous value.
+        """
+        log = []
+        d = succeed(first)
+        d.addCallback(
+            fan_out,
+            [lambda *a, **kw: second, lambda *a, **kw: succeed(third)],
+            1, x=2)
+        self.assertThat(d, succeeded(Equals(((second, third), first))))
+
+        d = succeed(first)
+        d.addCallback(fan_out, [lambda *a, **kw: log.append((a, kw))], 1, x=2)
+        self.assertThat(log, Equals([((first, 1), {'x': 2})]))
+
+    @given(first=any_value(), second=any_value(), third=any_value())
+    def test_mapping(self, first, second, third):
+        """
+        Given a mapping of functions, ``fan_out`` fires with a dictionary of
+        their results and the previous value.
+        """
+        d = succeed(first)
+        d.addCallback(fan_out, {'a': lambda x: second, 'b': lambda x: third})
+        self.assertThat(
+            d, succeeded(Equals(({'a': second, 'b': third}, first))))
+
+    def test_keyword_named_f(self):
+        """
+        A keyword argument called ``f`` is passed to the functions, like any
+        other.
+        """
+        log = []
+        d = succeed(0)
+        d.addCallback(
+            fan_out, {'a': lambda *a, **kw: log.append((a, kw))}, 1, f=2)
+        self.assertThat(d, succeeded(Equals(({'a': None}, 0))))
+        d = succeed(0)
+        d.addCallback(fan_out, [lambda *a, **kw: log.append((a, kw))], 1, f=2)
+        self.assertThat(d, succeeded(Equals(((None,), 0))))
+        self.assertThat(log, Equals([((0, 1), {'f': 2})] * 2))
+
+    def test_concurrent(self):
+        """
+        All of the functions are called before any of their results have
+        fired.
+        """
+        waiting = []
+
+        def wait(value):
+            waiting.append(Deferred())
+            return waiting[-1]
+        d = succeed(0).addCallback(fan_out, [wait, wait, wait])
+        self.assertThat(len(waiting), Equals(3))
+        self.assertThat(d, has_no_result())
+        for i, w in reversed(list(enumerate(waiting))):
+            w.callback(i)
+        self.assertThat(d, succeeded(Equals(((0, 1, 2), 0))))
+
+    def test_failure(self):
+        """
+        If a function fails, the Deferred fails.
+        """
+        d = succeed(0).addCallback(fan_out, [lambda x: 1, lambda x: 1 / x])
+        self.assertThat(d, failed(AfterPreprocessing(
+            lambda f: f.type, Is(ZeroDivisionError))))
+
+
+class TestBackgroundEffects(TestCase):
+    """
+    Tests for ``BackgroundEffects``.
+    """
+
+    def setUp(self):
+        super(TestBackgroundEffects, self).setUp()
+        self.started = []
+
+    def effect(self, value, *args, **kwargs):
+        d = Deferred()
+        self.started.append((d, value, args, kwargs))
+        return d
+
+    @given(first=any_value(), args=arguments(), kwargs=keyword_arguments())
+    def test_does_not_wait(self, first, args, kwargs):
+        """
+        ``BackgroundEffects.transparent`` starts the side effect with all its
+        arguments, and returns the value without waiting for it.
+        """
+        assume(not {'value', 'function'}.intersection(kwargs))
+        del self.started[:]
+        background = BackgroundEffects()
+        d = succeed(first)
+        d.addCallback(background.transparent, self.effect, *args, **kwargs)
+        self.assertThat(d, succeeded(Is(first)))
+        [(effect, value, a, kw)] = self.started
+        self.assertThat((value, a, kw), Equals((first, args, kwargs)))
+        self.assertThat(background.pending, Equals(1))
+        effect.callback(None)
+        self.assertThat(background.pending, Equals(0))
+
+    def test_keyword_named_f(self):
+        """
+        A keyword argument called ``f`` is passed to the side effect, like any
+        other, whether it starts straight away or has to wait.
+        """
+        background = BackgroundEffects(max_pending=1, block=True)
+        background.transparent(1, self.effect, f=2)
+        d = background.transparent(3, self.effect, f=4)
+        self.started[0][0].callback(None)
+        self.assertThat(d, succeeded(Equals(3)))
+        self.assertThat(
+            [(value, kw) for _, value, _, kw in self.started],
+            Equals([(1, {'f': 2}), (3, {'f': 4})]))
+
+    def test_shed(self):
+        """
+        When ``max_pending`` side effects are running, more are dropped.
+        """
+        background = BackgroundEffects(max_pending=1)
+        wrapped = background.transparently(self.effect)
+        self.assertThat(wrapped(1), Equals(1))
+        self.assertThat(wrapped(2), Equals(2))
+        self.assertThat(len(self.started), Equals(1))
+        self.assertThat(background.shed, Equals(1))
+
+    def test_block(self):
+        """
+        If ``block`` is true, when ``max_pending`` side effects are running,
+        the callback chain waits until there's room for another.
+        """
+        background = BackgroundEffects(max_pending=1, block=True)
+        self.assertThat(background.transparent(1, self.effect), Equals(1))
+        d = background.transparent(2, self.effect)
+        self.assertThat(d, has_no_result())
+        self.started[0][0].callback(None)
+        self.assertThat(d, succeeded(Equals(2)))
+        self.assertThat(
+            [value for _, value, _, _ in self.started], Equals([1, 2]))
+
+    def test_many_quick_effects_waiting(self):
+        """
+        Thousands of side effects that finish straight away can wait behind a
+        slow one, and all start once it finishes, after which ``drain``
+        fires.
+        """
+        background = BackgroundEffects(max_pending=1, block=True)
+        background.transparent(0, self.effect)
+        effects = []
+        values = []
+        for i in range(1, 5000):
+            background.transparent(i, effects.append).addCallback(
+                values.append)
+        drained = background.drain()
+        self.started[0][0].callback(None)
+        self.assertThat(effects, Equals(list(range(1, 5000))))
+        self.assertThat(values, Equals(effects))
+        self.assertThat(background.pending, Equals(0))
+        self.assertThat(drained, succeeded(Is(None)))
+
+    def test_failure(self):
+        """
+        Failures of side effects are passed to ``on_failure``.
+        """
+        failures = []
+        background = BackgroundEffects(on_failure=failures.append)
+        background.transparent(1, self.effect)
+        self.started[0][0].errback(ZeroDivisionError())
+        self.assertThat(
+            [f.type for f in failures], Equals([ZeroDivisionError]))
+
+    def test_drain(self):
+        """
+        ``drain`` fires once every side effect that was started or waiting has
+        finished.
+        """
+        background = BackgroundEffects(max_pending=1, block=True)
+        self.assertThat(background.drain(), succeeded(Is(None)))
+        background.transparent(1, self.effect)
+        background.transparent(2, self.effect)
+        d = background.drain()
+        self.started[0][0].callback(None)
+        self.assertThat(d, has_no_result())
+        self.started[1][0].callback(None)
+        self.assertThat(d, succeeded(Is(None)))
@@ -0,0 +1,157 @@
+"""
+Tests for calling functions in the ``contextvars`` context they were
+applied in.
+"""
+
+from datetime import timedelta
+from unittest import skipIf
+
+from testtools import TestCase
+from testtools.matchers import Equals
+from testtools.twistedsupport import succeeded
+from twisted.internet.defer import Deferred, succeed
+from twisted.internet.task import Clock
+
+from txapply import (
+    Hedger,
+    KeyedLimiter,
+    PriorityScheduler,
+    gather_dict,
+    make_applicator,
+    txapply,
+)
+from .._combinators import BackgroundEffects, ignore, pipeline, step
+
+try:
+    from contextvars import ContextVar, copy_context
+except ImportError:
+    ContextVar = None
+else:
+    request_id = ContextVar('request_id', default=None)
+
+
+def get_request_id(*args, **kwargs):
+    return request_id.get()
+
+
+@skipIf(ContextVar is None, 'contextvars not available')
+class ContextTests(TestCase):
+    """
+    Tests for calling functions in the context they were applied in.
+    """
+
+    def in_request(self, function, *args, **kwargs):
+        """
+        Call ``function`` in a new context where ``request_id`` is set.
+        """
+        def run():
+            request_id.set('request')
+            return function(*args, **kwargs)
+        return copy_context().run(run)
+
+    def test_txapply(self):
+        """
+        ``txapply`` calls the function in the context it was called in, not
+        the one the last argument arrived in.
+        """
+        argument = Deferred()
+        d = self.in_request(txapply, get_request_id, argument)
+        argument.callback(None)
+        self.assertThat(d, succeeded(Equals('request')))
+
+    def test_txapply_isolated(self):
+        """
+        Context variables set by the function don't leak into the caller's
+        context.
+        """
+        def set_request_id():
+            request_id.set('leaked')
+        txapply(set_request_id)
+        self.assertThat(request_id.get(), Equals(None))
+
+    def test_gather_dict(self):
+        """
+        ``gather_dict`` fires in the context it was called in.
+        """
+        argument = Deferred()
+        d = self.in_request(gather_dict, {'a': argument})
+        d.addCallback(get_request_id)
+        argument.callback(None)
+        self.assertThat(d, succeeded(Equals('request')))
+
+    def test_applicator(self):
+        """
+        Applicators call the function in the context they were called in.
+        """
+        argument = Deferred()
+        apply = make_applicator(get_request_id, 1)
+        d = self.in_request(apply, argument)
+        argument.callback(None)
+        self.assertThat(d, succeeded(Equals('request')))
+
+    def test_pipeline(self):
+        """
+        A pipeline carries on in its context after waiting for a Deferred.
+        """
+        waiting = Deferred()
+        run = pipeline([
+            step(ignore, lambda: waiting),
+            step(ignore, get_request_id),
+        ])
+        d = self.in_request(run, None)
+        waiting.callback(None)
+        self.assertThat(d, succeeded(Equals('request')))
+
+    def test_background_effects(self):
+        """
+        Side effects that waited for room start in the context they were
+        added in.
+        """
+        effects = BackgroundEffects(max_pending=1, block=True)
+        running = Deferred()
+        seen = []
+        effects.transparent(None, lambda value: running)
+        self.in_request(
+            effects.transparent, None,
+            lambda value: seen.append(get_request_id()))
+        running.callback(None)
+        self.assertThat(seen, Equals(['request']))
+
+    def test_priority_scheduler(self):
+        """
+        ``PriorityScheduler`` makes queued calls in the context they were
+        queued in.
+        """
+        clock = Clock()
+        scheduler = PriorityScheduler(clock)
+        d = self.in_request(scheduler.txapply, 0, get_request_id)
+        clock.advance(0)
+        self.assertThat(d, succeeded(Equals('request')))
+
+    def test_keyed_limiter(self):
+        """
+        ``KeyedLimiter`` makes queued calls in the context they were queued
+        in.
+        """
+        limiter = KeyedLimiter(lambda: 'key', limit=1)
+        running = Deferred()
+        limiter.call(lambda: running)
+        d = self.in_request(limiter.call, get_request_id)
+        running.callback(None)
+        self.assertThat(d, succeeded(Equals('request')))
+
+    def test_hedger(self):
+        """
+        ``Hedger`` starts backups in the context the call was made in.
+        """
+        clock = Clock()
+        hedger = Hedger(clock, timedelta(seconds=1), budget=1)
+        attempts = [Deferred(), succeed(None)]
+        seen = []
+
+        def attempt():
+            seen.append(get_request_id())
+            return attempts.pop(0)
+        self.in_request(hedger.hedge, attempt)
+        clock.advance(1)
+        self.assertThat(seen, Equals(['request', 'request']))
@@ -0,0 +1,128 @@
+"""
+Tests for ``gather_dict_cooperatively``.
+"""
+
+from datetime import timedelta
+
+from testtools import TestCase
+from testtools.matchers import AfterPreprocessing, Equals, Is
+from testtools.twistedsupport import failed, has_no_result, succeeded
+from twisted.internet.defer import Deferred, fail, succeed
+from twisted.internet.task import Clock, Cooperator
+
+from txapply import gather_dict_cooperatively, sliced_cooperator
+
+
+class GatherDictCooperativelyTests(TestCase):
+    """
+    Tests for ``gather_dict_cooperatively``.
+    """
+
+    def setUp(self):
+        super(GatherDictCooperativelyTests, self).setUp()
+        self.clock = Clock()
+        # Runs one step of a task each time the clock is advanced.
+        self.cooperator = Cooperator(
+            terminationPredicateFactory=lambda: lambda: True,
+            scheduler=lambda work: self.clock.callLater(1, work))
+
+    def test_empty(self):
+        """
+        Gathering an empty dictionary fires immediately.
+        """
+        d = gather_dict_cooperatively({}, self.cooperator)
+        self.assertThat(d, succeeded(Equals({})))
+
+    def test_chunks(self):
+        """
+        The result is built ``chunk_size`` keys at a time, yielding to the
+        reactor between chunks.
+        """
+        values = {i: i * 2 for i in range(5)}
+        d = gather_dict_cooperatively(
+            {k: succeed(v) for k, v in values.items()},
+            self.cooperator, chunk_size=2)
+        for i in range(3):
+            self.assertThat(d, has_no_result())
+            self.clock.advance(1)
+        self.clock.advance(1)
+        self.assertThat(d, succeeded(Equals(values)))
+
+    def test_chunk_size_too_small(self):
+        """
+        ``chunk_size`` has to be at least 1.
+        """
+        for chunk_size in (0, -1):
+            self.assertRaises(
+                ValueError, gather_dict_cooperatively, {'a': succeed(1)},
+                self.cooperator, chunk_size=chunk_size)
+
+    def test_waits_for_values(self):
+        """
+        Nothing is built until all the values have arrived.
+        """
+        later = Deferred()
+        d = gather_dict_cooperatively(
+            {'a': succeed(1), 'b': later}, self.cooperator)
+        self.clock.advance(1)
+        self.assertThat(self.clock.getDelayedCalls(), Equals([]))
+        later.callback(2)
+        self.clock.advance(1)
+        self.clock.advance(1)
+        self.assertThat(d, succeeded(Equals({'a': 1, 'b': 2})))
+
+    def test_failure(self):
+        """
+        If any Deferred fails, the result fails.
+        """
+        d = gather_dict_cooperatively(
+            {'a': succeed(1), 'b': fail(ZeroDivisionError())},
+            self.cooperator)
+        self.assertThat(d, failed(AfterPreprocessing(
+            lambda failure: failure.type, Is(ZeroDivisionError))))
+
+
+class SteppingClock(Clock):
+    """
+    A clock where time passes by hand, separately from running delayed
+    calls.
+    """
+
+    now = 0
+
+    def seconds(self):
+        return self.now
+
+    def run(self):
+        """
+        Run the calls that are due, but not any that they schedule.
+        """
+        calls, self.calls = self.calls, []
+        for call in calls:
+            call.func(*call.args, **call.kw)
+
+
+class SlicedCooperatorTests(TestCase):
+    """
+    Tests for ``sliced_cooperator``.
+    """
+
+    def test_budget(self):
+        """
+        A sliced cooperator stops running a task once its budget is used up,
+        and carries on at the next turn of the reactor.
+        """
+        clock = SteppingClock()
+        cooperator = sliced_cooperator(timedelta(seconds=1), clock)
+        steps = []
+
+        def work():
+            for i in range(5):
+                steps.append(i)
+                clock.now += 0.4
+                yield
+        cooperator.cooperate(work())
+        clock.run()
+        self.assertThat(steps, Equals([0, 1, 2]))
+        clock.run()
+        self.assertThat(steps, Equals([0, 1, 2, 3, 4]))
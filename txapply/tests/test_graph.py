@@ -0,0 +1,266 @@
+"""
+Tests for ``gather_graph``.
+"""
+
+from testtools import TestCase
+from testtools.matchers import (
+    AfterPreprocessing,
+    Equals,
+    IsInstance,
+    LessThan,
+)
+from testtools.twistedsupport import failed, has_no_result, succeeded
+from twisted.internet.defer import Deferred, succeed
+
+from txapply import (
+    CycleError,
+    IncrementalGraph,
+    UnknownDependency,
+    gather_graph,
+)
+
+
+class GatherGraphTests(TestCase):
+    """
+    Tests for ``gather_graph``.
+    """
+
+    def test_empty(self):
+        """
+        An empty graph gathers to an empty dictionary.
+        """
+        self.assertThat(gather_graph({}), succeeded(Equals({})))
+
+    def test_dependencies(self):
+        """
+        Each function is called with the results of its dependencies, in the
+        order they are given.
+        """
+        d = gather_graph({
+            'a': (lambda: 2, ()),
+            'b': (lambda: succeed(3), ()),
+            'c': (lambda a, b: a - b, ('a', 'b')),
+            'd': (lambda c, a: (c, a), ('c', 'a')),
+        })
+        self.assertThat(
+            d, succeeded(Equals({'a': 2, 'b': 3, 'c': -1, 'd': (-1, 2)})))
+
+    def test_starts_when_dependencies_fire(self):
+        """
+        A node is started as soon as its own dependencies fire, even if other
+        nodes are still waiting.
+        """
+        slow = Deferred()
+        called = []
+
+        def record(x):
+            called.append(x)
+            return x
+        d = gather_graph({
+            'fast': (lambda: 1, ()),
+            'slow': (lambda: slow, ()),
+            'after_fast': (record, ('fast',)),
+            'after_slow': (record, ('slow',)),
+        })
+        self.assertThat(called, Equals([1]))
+        self.assertThat(d, has_no_result())
+        slow.callback(2)
+        self.assertThat(called, Equals([1, 2]))
+        self.assertThat(d, succeeded(Equals(
+            {'fast': 1, 'slow': 2, 'after_fast': 1, 'after_slow': 2})))
+
+    def test_failure(self):
+        """
+        If a function fails, the whole graph fails and nothing that depends
+        on it is called.
+        """
+        called = []
+
+        def broken():
+            raise ZeroDivisionError()
+        d = gather_graph({
+            'a': (broken, ()),
+            'b': (called.append, ('a',)),
+            'c': (called.append, ('a',)),
+        })
+        self.assertThat(d, failed(AfterPreprocessing(
+            lambda f: f.value, IsInstance(ZeroDivisionError))))
+        self.assertThat(called, Equals([]))
+
+    def test_cycle(self):
+        """
+        A graph with a cycle raises ``CycleError`` without calling anything.
+        """
+        called = []
+        graph = {
+            'a': (called.append, ('c',)),
+            'b': (called.append, ('a',)),
+            'c': (called.append, ('b',)),
+            'd': (lambda: called.append('d'), ()),
+        }
+        error = self.assertRaises(CycleError, gather_graph, graph)
+        self.assertThat(error.args, Equals((['a', 'b', 'c'],)))
+        self.assertThat(called, Equals([]))
+
+    def test_unknown_dependency(self):
+        """
+        A graph that depends on a node it doesn't have raises
+        ``UnknownDependency``.
+        """
+        graph = {'a': (lambda b: b, ('b',))}
+        self.assertRaises(UnknownDependency, gather_graph, graph)
+
+    def test_max_concurrency(self):
+        """
+        No more than ``max_concurrency`` functions run at once.
+        """
+        pending = []
+
+        def wait():
+            d = Deferred()
+            pending.append(d)
+            return d
+        d = gather_graph(
+            {name: (wait, ()) for name in 'abc'}, max_concurrency=2)
+        self.assertThat(len(pending), Equals(2))
+        pending[0].callback(0)
+        self.assertThat(len(pending), Equals(3))
+        pending[1].callback(1)
+        pending[2].callback(2)
+        self.assertThat(
+            d, succeeded(AfterPreprocessing(
+                lambda result: sorted(result.values()), Equals([0, 1, 2]))))
+
+
+class IncrementalGraphTests(TestCase):
+    """
+    Tests for ``IncrementalGraph``.
+    """
+
+    def make_graph(self, **kwargs):
+        """
+        Make a graph that records the nodes that are computed in
+        ``self.computed``.
+        """
+        self.computed = []
+
+        def node(name, function):
+            def compute(*args):
+                self.computed.append(name)
+                return function(*args)
+            return compute
+        return IncrementalGraph({
+            'double': (node('double', lambda x: x * 2), ('x',)),
+            'parity': (node('parity', lambda x: x % 2), ('x',)),
+            'label': (node('label', lambda y: y.upper()), ('y',)),
+            'total': (node('total', lambda d, p: d + p), ('double', 'parity')),
+        }, inputs=('x', 'y'), **kwargs)
+
+    def test_first_evaluation(self):
+        """
+        The first evaluation computes every node.
+        """
+        graph = self.make_graph()
+        d = graph.evaluate({'x': 3, 'y': 'a'})
+        self.assertThat(d, succeeded(Equals(
+            {'double': 6, 'parity': 1, 'label': 'A', 'total': 7})))
+        self.assertThat(
+            sorted(self.computed),
+            Equals(['double', 'label', 'parity', 'total']))
+
+    def test_unchanged(self):
+        """
+        Evaluating with the same inputs doesn't compute anything again.
+        """
+        graph = self.make_graph()
+        graph.evaluate({'x': 3, 'y': 'a'})
+        del self.computed[:]
+        d = graph.evaluate({'x': 3, 'y': 'a'})
+        self.assertThat(d, succeeded(Equals(
+            {'double': 6, 'parity': 1, 'label': 'A', 'total': 7})))
+        self.assertThat(self.computed, Equals([]))
+
+    def test_downstream_of_change(self):
+        """
+        Only the nodes downstream of a changed input are computed.
+        """
+        graph = self.make_graph()
+        graph.evaluate({'x': 3, 'y': 'a'})
+        del self.computed[:]
+        d = graph.evaluate({'x': 3, 'y': 'b'})
+        self.assertThat(d, succeeded(Equals(
+            {'double': 6, 'parity': 1, 'label': 'B', 'total': 7})))
+        self.assertThat(self.computed, Equals(['label']))
+
+    def test_unchanged_result_cuts_off(self):
+        """
+        If a node is computed again but gives the same result as before, the
+        nodes that depend on it aren't computed again.
+        """
+        graph = IncrementalGraph({
+            'parity': (lambda x: x % 2, ('x',)),
+            'name': (lambda p: self.computed.append(p) or 'odd', ('parity',)),
+        }, inputs=('x',))
+        self.computed = []
+        graph.evaluate({'x': 3})
+        d = graph.evaluate({'x': 5})
+        self.assertThat(d, succeeded(Equals({'parity': 1, 'name': 'odd'})))
+        self.assertThat(self.computed, Equals([1]))
+
+    def test_version(self):
+        """
+        If ``version`` is given, inputs are compared by their versions rather
+        than their values.
+        """
+        graph = self.make_graph(version=type)
+        graph.evaluate({'x': 3, 'y': 'a'})
+        del self.computed[:]
+        d = graph.evaluate({'x': 3, 'y': 'b'})
+        self.assertThat(d, succeeded(Equals(
+            {'double': 6, 'parity': 1, 'label': 'A', 'total': 7})))
+        self.assertThat(self.computed, Equals([]))
+
+    def test_max_retained(self):
+        """
+        No more than ``max_retained`` results are kept between evaluations,
+        and the nodes whose results were discarded are computed again.
+        """
+        computed = []
+        graph = IncrementalGraph({
+            'a': (lambda x: computed.append('a') or x + 1, ('x',)),
+            'b': (lambda a: computed.append('b') or a * 2, ('a',)),
+            'c': (lambda x: computed.append('c') or x - 1, ('x',)),
+        }, inputs=('x',), max_retained=2)
+        graph.evaluate({'x': 1})
+        self.assertThat(len(graph._retained), Equals(2))
+        del computed[:]
+        d = graph.evaluate({'x': 1})
+        self.assertThat(d, succeeded(Equals({'a': 2, 'b': 4, 'c': 0})))
+        # Whichever result was discarded, it and at most one node that
+        # depends on it are computed again.
+        self.assertThat(len(computed), LessThan(3))
+        self.assertThat(len(graph._retained), Equals(2))
+
+    def test_wrong_inputs(self):
+        """
+        Evaluating with inputs the graph doesn't have raises ``ValueError``.
+        """
+        graph = self.make_graph()
+        self.assertRaises(ValueError, graph.evaluate, {'x': 3, 'z': 4})
+
+    def test_failure_not_retained(self):
+        """
+        If a function fails, the evaluation fails and the function is called
+        again next time.
+        """
+        results = [ZeroDivisionError(), 4]
+
+        def flaky(x):
+            result = results.pop(0)
+            if isinstance(result, Exception):
+                raise result
+            return result
+        graph = IncrementalGraph({'y': (flaky, ('x',))}, inputs=('x',))
+        self.assertThat(graph.evaluate({'x': 1}), failed(AfterPreprocessing(
+            lambda f: f.value, IsInstance(ZeroDivisionError))))
+        self.assertThat(graph.evaluate({'x': 1}), succeeded(Equals({'y': 4})))
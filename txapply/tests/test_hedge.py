@@ -0,0 +1,126 @@
+"""
+Tests for ``Hedger``.
+"""
+
+from datetime import timedelta
+
+from testtools import TestCase
+from testtools.matchers import AfterPreprocessing, Equals, Is
+from testtools.twistedsupport import failed, has_no_result, succeeded
+from twisted.internet.defer import Deferred, succeed
+from twisted.internet.task import Clock
+
+from txapply import Hedger
+
+
+class HedgerTests(TestCase):
+    """
+    Tests for ``Hedger``.
+    """
+
+    def setUp(self):
+        super(HedgerTests, self).setUp()
+        self.clock = Clock()
+        self.attempts = []
+
+    def attempt(self, *args):
+        """
+        Start an attempt that the test can fire, or see cancelled.
+        """
+        d = Deferred(lambda d: setattr(d, 'was_cancelled', True))
+        d.was_cancelled = False
+        self.attempts.append((args, d))
+        return d
+
+    def make_hedger(self, **kwargs):
+        kwargs.setdefault('budget', 1)
+        return Hedger(self.clock, timedelta(seconds=1), **kwargs)
+
+    def test_primary_wins(self):
+        """
+        If the first attempt succeeds before ``delay``, no backup is started.
+        """
+        hedger = self.make_hedger()
+        d = hedger.hedge(self.attempt)
+        self.clock.advance(0.5)
+        self.attempts[0][1].callback('primary')
+        self.clock.advance(1)
+        self.assertThat(d, succeeded(Equals('primary')))
+        self.assertThat(len(self.attempts), Equals(1))
+        self.assertThat(
+            (hedger.stats.primary_wins, hedger.stats.hedges), Equals((1, 0)))
+
+    def test_hedge_wins(self):
+        """
+        If the first attempt is slower than ``delay``, a backup is started,
+        and if it wins, the first attempt is cancelled.
+        """
+        hedger = self.make_hedger()
+        d = hedger.hedge(self.attempt)
+        self.clock.advance(1)
+        self.assertThat(len(self.attempts), Equals(2))
+        self.attempts[1][1].callback('backup')
+        self.assertThat(d, succeeded(Equals('backup')))
+        self.assertThat(self.attempts[0][1].was_cancelled, Is(True))
+        self.assertThat(
+            (hedger.stats.hedge_wins, hedger.stats.hedges), Equals((1, 1)))
+
+    def test_max_hedges(self):
+        """
+        No more than ``max_hedges`` backups are started for a call.
+        """
+        hedger = self.make_hedger(max_hedges=2, budget=2)
+        hedger.hedge(self.attempt)
+        self.clock.pump([1] * 5)
+        self.assertThat(len(self.attempts), Equals(3))
+
+    def test_budget(self):
+        """
+        Backups are only started for ``budget`` of calls.
+        """
+        hedger = self.make_hedger(budget=0.5)
+        hedger.hedge(self.attempt)
+        self.clock.advance(1)
+        self.assertThat(len(self.attempts), Equals(1))
+        hedger.hedge(self.attempt)
+        self.clock.advance(1)
+        self.assertThat(len(self.attempts), Equals(3))
+        self.assertThat(hedger.stats.over_budget, Equals(1))
+
+    def test_fails_when_all_fail(self):
+        """
+        A call only fails once every attempt has failed.
+        """
+        hedger = self.make_hedger()
+        d = hedger.hedge(self.attempt)
+        self.clock.advance(1)
+        self.attempts[0][1].errback(ZeroDivisionError())
+        self.assertThat(d, has_no_result())
+        self.attempts[1][1].errback(KeyError())
+        self.assertThat(d, failed(AfterPreprocessing(
+            lambda failure: failure.type, Is(KeyError))))
+        self.assertThat(hedger.stats.failures, Equals(1))
+
+    def test_cancel(self):
+        """
+        Cancelling a call cancels its attempts and stops any more being
+        started.
+        """
+        hedger = self.make_hedger()
+        d = hedger.hedge(self.attempt)
+        d.cancel()
+        self.assertThat(self.attempts[0][1].was_cancelled, Is(True))
+        self.assertThat(self.clock.getDelayedCalls(), Equals([]))
+
+    def test_txapply(self):
+        """
+        ``Hedger.txapply`` calls the function with the values of its
+        arguments, for every attempt.
+        """
+        hedger = self.make_hedger()
+        d = hedger.txapply(self.attempt, succeed(1), succeed(2))
+        self.clock.advance(1)
+        self.attempts[1][1].callback(3)
+        self.assertThat(d, succeeded(Equals(3)))
+        self.assertThat(
+            [args for args, _ in self.attempts], Equals([(1, 2), (1, 2)]))
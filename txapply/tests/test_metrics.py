@@ -0,0 +1,166 @@
+"""
+Tests for ``Histogram`` and ``Metrics``.
+"""
+
+from io import StringIO
+
+from hypothesis import given, strategies as st
+from testtools import TestCase
+from testtools.matchers import AfterPreprocessing, Equals, Is, LessThan
+from testtools.twistedsupport import failed, succeeded
+from twisted.internet.defer import Deferred, fail, succeed
+
+from txapply import Histogram, Metrics
+from .helpers import FakeTimer
+
+
+class HistogramTests(TestCase):
+    """
+    Tests for ``Histogram``.
+    """
+
+    def test_empty(self):
+        """
+        An empty histogram has no values.
+        """
+        histogram = Histogram()
+        self.assertThat(
+            (histogram.count, histogram.quantile(0.5), histogram.buckets()),
+            Equals((0, 0.0, [])))
+
+    def test_exact_small_values(self):
+        """
+        Values up to ``2 ** significant_bits`` units are recorded exactly.
+        """
+        histogram = Histogram(unit=1, highest=1000, significant_bits=4)
+        for value in [1, 2, 2, 15]:
+            histogram.record(value)
+        self.assertThat(
+            histogram.buckets(),
+            Equals([(1, 2, 1), (2, 3, 2), (15, 16, 1)]))
+        self.assertThat(
+            [histogram.quantile(q) for q in [0.25, 0.5, 0.75, 1]],
+            Equals([1, 2, 2, 15]))
+
+    @given(st.integers(min_value=1, max_value=10 ** 6))
+    def test_relative_error(self, value):
+        """
+        Every value is recorded in a bucket that contains it, and is either
+        exact or no wider than ``1 / 2 ** (significant_bits - 1)`` of it.
+        """
+        histogram = Histogram(unit=1, highest=10 ** 6, significant_bits=7)
+        histogram.record(value)
+        [(lowest, highest, count)] = histogram.buckets()
+        self.assertThat(lowest <= value < highest, Is(True))
+        self.assertThat(
+            highest - lowest, LessThan(max(1, value / 64.0) + 0.001))
+
+    def test_highest(self):
+        """
+        Values above ``highest`` are counted in the last bucket, and the
+        amount of memory is fixed.
+        """
+        histogram = Histogram(unit=1, highest=1000)
+        size = len(histogram._counts)
+        histogram.record(10 ** 9)
+        self.assertThat(len(histogram._counts), Equals(size))
+        [(lowest, highest, count)] = histogram.buckets()
+        self.assertThat(lowest <= 1000 < highest, Is(True))
+
+    def test_quantiles(self):
+        """
+        Quantiles are estimated to within the bucket width.
+        """
+        histogram = Histogram()
+        for i in range(1, 1001):
+            histogram.record(i / 1000.0)
+        self.assertThat(histogram.count, Equals(1000))
+        for q in [0.5, 0.99, 0.999]:
+            self.assertThat(
+                abs(histogram.quantile(q) - q) / q, LessThan(1 / 64.0))
+
+
+class MetricsTests(TestCase):
+    """
+    Tests for ``Metrics``.
+    """
+
+    def setUp(self):
+        super(MetricsTests, self).setUp()
+        self.timer = FakeTimer()
+        self.metrics = Metrics(timer=self.timer)
+
+    def test_txapply(self):
+        """
+        ``Metrics.txapply`` records how long the function took to produce
+        its result, labelled with its name.
+        """
+        result = Deferred()
+
+        def slow(x):
+            return result
+        d = self.metrics.txapply(slow, succeed(1))
+        self.timer.now += 0.25
+        result.callback('done')
+        self.assertThat(d, succeeded(Equals('done')))
+        [(label, histogram)] = self.metrics.latencies.items()
+        self.assertThat(
+            (label, histogram.count, histogram.total),
+            Equals((__name__ + '.MetricsTests.test_txapply.<locals>.slow',
+                    1, 0.25)))
+
+    def test_txapply_labelled(self):
+        """
+        ``Metrics.txapply_labelled`` records under the label it is given,
+        including calls that fail.
+        """
+        self.metrics.txapply_labelled('a', lambda: 1)
+        d = self.metrics.txapply_labelled('a', lambda: fail(ValueError()))
+        self.assertThat(d, failed(AfterPreprocessing(
+            lambda failure: failure.type, Is(ValueError))))
+        self.assertThat(self.metrics.latencies['a'].count, Equals(2))
+
+    def test_gather_dict(self):
+        """
+        ``Metrics.gather_dict`` gathers as ``gather_dict`` does, and records
+        how many inputs there were.
+        """
+        d = self.metrics.gather_dict(
+            {'a': succeed(1), 'b': succeed(2)}, label='pair')
+        self.assertThat(d, succeeded(Equals({'a': 1, 'b': 2})))
+        self.assertThat(
+            self.metrics.gather_sizes['pair'].buckets(),
+            Equals([(2, 3, 1)]))
+
+    def test_gather_dict_call_site(self):
+        """
+        Without a label, gathers are recorded by their call site.
+        """
+        self.metrics.gather_dict({})
+        [label] = self.metrics.gather_sizes
+        self.assertThat(
+            label.rsplit(':', 1)[0],
+            Equals(__name__ + ':test_gather_dict_call_site'))
+
+    def test_prometheus(self):
+        """
+        Metrics are rendered as Prometheus summaries.
+        """
+        metrics = Metrics(timer=self.timer, quantiles=(0.5,))
+        metrics.txapply_labelled('say "hi"', lambda: None)
+        metrics.gather_dict({'a': succeed(1)}, label='one')
+        output = StringIO()
+        metrics.write_prometheus(output, prefix='app')
+        self.assertThat(output.getvalue(), Equals(
+            '# HELP app_latency_seconds How long applied functions took to '
+            'produce results.\n'
+            '# TYPE app_latency_seconds summary\n'
+            'app_latency_seconds{function="say \\"hi\\"",quantile="0.5"} '
+            '0.0\n'
+            'app_latency_seconds_sum{function="say \\"hi\\""} 0.0\n'
+            'app_latency_seconds_count{function="say \\"hi\\""} 1\n'
+            '# HELP app_gather_size How many inputs gathers had.\n'
+            '# TYPE app_gather_size summary\n'
+            'app_gather_size{gather="one",quantile="0.5"} 1\n'
+            'app_gather_size_sum{gather="one"} 1.0\n'
+            'app_gather_size_count{gather="one"} 1\n'))
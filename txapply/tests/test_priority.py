@@ -0,0 +1,165 @@
+"""
+Tests for ``PriorityScheduler``.
+"""
+
+from testtools import TestCase
+from testtools.matchers import Equals
+from testtools.twistedsupport import has_no_result, succeeded
+from twisted.internet.defer import CancelledError, Deferred, succeed
+from twisted.internet.task import Clock
+
+from txapply import PriorityScheduler
+from .helpers import is_failure
+
+
+class TurningClock(Clock):
+    """
+    A clock where time passes by hand, and delayed calls that are due are
+    run a turn of the event loop at a time.
+    """
+
+    def advance(self, amount):
+        self.rightNow += amount
+
+    def turn(self):
+        """
+        Run the calls that are due, but not any that they schedule.
+        """
+        due = [call for call in self.calls if call.getTime() <= self.rightNow]
+        for call in due:
+            self.calls.remove(call)
+            call.called = 1
+            call.func(*call.args, **call.kw)
+
+
+class PrioritySchedulerTests(TestCase):
+    """
+    Tests for ``PriorityScheduler``.
+    """
+
+    def setUp(self):
+        super(PrioritySchedulerTests, self).setUp()
+        self.clock = TurningClock()
+        self.made = []
+
+    def record(self, name):
+        self.made.append(name)
+        return name
+
+    def test_waits_for_event_loop(self):
+        """
+        Calls are queued, and made the next time round the event loop.
+        """
+        scheduler = PriorityScheduler(self.clock)
+        d = scheduler.call(0, self.record, 'a')
+        self.assertThat(d, has_no_result())
+        self.assertThat(len(scheduler), Equals(1))
+        self.clock.turn()
+        self.assertThat(d, succeeded(Equals('a')))
+
+    def test_priority_order(self):
+        """
+        More urgent calls are made first, and calls with the same priority
+        in the order they were queued.
+        """
+        scheduler = PriorityScheduler(self.clock)
+        for priority, name in [(5, 'batch1'), (0, 'urgent1'), (5, 'batch2'),
+                               (0, 'urgent2'), (2, 'normal')]:
+            scheduler.call(priority, self.record, name)
+        self.clock.turn()
+        self.assertThat(
+            self.made,
+            Equals(['urgent1', 'urgent2', 'normal', 'batch1', 'batch2']))
+
+    def test_batch_size(self):
+        """
+        At most ``batch_size`` calls are made each time round the event loop.
+        """
+        scheduler = PriorityScheduler(self.clock, batch_size=2)
+        for i in range(5):
+            scheduler.call(0, self.record, i)
+        self.clock.turn()
+        self.assertThat(self.made, Equals([0, 1]))
+        scheduler.call(-1, self.record, 'urgent')
+        self.clock.turn()
+        self.assertThat(self.made, Equals([0, 1, 'urgent', 2]))
+        self.clock.turn()
+        self.clock.turn()
+        self.assertThat(self.made, Equals([0, 1, 'urgent', 2, 3, 4]))
+        self.assertThat(self.clock.getDelayedCalls(), Equals([]))
+
+    def test_aging(self):
+        """
+        A call that has waited long enough is made before more urgent calls
+        queued since.
+        """
+        scheduler = PriorityScheduler(self.clock, batch_size=1, aging=1.0)
+        scheduler.call(0, self.record, 'first')
+        scheduler.call(3, self.record, 'old')
+        self.clock.advance(2)
+        scheduler.call(0, self.record, 'recent')
+        self.clock.advance(2)
+        scheduler.call(0, self.record, 'latest')
+        for i in range(4):
+            self.clock.turn()
+        self.assertThat(
+            self.made, Equals(['first', 'recent', 'old', 'latest']))
+
+    def test_cancel_queued(self):
+        """
+        Cancelling a queued call means it isn't made.
+        """
+        scheduler = PriorityScheduler(self.clock)
+        d = scheduler.call(0, self.record, 'a')
+        d.cancel()
+        self.clock.turn()
+        self.assertThat(d, is_failure(CancelledError))
+        self.assertThat(self.made, Equals([]))
+
+    def test_len_cancelled(self):
+        """
+        Cancelled calls aren't counted as queued, before or after they are
+        thrown away, and cancelling a call that has been made doesn't change
+        the count.
+        """
+        scheduler = PriorityScheduler(self.clock, batch_size=1)
+        first = scheduler.call(0, self.record, 'a')
+        scheduler.call(1, self.record, 'b')
+        scheduler.call(2, self.record, 'c')
+        scheduler.call(1, self.record, 'b').cancel()
+        self.assertThat(len(scheduler), Equals(3))
+        self.clock.turn()
+        first.cancel()
+        self.assertThat(len(scheduler), Equals(2))
+        self.clock.turn()
+        self.assertThat(len(scheduler), Equals(1))
+        self.clock.turn()
+        self.assertThat(len(scheduler), Equals(0))
+        self.assertThat(self.made, Equals(['a', 'b', 'c']))
+
+    def test_cancel_started(self):
+        """
+        Cancelling a call that has been made cancels its result.
+        """
+        scheduler = PriorityScheduler(self.clock)
+        cancelled = []
+        slow = Deferred(cancelled.append)
+        d = scheduler.call(0, lambda: slow)
+        self.clock.turn()
+        d.cancel()
+        self.assertThat(cancelled, Equals([slow]))
+        self.assertThat(d, is_failure(CancelledError))
+
+    def test_txapply(self):
+        """
+        ``PriorityScheduler.txapply`` queues the call once the arguments
+        have arrived.
+        """
+        scheduler = PriorityScheduler(self.clock)
+        argument = Deferred()
+        d = scheduler.txapply(1, lambda x, y: x + y, argument, y=succeed(2))
+        self.assertThat(len(scheduler), Equals(0))
+        argument.callback(1)
+        self.assertThat(d, has_no_result())
+        self.clock.turn()
+        self.assertThat(d, succeeded(Equals(3)))
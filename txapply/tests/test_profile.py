@@ -0,0 +1,96 @@
+"""
+Tests for ``GatherProfiler``.
+"""
+
+from io import StringIO
+
+from testtools import TestCase
+from testtools.matchers import Equals, StartsWith
+from testtools.twistedsupport import succeeded
+from twisted.internet.defer import Deferred, succeed
+from twisted.internet.task import Clock
+
+from txapply import GatherProfiler
+
+
+class GatherProfilerTests(TestCase):
+    """
+    Tests for ``GatherProfiler``.
+    """
+
+    def setUp(self):
+        super(GatherProfilerTests, self).setUp()
+        self.clock = Clock()
+        self.profiler = GatherProfiler(self.clock)
+
+    def gather(self, delays, site='site'):
+        """
+        Gather Deferreds that fire after ``delays`` seconds.
+        """
+        deferreds = {key: Deferred() for key in delays}
+        start = self.clock.seconds()
+        result = self.profiler.gather_dict(deferreds, site=site)
+        for key, delay in sorted(delays.items(), key=lambda i: i[1]):
+            self.clock.advance(start + delay - self.clock.seconds())
+            deferreds[key].callback(key)
+        return result
+
+    def test_gathers(self):
+        """
+        ``GatherProfiler.gather_dict`` gathers like ``gather_dict``.
+        """
+        d = self.gather({'a': 1, 'b': 2})
+        self.assertThat(d, succeeded(Equals({'a': 'a', 'b': 'b'})))
+
+    def test_critical_path(self):
+        """
+        The input that resolves last is on the critical path, and the other
+        inputs have slack.
+        """
+        self.gather({'a': 1, 'b': 3, 'c': 2})
+        self.gather({'a': 4, 'b': 3, 'c': 2})
+        [(key, profile), _, (slack_key, slack)] = (
+            self.profiler.critical_path('site'))
+        self.assertThat(
+            (key, profile.critical, profile.critical_time),
+            Equals(('a', 1, 4)))
+        self.assertThat(
+            (slack_key, slack.count, slack.total_time, slack.total_slack),
+            Equals(('c', 2, 4, 3)))
+
+    def test_default_site(self):
+        """
+        If no site is given, the gather is recorded against whatever called
+        ``gather_dict``.
+        """
+        self.profiler.gather_dict({'a': succeed(None)})
+        [site] = self.profiler.sites
+        self.assertThat(
+            site, StartsWith(__name__ + ':test_default_site:'))
+
+    def test_txapply(self):
+        """
+        ``GatherProfiler.txapply`` records the arguments to a function, and
+        calls it.
+        """
+        x = Deferred()
+        d = self.profiler.txapply(lambda x, y: x + y, x, y=succeed(2))
+        self.clock.advance(5)
+        x.callback(1)
+        self.assertThat(d, succeeded(Equals(3)))
+        [(site, keys)] = self.profiler.sites.items()
+        self.assertThat(site, Equals(
+            __name__ + '.GatherProfilerTests.test_txapply.<locals>.<lambda>'))
+        self.assertThat(keys[0].critical_time, Equals(5))
+
+    def test_collapsed(self):
+        """
+        ``write_collapsed`` writes a line for every input that was on the
+        critical path, weighted by microseconds.
+        """
+        self.gather({'a': 1, 'b': 2}, site='one')
+        self.gather({'a': 0.5}, site='two')
+        output = StringIO()
+        self.profiler.write_collapsed(output)
+        self.assertThat(
+            output.getvalue(), Equals('one;b 2000000\ntwo;a 500000\n'))
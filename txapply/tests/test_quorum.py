@@ -0,0 +1,169 @@
+"""
+Tests for ``gather_quorum``, ``gather_quorum_dict``, ``race`` and
+``race_dict``.
+"""
+
+from testtools import TestCase
+from testtools.matchers import AfterPreprocessing, Equals, Is, IsInstance
+from testtools.twistedsupport import failed, has_no_result, succeeded
+from twisted.internet.defer import CancelledError, Deferred, fail, succeed
+
+from txapply import (
+    QuorumError,
+    RaceError,
+    gather_quorum,
+    gather_quorum_dict,
+    race,
+    race_dict,
+)
+
+
+class Cancellable(Deferred):
+    """
+    A Deferred that records whether it has been cancelled.
+    """
+
+    cancelled = False
+
+    def __init__(self):
+        Deferred.__init__(self, self._record_cancel)
+
+    def _record_cancel(self, ignored):
+        self.cancelled = True
+
+
+class GatherQuorumTests(TestCase):
+    """
+    Tests for ``gather_quorum``.
+    """
+
+    def test_fires_at_quorum(self):
+        """
+        ``gather_quorum`` fires as soon as enough Deferreds have succeeded,
+        with their indexes and values in the order they arrived, and cancels
+        the rest.
+        """
+        inputs = [Cancellable() for i in range(4)]
+        d = gather_quorum(inputs, 2)
+        inputs[2].callback('c')
+        inputs[1].errback(ZeroDivisionError())
+        self.assertThat(d, has_no_result())
+        inputs[0].callback('a')
+        self.assertThat(d, succeeded(Equals([(2, 'c'), (0, 'a')])))
+        self.assertThat(inputs[3].cancelled, Is(True))
+
+    def test_fails_when_impossible(self):
+        """
+        ``gather_quorum`` fails with ``QuorumError`` as soon as so many
+        Deferreds have failed that a quorum can't be reached.
+        """
+        inputs = [Cancellable() for i in range(4)]
+        d = gather_quorum(inputs, 3)
+        inputs[0].errback(ZeroDivisionError())
+        self.assertThat(d, has_no_result())
+        inputs[3].errback(KeyError())
+        self.assertThat(d, failed(AfterPreprocessing(
+            lambda failure: sorted(failure.value.failures),
+            Equals([0, 3]))))
+        self.assertThat(inputs[1].cancelled, Is(True))
+
+    def test_already_fired(self):
+        """
+        If enough Deferreds have already succeeded, ``gather_quorum`` fires
+        immediately and cancels the rest.
+        """
+        later = Cancellable()
+        d = gather_quorum([succeed(1), fail(KeyError()), later], 1)
+        self.assertThat(d, succeeded(Equals([(0, 1)])))
+        self.assertThat(later.cancelled, Is(True))
+
+    def test_cancel(self):
+        """
+        Cancelling the result cancels the Deferreds that haven't fired.
+        """
+        inputs = [Cancellable(), Cancellable()]
+        d = gather_quorum(inputs, 1)
+        d.cancel()
+        self.assertThat(d, failed(AfterPreprocessing(
+            lambda failure: failure.value, IsInstance(CancelledError))))
+        self.assertThat(inputs[0].cancelled, Is(True))
+
+    def test_bad_quorum(self):
+        """
+        Asking for more successes than there are Deferreds, or for none,
+        raises ``ValueError``.
+        """
+        self.assertRaises(ValueError, gather_quorum, [succeed(1)], 2)
+        self.assertRaises(ValueError, gather_quorum, [succeed(1)], 0)
+
+
+class GatherQuorumDictTests(TestCase):
+    """
+    Tests for ``gather_quorum_dict``.
+    """
+
+    def test_fires_at_quorum(self):
+        """
+        ``gather_quorum_dict`` fires with a dictionary of the Deferreds that
+        succeeded in time.
+        """
+        slow = Cancellable()
+        d = gather_quorum_dict(
+            {'a': succeed(1), 'b': slow, 'c': succeed(3)}, 2)
+        self.assertThat(d, succeeded(Equals({'a': 1, 'c': 3})))
+        self.assertThat(slow.cancelled, Is(True))
+
+    def test_fails(self):
+        """
+        ``gather_quorum_dict`` fails with the failures of each key.
+        """
+        d = gather_quorum_dict(
+            {'a': succeed(1), 'b': fail(KeyError())}, 2)
+        self.assertThat(d, failed(AfterPreprocessing(
+            lambda failure: (failure.type, list(failure.value.failures)),
+            Equals((QuorumError, ['b'])))))
+
+
+class RaceTests(TestCase):
+    """
+    Tests for ``race`` and ``race_dict``.
+    """
+
+    def test_first_success(self):
+        """
+        ``race`` fires with the first success, and cancels the rest.
+        """
+        inputs = [Cancellable() for i in range(3)]
+        d = race(inputs)
+        inputs[0].errback(KeyError())
+        inputs[2].callback('c')
+        self.assertThat(d, succeeded(Equals('c')))
+        self.assertThat(inputs[1].cancelled, Is(True))
+
+    def test_all_fail(self):
+        """
+        ``race`` fails with ``RaceError`` once every Deferred has failed.
+        """
+        inputs = [Cancellable() for i in range(2)]
+        d = race(inputs)
+        inputs[1].errback(KeyError())
+        self.assertThat(d, has_no_result())
+        inputs[0].errback(ZeroDivisionError())
+        self.assertThat(d, failed(AfterPreprocessing(
+            lambda failure: (failure.type, sorted(failure.value.failures)),
+            Equals((RaceError, [0, 1])))))
+
+    def test_empty(self):
+        """
+        A race with no Deferreds raises ``ValueError``.
+        """
+        self.assertRaises(ValueError, race, [])
+
+    def test_race_dict(self):
+        """
+        ``race_dict`` fires with the key and value of the winner.
+        """
+        slow = Cancellable()
+        d = race_dict({'slow': slow, 'fast': succeed(1)})
+        self.assertThat(d, succeeded(Equals(('fast', 1))))
+        self.assertThat(slow.cancelled, Is(True))
@@ -0,0 +1,184 @@
+"""
+Tests for ``ApplyStream``.
+"""
+
+from testtools import TestCase
+from testtools.matchers import AfterPreprocessing, Equals, Is
+from testtools.twistedsupport import failed, has_no_result, succeeded
+from twisted.internet.defer import Deferred, succeed
+
+from txapply import ApplyStream
+
+
+class FakeProducer(object):
+    """
+    A push producer that records what it's been asked to do.
+    """
+
+    def __init__(self):
+        self.state = 'producing'
+
+    def pauseProducing(self):
+        self.state = 'paused'
+
+    def resumeProducing(self):
+        self.state = 'producing'
+
+    def stopProducing(self):
+        self.state = 'stopped'
+
+
+class FakeConsumer(object):
+    """
+    A consumer that records what's written to it.
+    """
+
+    def __init__(self):
+        self.written = []
+        self.producer = None
+
+    def registerProducer(self, producer, streaming):
+        self.producer = producer
+
+    def unregisterProducer(self):
+        self.producer = None
+
+    def write(self, data):
+        self.written.append(data)
+
+
+class ApplyStreamTests(TestCase):
+    """
+    Tests for ``ApplyStream``.
+    """
+
+    def setUp(self):
+        super(ApplyStreamTests, self).setUp()
+        self.producer = FakeProducer()
+        self.consumer = FakeConsumer()
+        self.calls = []
+
+    def wait(self, *args):
+        """
+        A function that returns a Deferred that the test can fire.
+        """
+        d = Deferred()
+        self.calls.append((args, d))
+        return d
+
+    def make_stream(self, function, **kwargs):
+        stream = ApplyStream(function, self.consumer, **kwargs)
+        stream.registerProducer(self.producer, True)
+        return stream
+
+    def test_applies(self):
+        """
+        Each tuple of arguments written to the stream is applied to the
+        function, and the results are written to the consumer.
+        """
+        stream = self.make_stream(lambda x, y: x + y)
+        self.assertThat(self.consumer.producer, Is(stream))
+        stream.write((1, 2))
+        stream.write((succeed(3), 4))
+        self.assertThat(self.consumer.written, Equals([3, 7]))
+        self.assertThat(stream.finished, has_no_result())
+        stream.unregisterProducer()
+        self.assertThat(stream.finished, succeeded(Is(None)))
+        self.assertThat(self.consumer.producer, Is(None))
+
+    def test_concurrency(self):
+        """
+        No more than ``concurrency`` calls are running at once.
+        """
+        stream = self.make_stream(self.wait, concurrency=2)
+        for i in range(3):
+            stream.write((i,))
+        self.assertThat(len(self.calls), Equals(2))
+        self.calls[1][1].callback('b')
+        self.assertThat(len(self.calls), Equals(3))
+        self.assertThat(self.consumer.written, Equals(['b']))
+
+    def test_many_quick_calls_waiting(self):
+        """
+        Thousands of calls that finish straight away can wait behind a slow
+        one, and all run once it finishes.
+        """
+        slow = Deferred()
+        stream = self.make_stream(
+            lambda i: slow if i == 0 else i, concurrency=1, high_water=5000)
+        for i in range(5000):
+            stream.write((i,))
+        slow.callback(0)
+        stream.unregisterProducer()
+        self.assertThat(self.consumer.written, Equals(list(range(5000))))
+        self.assertThat(stream.finished, succeeded(Is(None)))
+
+    def test_backpressure(self):
+        """
+        The producer is paused at ``high_water`` and resumed at
+        ``low_water``.
+        """
+        stream = self.make_stream(
+            self.wait, concurrency=1, high_water=3, low_water=1)
+        stream.write((0,))
+        stream.write((1,))
+        self.assertThat(self.producer.state, Equals('producing'))
+        stream.write((2,))
+        self.assertThat(self.producer.state, Equals('paused'))
+        self.calls[0][1].callback(0)
+        self.assertThat(self.producer.state, Equals('paused'))
+        self.calls[1][1].callback(1)
+        self.assertThat(self.producer.state, Equals('producing'))
+        self.assertThat(self.consumer.written, Equals([0, 1]))
+
+    def test_paused_by_consumer(self):
+        """
+        While the consumer has paused the stream, results are held back, and
+        count towards ``high_water``.
+        """
+        stream = self.make_stream(
+            lambda x: x, high_water=2, low_water=0)
+        stream.pauseProducing()
+        stream.write((1,))
+        stream.write((2,))
+        self.assertThat(self.consumer.written, Equals([]))
+        self.assertThat(self.producer.state, Equals('paused'))
+        stream.resumeProducing()
+        self.assertThat(self.consumer.written, Equals([1, 2]))
+        self.assertThat(self.producer.state, Equals('producing'))
+
+    def test_waits_for_running(self):
+        """
+        ``finished`` doesn't fire until every call has finished.
+        """
+        stream = self.make_stream(self.wait)
+        stream.write((1,))
+        stream.unregisterProducer()
+        self.assertThat(stream.finished, has_no_result())
+        self.calls[0][1].callback(1)
+        self.assertThat(self.consumer.written, Equals([1]))
+        self.assertThat(stream.finished, succeeded(Is(None)))
+
+    def test_failure(self):
+        """
+        If a call fails, the producer is stopped and ``finished`` fails.
+        """
+        stream = self.make_stream(lambda x: 1 // x)
+        stream.write((0,))
+        self.assertThat(self.producer.state, Equals('stopped'))
+        self.assertThat(stream.finished, failed(AfterPreprocessing(
+            lambda f: f.type, Is(ZeroDivisionError))))
+        stream.write((1,))
+        self.assertThat(self.consumer.written, Equals([]))
+
+    def test_stopped_by_consumer(self):
+        """
+        If the consumer stops the stream, the producer is stopped too.
+        """
+        stream = self.make_stream(self.wait)
+        stream.write((1,))
+        stream.stopProducing()
+        self.assertThat(self.producer.state, Equals('stopped'))
+        self.assertThat(stream.finished, succeeded(Is(None)))
+        self.calls[0][1].callback(1)
+        self.assertThat(self.consumer.written, Equals([]))
@@ -0,0 +1,181 @@
+"""
+Tests for ``Tracer``.
+"""
+
+import json
+from io import StringIO
+
+from testtools import TestCase
+from testtools.matchers import Equals, HasLength, Is, MatchesStructure
+from testtools.twistedsupport import succeeded
+from twisted.internet.defer import Deferred, fail, succeed
+from twisted.internet.task import Clock
+from twisted.python import log
+
+from txapply import JsonLinesExporter, Tracer, current_span
+
+
+def add(x, y):
+    return x + y
+
+
+class TracerTests(TestCase):
+    """
+    Tests for ``Tracer``.
+    """
+
+    def setUp(self):
+        super(TracerTests, self).setUp()
+        self.clock = Clock()
+        self.spans = []
+        self.tracer = Tracer(self.clock, self.spans.append)
+
+    def test_span(self):
+        """
+        An application's span covers waiting for its arguments and running
+        its function, and is exported once its result fires.
+        """
+        x = Deferred()
+        result = Deferred()
+        d = self.tracer.txapply(lambda x: result, x)
+        self.clock.advance(1)
+        x.callback(1)
+        self.clock.advance(2)
+        self.assertThat(self.spans, Equals([]))
+        result.callback('done')
+        self.assertThat(d, succeeded(Equals('done')))
+        [span] = self.spans
+        self.assertThat(span, MatchesStructure.byEquality(
+            start=0, ready=1, end=3, parent_id=None, error=None))
+        self.assertThat(span.trace_id, HasLength(32))
+        self.assertThat(span.span_id, HasLength(16))
+
+    def test_name(self):
+        """
+        Spans are named after the function.
+        """
+        self.tracer.txapply(add, succeed(1), y=succeed(2))
+        self.assertThat(
+            self.spans[0].name, Equals('txapply.tests.test_tracing.add'))
+
+    def test_error(self):
+        """
+        Spans record failures.
+        """
+        d = self.tracer.txapply(lambda: fail(ValueError('bad')))
+        d.addErrback(lambda failure: None)
+        self.assertThat(self.spans[0].error, Equals('ValueError: bad'))
+
+    def test_children(self):
+        """
+        Applications and gathers traced while a traced function is running
+        are its children.
+        """
+        def outer():
+            self.tracer.gather_dict({'a': succeed(1)}, name='lookup')
+            return self.tracer.txapply(add, succeed(1), succeed(2))
+        d = self.tracer.txapply(outer)
+        self.assertThat(d, succeeded(Equals(3)))
+        lookup, inner, parent = self.spans
+        self.assertThat(
+            [span.name for span in self.spans],
+            Equals(['lookup', 'txapply.tests.test_tracing.add',
+                    parent.name]))
+        for child in [lookup, inner]:
+            self.assertThat(
+                (child.trace_id, child.parent_id),
+                Equals((parent.trace_id, parent.span_id)))
+        self.assertThat(parent.parent_id, Is(None))
+
+    def test_current_span_outside(self):
+        """
+        There's no current span outside traced functions.
+        """
+        self.tracer.txapply(add, succeed(1), succeed(2))
+        self.assertThat(current_span(), Is(None))
+
+    def test_sampling(self):
+        """
+        Whether to record a trace is decided when its first span starts, and
+        its children follow that decision.
+        """
+        decisions = iter([0.7, 0.2])
+        tracer = Tracer(
+            self.clock, self.spans.append, sample_rate=0.5,
+            random=lambda: next(decisions))
+
+        current = []
+
+        def outer():
+            current.append(current_span())
+            return tracer.txapply(add, succeed(1), succeed(2))
+        self.assertThat(tracer.txapply(outer), succeeded(Equals(3)))
+        self.assertThat((self.spans, current), Equals(([], [None])))
+        self.assertThat(tracer.txapply(outer), succeeded(Equals(3)))
+        self.assertThat(self.spans, HasLength(2))
+        self.assertThat(current[1], Is(self.spans[1]))
+
+    def test_unsampled_unnamed(self):
+        """
+        Applications that aren't sampled don't work out the name of their
+        function.
+        """
+        named = []
+
+        class Function(object):
+            @property
+            def __name__(self):
+                named.append(self)
+                return 'Function'
+
+            def __call__(self):
+                return 1
+        decisions = iter([0.7, 0.2])
+        tracer = Tracer(
+            self.clock, self.spans.append, sample_rate=0.5,
+            random=lambda: next(decisions))
+        function = Function()
+        self.assertThat(tracer.txapply(function), succeeded(Equals(1)))
+        self.assertThat((self.spans, named), Equals(([], [])))
+        self.assertThat(tracer.txapply(function), succeeded(Equals(1)))
+        self.assertThat(self.spans, HasLength(1))
+        self.assertThat(named, Equals([function]))
+
+    def test_exporter_failure(self):
+        """
+        If the exporter fails, the result is unaffected, and the failure is
+        logged.
+        """
+        def broken(span):
+            raise ZeroDivisionError()
+        events = []
+        log.addObserver(events.append)
+        self.addCleanup(log.removeObserver, events.append)
+        tracer = Tracer(self.clock, broken)
+        d = tracer.txapply(add, succeed(1), succeed(2))
+        self.assertThat(d, succeeded(Equals(3)))
+        [event] = [event for event in events if event.get('isError')]
+        self.assertThat(event['failure'].type, Is(ZeroDivisionError))
+
+
+class JsonLinesExporterTests(TestCase):
+    """
+    Tests for ``JsonLinesExporter``.
+    """
+
+    def test_export(self):
+        """
+        Each span is written as a JSON object on a line of its own.
+        """
+        output = StringIO()
+        tracer = Tracer(Clock(), JsonLinesExporter(output))
+        tracer.txapply(add, succeed(1), succeed(2))
+        tracer.gather_dict({}, name='empty')
+        lines = output.getvalue().splitlines()
+        self.assertThat(
+            [json.loads(line)['name'] for line in lines],
+            Equals(['txapply.tests.test_tracing.add', 'empty']))
+        self.assertThat(
+            sorted(json.loads(lines[0])),
+            Equals(['end', 'error', 'name', 'parent_id', 'ready', 'span_id',
+                    'start', 'trace_id']))
@@ -0,0 +1,115 @@
+"""
+Tests for ``gather_tree`` and ``gather_dict_tree``.
+"""
+
+from hypothesis import given
+from hypothesis.strategies import dictionaries, integers, lists
+from testtools import TestCase
+from testtools.matchers import AfterPreprocessing, Equals, Is
+from testtools.twistedsupport import failed, has_no_result, succeeded
+from twisted.internet.defer import CancelledError, Deferred, fail, succeed
+
+from txapply import gather_dict_tree, gather_tree
+
+
+class GatherTreeTests(TestCase):
+    """
+    Tests for ``gather_tree``.
+    """
+
+    @given(values=lists(integers()), group_size=integers(2, 5))
+    def test_gathers(self, values, group_size):
+        """
+        ``gather_tree`` fires with the values of its Deferreds, in order.
+        """
+        d = gather_tree(map(succeed, values), group_size)
+        self.assertThat(d, succeeded(Equals(values)))
+
+    def test_groups(self):
+        """
+        ``on_group`` is called as soon as each group has arrived.
+        """
+        inputs = [Deferred() for i in range(5)]
+        groups = []
+        d = gather_tree(inputs, 2, lambda *group: groups.append(group))
+        inputs[3].callback(3)
+        inputs[2].callback(2)
+        self.assertThat(groups, Equals([(2, [2, 3])]))
+        inputs[4].callback(4)
+        inputs[1].callback(1)
+        inputs[0].callback(0)
+        self.assertThat(groups, Equals([(2, [2, 3]), (4, [4]), (0, [0, 1])]))
+        self.assertThat(d, succeeded(Equals([0, 1, 2, 3, 4])))
+
+    def test_failure(self):
+        """
+        If any Deferred fails, the result fails.
+        """
+        inputs = [succeed(i) for i in range(10)]
+        inputs[7] = fail(ZeroDivisionError())
+        d = gather_tree(inputs, 2)
+        self.assertThat(d, failed(AfterPreprocessing(
+            lambda failure: failure.type, Is(ZeroDivisionError))))
+
+    def test_cancel(self):
+        """
+        Cancelling the result cancels all the Deferreds that haven't fired.
+        """
+        inputs = [Deferred() for i in range(5)]
+        inputs[0].callback(0)
+        d = gather_tree(inputs, 2)
+        d.cancel()
+        self.assertThat(d, failed(AfterPreprocessing(
+            lambda failure: failure.type, Is(CancelledError))))
+        for deferred in inputs[1:]:
+            self.assertThat(deferred, succeeded(Is(None)))
+
+
+    @given(group_size=integers(max_value=1))
+    def test_group_size_too_small(self, group_size):
+        """
+        ``gather_tree`` refuses groups of fewer than two, which would never
+        be joined into one.
+        """
+        self.assertRaises(
+            ValueError, gather_tree, [succeed(1), succeed(2)], group_size)
+
+
+class GatherDictTreeTests(TestCase):
+    """
+    Tests for ``gather_dict_tree``.
+    """
+
+    @given(dictionary=dictionaries(integers(), integers()),
+           group_size=integers(2, 5))
+    def test_gathers(self, dictionary, group_size):
+        """
+        ``gather_dict_tree`` fires with a dictionary of the values of its
+        Deferreds.
+        """
+        d = gather_dict_tree(
+            {k: succeed(v) for k, v in dictionary.items()}, group_size)
+        self.assertThat(d, succeeded(Equals(dictionary)))
+
+    def test_groups(self):
+        """
+        ``on_group`` is called with each group's items as soon as they
+        arrive.
+        """
+        a, b, c = Deferred(), Deferred(), Deferred()
+        groups = []
+        d = gather_dict_tree({'a': a, 'b': b, 'c': c}, 2, groups.append)
+        c.callback(3)
+        self.assertThat(groups, Equals([{'c': 3}]))
+        self.assertThat(d, has_no_result())
+        a.callback(1)
+        b.callback(2)
+        self.assertThat(groups, Equals([{'c': 3}, {'a': 1, 'b': 2}]))
+        self.assertThat(d, succeeded(Equals({'a': 1, 'b': 2, 'c': 3})))
+
+    def test_group_size_too_small(self):
+        """
+        ``gather_dict_tree`` refuses groups of fewer than two.
+        """
+        self.assertRaises(
+            ValueError, gather_dict_tree, {'a': succeed(1)}, 1)
@@ -12,13 +12,20 @@ from hypothesis.strategies import (
     choices,
     dictionaries,
     integers,
+    lists,
 )
 from testtools import TestCase
 from testtools.matchers import AfterPreprocessing, Equals, Is
-from testtools.twistedsupport import failed, succeeded
-from twisted.internet.defer import maybeDeferred, succeed
+from testtools.twistedsupport import failed, has_no_result, succeeded
+from twisted.internet.defer import (
+    CancelledError,
+    Deferred,
+    fail,
+    maybeDeferred,
+    succeed,
+)
 
-from txapply import gather_dict, txapply
+from txapply import gather_dict, gather_reduce, gather_reduce_dict, txapply
 
 from .strategies import (
     any_value,
@@ -162,3 +169,128 @@ class GatherDictTests(TestCase):
         deferred_dict = {k: succeed(v) for (k, v) in dictionary.items()}
         d = gather_dict(deferred_dict)
         self.assertThat(d, succeeded(Equals(dictionary)))
+
+    def test_out_of_order(self):
+        """
+        Each result goes with its own key, whatever order the Deferreds fire
+        in.
+        """
+        inputs = {key: Deferred() for key in 'abc'}
+        d = gather_dict(inputs)
+        for key in 'cab':
+            self.assertThat(d, has_no_result())
+            inputs[key].callback(key.upper())
+        self.assertThat(d, succeeded(Equals({'a': 'A', 'b': 'B', 'c': 'C'})))
+
+    def test_first_failure(self):
+        """
+        If more than one Deferred fails, the result fails with the first
+        failure, and the later ones are consumed, so they aren't logged as
+        unhandled.
+        """
+        inputs = {'a': Deferred(), 'b': Deferred(), 'c': Deferred()}
+        d = gather_dict(inputs)
+        inputs['b'].errback(ZeroDivisionError())
+        inputs['a'].errback(ValueError())
+        inputs['c'].callback(None)
+        self.assertThat(d, failed(AfterPreprocessing(
+            lambda failure: failure.type, Is(ZeroDivisionError))))
+        self.assertThat(inputs['a'], succeeded(Is(None)))
+        self.assertThat(inputs['b'], succeeded(Is(None)))
+
+    def test_cancel(self):
+        """
+        Cancelling the result cancels the Deferreds that haven't fired, and
+        leaves the ones that have alone.
+        """
+        cancelled = []
+        inputs = {key: Deferred(lambda d, key=key: cancelled.append(key))
+                  for key in 'ab'}
+        d = gather_dict(inputs)
+        inputs['a'].callback('A')
+        d.cancel()
+        self.assertThat(d, failed(AfterPreprocessing(
+            lambda failure: failure.type, Is(CancelledError))))
+        self.assertThat(cancelled, Equals(['b']))
+        self.assertThat(inputs['a'], succeeded(Equals('A')))
+        self.assertThat(inputs['b'], succeeded(Is(None)))
+
+
+class GatherReduceTests(TestCase):
+    """
+    Tests for ``gather_reduce`` and ``gather_reduce_dict``.
+    """
+
+    @given(lists(integers()))
+    def test_reduces(self, values):
+        """
+        ``gather_reduce`` fires with the results of its Deferreds folded into
+        the initial value.
+        """
+        d = gather_reduce(map(succeed, values), operator.add, 0)
+        self.assertThat(d, succeeded(Equals(sum(values))))
+
+    @given(dictionaries(integers(), integers()))
+    def test_reduces_dict(self, dictionary):
+        """
+        ``gather_reduce_dict`` passes the key of each result to the reducer.
+        """
+        d = gather_reduce_dict(
+            {k: succeed(v) for k, v in dictionary.items()},
+            lambda acc, k, v: acc + [(k, v)], [])
+        self.assertThat(d, succeeded(AfterPreprocessing(
+            sorted, Equals(sorted(dictionary.items())))))
+
+    def test_folds_as_results_arrive(self):
+        """
+        Results are folded in as they arrive, and aren't kept by their
+        Deferreds.
+        """
+        inputs = [Deferred(), Deferred()]
+        folded = []
+        d = gather_reduce(inputs, lambda acc, x: folded.append(x) or acc, 0)
+        inputs[1].callback('b')
+        self.assertThat(folded, Equals(['b']))
+        self.assertThat(inputs[1], succeeded(Is(None)))
+        self.assertThat(d, has_no_result())
+        inputs[0].callback('a')
+        self.assertThat(d, succeeded(Equals(0)))
+
+    @given(exception=exceptions())
+    def test_failure(self, exception):
+        """
+        If any Deferred fails, the result fails with the same failure.
+        """
+        d = gather_reduce(
+            [succeed(1), fail(exception), fail(ZeroDivisionError())],
+            operator.add, 0)
+        self.assertThat(d, failed(AfterPreprocessing(
+            lambda failure: failure.value, Equals(exception))))
+
+    def test_reducer_raises(self):
+        """
+        If the reducer raises, the result fails.
+        """
+        d = gather_reduce([succeed(0)], lambda acc, x: acc // x, 1)
+        self.assertThat(d, failed(AfterPreprocessing(
+            lambda failure: failure.type, Is(ZeroDivisionError))))
+
+    def test_cancel(self):
+        """
+        Cancelling the result cancels the Deferreds that haven't fired.
+        """
+        inputs = [Deferred(), Deferred()]
+        d = gather_reduce(inputs, operator.add, 0)
+        d.cancel()
+        self.assertThat(d, failed(AfterPreprocessing(
+            lambda failure: failure.type, Is(CancelledError))))
+        self.assertThat(inputs[1], succeeded(Is(None)))
+
+    def test_empty(self):
+        """
+        Reducing nothing gives the initial value.
+        """
+        self.assertThat(
+            gather_reduce([], operator.add, 0), succeeded(Equals(0)))
+        self.assertThat(
+            gather_reduce_dict({}, operator.add, 0), succeeded(Equals(0)))
@@ -0,0 +1,218 @@
+"""
+Tests for ``Watchdog``.
+"""
+
+import time
+from datetime import timedelta
+from functools import partial
+
+from testtools import TestCase
+from testtools.matchers import Contains, Equals, Is, MatchesListwise
+from testtools.twistedsupport import succeeded
+from twisted.internet.defer import succeed
+from twisted.internet.task import Clock
+
+from txapply import (
+    AdmissionController,
+    CircuitBreaker,
+    Hedger,
+    KeyedLimiter,
+    Metrics,
+    PriorityScheduler,
+    Tracer,
+    Watchdog,
+    txapply,
+)
+from .. import _instrument
+from .._combinators import (
+    Ignored,
+    combine,
+    ignore,
+    pipeline,
+    step,
+    transparent,
+)
+from .helpers import FakeTimer
+
+
+class WatchdogTests(TestCase):
+    """
+    Tests for ``Watchdog``.
+    """
+
+    def setUp(self):
+        super(WatchdogTests, self).setUp()
+        self.timer = FakeTimer()
+        self.slow = []
+        self.watchdog = Watchdog(
+            timedelta(milliseconds=100), on_slow=self.slow.append,
+            sample_stacks=False, timer=self.timer)
+        self.watchdog.start()
+        self.addCleanup(self.watchdog.stop)
+
+    def takes(self, seconds, result=None):
+        def function(*args, **kwargs):
+            self.timer.now += seconds
+            return result
+        function.__qualname__ = 'takes_{}'.format(seconds)
+        return function
+
+    def test_slow_txapply(self):
+        """
+        Functions called by ``txapply`` that take longer than the threshold
+        are reported.
+        """
+        d = txapply(self.takes(0.2, 'done'), succeed(1), x=succeed(2))
+        self.assertThat(d, succeeded(Equals('done')))
+        self.assertThat(self.slow, MatchesListwise([
+            Equals((__name__ + '.takes_0.2', 0.2, None))]))
+
+    def test_fast(self):
+        """
+        Functions that don't take longer than the threshold aren't reported,
+        but are recorded in the histograms.
+        """
+        txapply(self.takes(0.000003), succeed(1))
+        txapply(self.takes(0.000003), succeed(1))
+        self.assertThat(self.slow, Equals([]))
+        [histogram] = self.watchdog.histograms.values()
+        self.assertThat(
+            (histogram.count, histogram.quantile(0.5)),
+            Equals((2, 0.000003)))
+
+    def test_combinators(self):
+        """
+        Functions called by the combinators are timed.
+        """
+        slow = self.takes(0.2)
+        transparent(None, slow)
+        ignore(None, slow)
+        combine(None, slow)
+        Ignored(slow)(None)
+        pipeline([step(transparent, slow), step(combine, slow)])(None)
+        self.assertThat(len(self.slow), Equals(6))
+
+    def test_nested(self):
+        """
+        When a function calls another, each is timed separately, the outer
+        one including the inner one.
+        """
+        inner = self.takes(0.15)
+
+        def outer():
+            self.timer.now += 0.01
+            return ignore(None, inner)
+        txapply(outer)
+        self.assertThat(
+            [call.duration for call in self.slow],
+            MatchesListwise([Equals(0.15), Equals(0.16)]))
+
+    def test_failure(self):
+        """
+        Functions that raise are timed too.
+        """
+        def broken():
+            self.timer.now += 0.2
+            raise ZeroDivisionError()
+        txapply(broken).addErrback(lambda failure: None)
+        self.assertThat(len(self.slow), Equals(1))
+
+    def test_wrappers(self):
+        """
+        Functions applied by the ``txapply`` methods of other instruments
+        and limiters are timed once each call, under their own name, rather
+        than their wrappers'.
+        """
+        clock = Clock()
+        applies = [
+            Tracer(clock, lambda span: None).txapply,
+            Metrics(timer=self.timer).txapply,
+            AdmissionController(clock).txapply,
+            CircuitBreaker(clock).txapply,
+            KeyedLimiter(lambda value: None, limit=10).txapply,
+            Hedger(clock, timedelta(seconds=1)).txapply,
+            partial(PriorityScheduler(clock).txapply, 0),
+        ]
+        slow = self.takes(0.2, 'done')
+        for apply in applies:
+            for i in range(3):
+                d = apply(slow, succeed(i))
+                clock.advance(0)
+                self.assertThat(d, succeeded(Equals('done')))
+        name = __name__ + '.takes_0.2'
+        self.assertThat(
+            {name: histogram.count
+             for name, histogram in self.watchdog.histograms.items()},
+            Equals({name: 3 * len(applies)}))
+        self.assertThat(
+            {call.name for call in self.slow}, Equals({name}))
+
+    def test_stop(self):
+        """
+        Once stopped, calls aren't timed, and the hook is uninstalled.
+        """
+        self.watchdog.stop()
+        self.assertThat(_instrument.invoke, Is(None))
+        txapply(self.takes(0.2), succeed(1))
+        self.assertThat(self.slow, Equals([]))
+
+    def test_chained(self):
+        """
+        Two watchdogs can run at once, and both time calls.
+        """
+        other_slow = []
+        other = Watchdog(
+            timedelta(milliseconds=100), on_slow=other_slow.append,
+            sample_stacks=False, timer=self.timer)
+        other.start()
+        txapply(self.takes(0.2))
+        other.stop()
+        self.assertThat(
+            (len(self.slow), len(other_slow)), Equals((1, 1)))
+        self.assertThat(
+            _instrument._hooks, Equals([self.watchdog._invoke]))
+
+    def test_stopped_out_of_order(self):
+        """
+        Watchdogs can be stopped in any order, and each stops timing calls
+        as soon as it is stopped, without affecting the others.
+        """
+        other_slow = []
+        other = Watchdog(
+            timedelta(milliseconds=100), on_slow=other_slow.append,
+            sample_stacks=False, timer=self.timer)
+        other.start()
+        self.watchdog.stop()
+        txapply(self.takes(0.2))
+        self.assertThat(
+            (len(self.slow), len(other_slow)), Equals((0, 1)))
+        other.stop()
+        self.assertThat(_instrument.invoke, Is(None))
+        txapply(self.takes(0.2))
+        self.assertThat(
+            (len(self.slow), len(other_slow)), Equals((0, 1)))
+
+
+class StackSampleTests(TestCase):
+    """
+    Tests for the stacks that ``Watchdog`` samples.
+    """
+
+    def test_sample(self):
+        """
+        A call that takes longer than the threshold has its stack sampled
+        while it is running.
+        """
+        slow = []
+        watchdog = Watchdog(
+            timedelta(milliseconds=20), on_slow=slow.append)
+        watchdog.start()
+        self.addCleanup(watchdog.stop)
+
+        def sleepy():
+            time.sleep(0.2)
+        txapply(sleepy)
+        [call] = slow
+        self.assertThat(
+            [name for filename, lineno, name, line in call.stack],
+            Contains('sleepy'))